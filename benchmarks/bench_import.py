@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Measures the import time of the ccp2qif entry points using ``python -X
+importtime``, and the wall-clock time of starting the interpreter and
+importing them.
+
+Usage::
+
+    python benchmarks/bench_import.py --repeat 10
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+import subprocess
+import sys
+
+MODULES = [
+    'ccp2qif.core',
+    'ccp2qif.bil',
+    'ccp2qif.ccp',
+    'ccp2qif.qiftools.augment',
+]
+
+
+def import_time(module):
+    """
+    Returns the cumulative import time of *module* in microseconds as
+    reported by the interpreter, and the wall-clock time of the process.
+    """
+    start = perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    wall = perf_counter() - start
+    for line in process.stderr.splitlines():
+        _, _, rest = line.partition(':')
+        _, cumulative, name = [part.strip() for part in rest.split('|')]
+        if name == module:
+            return int(cumulative), wall
+    raise ValueError('%s not found in importtime output' % module)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    print('%-28s %12s %12s' % ('module', 'import ms', 'process ms'))
+    for module in args.modules:
+        samples = [import_time(module) for _ in range(args.repeat)]
+        print('%-28s %12.1f %12.1f' % (
+            module,
+            min(cumulative for cumulative, _ in samples) / 1000,
+            min(wall for _, wall in samples) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Compares the memory needed to hold transactions as a list of
+``QIFTransaction`` instances with :py:class:`ccp2qif.columnar.ColumnarTransactions`.
+
+Usage::
+
+    python benchmarks/bench_memory.py --rows 1000000
+"""
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from decimal import Decimal
+from random import Random
+
+from ccp2qif.columnar import ColumnarTransactions
+from ccp2qif.model import QIFTransaction
+
+
+def synthetic_transactions(rows, seed=1):
+    """
+    Generates *rows* transactions looking like those of a real statement:
+    several transactions per day, a limited set of counterparties and
+    messages, and unique references.
+    """
+    rnd = Random(seed)
+    start = date(2010, 1, 1)
+    counterparties = ['LU%02d 0019 %04d %04d %04d' % (
+        index % 97, index, index * 7 % 10000, index * 13 % 10000)
+        for index in range(500)]
+    for index in range(rows):
+        yield QIFTransaction(
+            start + timedelta(days=index // 20),
+            Decimal(rnd.randint(-500000, 500000)).scaleb(-2),
+            'Payment %d | Invoice %d' % (rnd.randint(1, 2000),
+                                         rnd.randint(1, 5000)),
+            rnd.choice(counterparties),
+            'REF%010d' % index,
+        )
+
+
+def measure(factory, rows):
+    tracemalloc.start()
+    container = factory(synthetic_transactions(rows))
+    _, peak = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return current, peak
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    print('%-12s %14s %14s %10s' % ('container', 'retained', 'peak',
+                                    'bytes/row'))
+    for name, factory in (('list', list),
+                          ('columnar', ColumnarTransactions)):
+        current, peak = measure(factory, args.rows)
+        print('%-12s %14d %14d %10.1f' % (name, current, peak,
+                                          current / args.rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Measures the throughput of :py:mod:`ccp2qif.qiftools.reader` on a synthetic
+QIF file, compared to reading the whole file into memory and splitting it
+into lines as ``augment_qif`` used to do.
+
+Run it from the root of the repository::
+
+    python -m benchmarks.bench_reader --rows 1000000
+"""
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+
+from benchmarks.bench_memory import synthetic_transactions
+from ccp2qif.core import AccountInfo, TransactionList, write_qif
+from ccp2qif.qiftools.reader import iter_qif, read_qif
+
+
+def read_slurped(filename):
+    with open(filename, encoding='cp1252') as infile:
+        data = infile.read()
+    return iter_qif(data.splitlines())
+
+
+def read_text(filename):
+    with open(filename, encoding='cp1252') as infile:
+        yield from read_qif(infile)
+
+
+def read_mapped(filename):
+    return read_qif(filename)
+
+
+def measure(function, filename):
+    start = perf_counter()
+    count = sum(1 for _ in function(filename))
+    duration = perf_counter() - start
+    # Tracing slows down allocations a lot, so memory is measured separately
+    tracemalloc.start()
+    for _ in function(filename):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, duration, peak
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as workdir:
+        filename = join(workdir, 'synthetic.qif')
+        with open(filename, 'w', encoding='cp1252') as outfile:
+            write_qif(TransactionList(AccountInfo('LU00', 'Synthetic'),
+                                      synthetic_transactions(args.rows)),
+                      outfile)
+
+        print('%-8s %10s %14s %12s' % ('reader', 'seconds', 'records/s',
+                                       'peak MiB'))
+        for name, function in (('slurp', read_slurped),
+                               ('text', read_text),
+                               ('mmap', read_mapped)):
+            count, duration, peak = measure(function, filename)
+            print('%-8s %10.3f %14.0f %12.1f' % (
+                name, duration, count / duration, peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Measures :py:mod:`ccp2qif.tokenizer` against :py:func:`csv.reader` over a
+text stream, which the CSV parsers used before, on synthetic exports.
+
+Two figures are reported per format: splitting the records into fields only
+(``tokenize``) and running the complete parser (``parse``). Text-mode files
+are not memory-mapped, so parsing them exercises the ``csv.reader`` path.
+
+Run it from the root of the repository::
+
+    python -m benchmarks.bench_tokenizer --rows 1000000
+"""
+from argparse import ArgumentParser
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import csv
+import mmap
+
+from benchmarks.generate import generate
+from ccp2qif import bil, ccp
+from ccp2qif.tokenizer import iter_rows
+
+FORMATS = {
+    'bilnet': (bil.stream, bil.HEADER_LINES),
+    'ccp-csv': (ccp.stream_csv, ccp.CSV_HEADER_LINES),
+}
+
+
+def tokenize_csv(filename, header_lines):
+    with open(filename, encoding='cp1252') as infile:
+        for _ in range(header_lines):
+            next(infile)
+        return sum(1 for _ in csv.reader(infile, delimiter=';',
+                                         quotechar='"'))
+
+
+def tokenize_mmap(filename, header_lines):
+    with open(filename, 'rb') as infile:
+        view = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        start = 0
+        for _ in range(header_lines):
+            start = view.find(b'\n', start) + 1
+        count = sum(1 for _ in iter_rows(view, start))
+        view.close()
+        return count
+
+
+def parse_csv(filename, parser):
+    with open(filename, encoding='cp1252') as infile:
+        return sum(1 for _ in parser(infile).transactions)
+
+
+def parse_mmap(filename, parser):
+    with open(filename, 'rb') as infile:
+        return sum(1 for _ in parser(infile).transactions)
+
+
+def measure(function, *args):
+    start = perf_counter()
+    count = function(*args)
+    return count, perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    print('%-8s %-9s %-7s %10s %14s' % ('format', 'stage', 'reader',
+                                        'seconds', 'rows/s'))
+    with TemporaryDirectory() as workdir:
+        for name, (stream, header_lines) in FORMATS.items():
+            filename = join(workdir, 'export-%s' % name)
+            generate(name, filename, args.rows)
+            runs = (
+                ('tokenize', 'csv', tokenize_csv, header_lines),
+                ('tokenize', 'mmap', tokenize_mmap, header_lines),
+                ('parse', 'csv', parse_csv, stream),
+                ('parse', 'mmap', parse_mmap, stream),
+            )
+            for stage, reader, function, argument in runs:
+                count, duration = measure(function, filename, argument)
+                print('%-8s %-9s %-7s %10.3f %14.0f' % (
+                    name, stage, reader, duration, count / duration))
+
+
+if __name__ == '__main__':
+    main()
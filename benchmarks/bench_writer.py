@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Measures the throughput of :py:func:`ccp2qif.core.write_qif` compared to the
+previous ``print()``-based writer, using the transactions of the files in
+``testdata`` repeated until the requested number of records is reached.
+
+Usage::
+
+    python benchmarks/bench_writer.py --rows 1000000
+"""
+from argparse import ArgumentParser
+from functools import partial
+from itertools import islice, cycle
+from os import devnull
+from time import perf_counter
+import logging
+
+from ccp2qif.bil import parse
+from ccp2qif.ccp import parse_csv
+from ccp2qif.core import TransactionList, write_qif
+
+LOG = logging.getLogger(__name__)
+
+
+def legacy_write_qif(transaction_list, outfile, datefmt='%d/%m/%Y'):
+    """
+    The writer as it was before records were buffered.
+    """
+    write = partial(print, file=outfile)
+    write('!Account')
+    write('N%s' % transaction_list.account.account_number)
+    write('D"%s"' % transaction_list.account.description)
+    write('TBank')
+    write('^')
+    write('!Type:Bank')
+    for transaction in transaction_list.transactions:
+        LOG.debug('Writing transaction at %s to %r',
+                  transaction.date, outfile.name)
+        write('D%s' % transaction.date.strftime(datefmt))
+        write('T%s' % transaction.value)
+        write('M%s' % transaction.message)
+        if transaction.counterparty:
+            write('P%s' % transaction.counterparty)
+        if transaction.reference:
+            write('N%s' % transaction.reference)
+        write('^')
+
+
+def load_fixtures():
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        bil = parse(infile)
+    with open('testdata/ccp/ccp_in.csv') as infile:
+        ccp = parse_csv(infile)
+    return [('bil', bil), ('ccp', ccp)]
+
+
+def run(writer, data, rows):
+    scaled = TransactionList(data.account,
+                             islice(cycle(data.transactions), rows))
+    with open(devnull, 'w') as outfile:
+        start = perf_counter()
+        writer(scaled, outfile)
+        return perf_counter() - start
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    print('%-6s %-8s %10s %14s' % ('file', 'writer', 'seconds',
+                                   'records/s'))
+    for name, data in load_fixtures():
+        for writer_name, writer in (('legacy', legacy_write_qif),
+                                    ('buffered', write_qif)):
+            duration = run(writer, data, args.rows)
+            print('%-6s %-8s %10.3f %14.0f' % (
+                name, writer_name, duration, args.rows / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Generates synthetic exports in the formats understood by ccp2qif.
+
+The files mimic the layout of the real exports (see ``testdata``) and are
+deterministic for a given seed. Spreadsheet formats are limited by the
+number of rows a sheet can hold.
+
+Usage::
+
+    python benchmarks/generate.py ccp-csv 1000000 /tmp/large.csv
+"""
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from random import Random
+
+#: Maximum number of data rows in a sheet (excluding the header)
+XLS_MAX_ROWS = 65535
+XLSX_MAX_ROWS = 1048575
+
+ACCOUNT = 'LU12 3456 7890 1234 5678'
+
+
+class Rows:
+    """
+    Produces the values of synthetic transactions. Dates descend like in the
+    real exports, with about 20 transactions per day.
+    """
+
+    def __init__(self, seed=1):
+        self.rnd = Random(seed)
+        self.counterparties = [
+            ('LU%02d 0019 %04d %04d %04d' % (
+                index % 97, index, index * 7 % 10000, index * 13 % 10000),
+             'Counterparty %d' % index)
+            for index in range(500)]
+
+    def __call__(self, rows):
+        rnd = self.rnd
+        start = date(2010, 1, 1) + timedelta(days=rows // 20)
+        for index in range(rows):
+            cp_acct, cp_name = rnd.choice(self.counterparties)
+            yield {
+                'date': start - timedelta(days=index // 20),
+                'cents': rnd.randint(-500000, 500000),
+                'description': 'Payment %d' % rnd.randint(1, 2000),
+                'comm1': 'Invoice %d' % rnd.randint(1, 5000),
+                'comm2': 'Customer %d' % rnd.randint(1, 900),
+                'cp_acct': cp_acct,
+                'cp_name': cp_name,
+                'reference': 'REF%010d' % index,
+            }
+
+
+def european_amount(cents):
+    """
+    Formats an amount like the CCP exports do: ``-1.234,56``.
+    """
+    text = '{:,.2f}'.format(abs(cents) / 100)
+    text = text.replace(',', ' ').replace('.', ',').replace(' ', '.')
+    return '-' + text if cents < 0 else text
+
+
+def write_ccp_csv(filename, rows, seed=1):
+    with open(filename, 'w', encoding='cp1252', newline='') as outfile:
+        outfile.write('Account number :;%s;\r\n' % ACCOUNT)
+        outfile.write(
+            'Accounting date;Description;Operation amount;Currency;'
+            'Value date;Counterparty account;Counterparty name :;'
+            'Communication 1 :;Communication 2 :;Operation reference\r\n')
+        for row in Rows(seed)(rows):
+            day = row['date'].strftime('%d-%m-%Y')
+            outfile.write('%s;%s;%s;EUR;%s;%s;%s;%s;%s;%s\r\n' % (
+                day, row['description'], european_amount(row['cents']), day,
+                row['cp_acct'], row['cp_name'], row['comm1'], row['comm2'],
+                row['reference']))
+
+
+def write_bilnet(filename, rows, seed=1):
+    with open(filename, 'w', encoding='cp1252', newline='') as outfile:
+        outfile.write('BILnet\r\n')
+        outfile.write('LISTE DES MOUVEMENTS DU COMPTE\r\n')
+        outfile.write('%s "Synthetic account"\r\n' % ACCOUNT.replace(' ', ''))
+        outfile.write('\r\n')
+        outfile.write(
+            'Date;Date valeur;Libellé;Communication;Montant (EUR);\r\n')
+        for row in Rows(seed)(rows):
+            day = row['date'].strftime('%d/%m/%Y')
+            outfile.write('%s;%s;%s;%s;%.2f;\r\n' % (
+                day, day, row['description'], row['comm1'],
+                row['cents'] / 100))
+
+
+def _sheet_rows(rows, seed):
+    yield ('Accounting date', 'Description', 'Counterparty account',
+           'Counterparty name', 'Amount')
+    for row in Rows(seed)(rows):
+        yield (row['date'], row['description'], row['cp_acct'],
+               row['cp_name'], row['cents'] / 100)
+
+
+def write_ccp_xlsx(filename, rows, seed=1):
+    from openpyxl import Workbook
+    if rows > XLSX_MAX_ROWS:
+        raise ValueError('XLSX sheets hold at most %d rows' % XLSX_MAX_ROWS)
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet()
+    for values in _sheet_rows(rows, seed):
+        sheet.append(values)
+    book.save(filename)
+
+
+def write_ccp_xls(filename, rows, seed=1):
+    from xlwt import Workbook, easyxf
+    if rows > XLS_MAX_ROWS:
+        raise ValueError('XLS sheets hold at most %d rows' % XLS_MAX_ROWS)
+    book = Workbook()
+    sheet = book.add_sheet('Sheet1')
+    date_style = easyxf(num_format_str='DD/MM/YYYY')
+    for row_index, values in enumerate(_sheet_rows(rows, seed)):
+        for col_index, value in enumerate(values):
+            if isinstance(value, date):
+                sheet.write(row_index, col_index, value, date_style)
+            else:
+                sheet.write(row_index, col_index, value)
+    book.save(filename)
+
+
+#: Maps format names to generator functions and file extensions
+GENERATORS = {
+    'ccp-csv': (write_ccp_csv, '.csv'),
+    'bilnet': (write_bilnet, '.txt'),
+    'ccp-xlsx': (write_ccp_xlsx, '.xlsx'),
+    'ccp-xls': (write_ccp_xls, '.xls'),
+}
+
+
+def generate(fmt, filename, rows, seed=1):
+    function, _ = GENERATORS[fmt]
+    function(filename, rows, seed)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('format', choices=sorted(GENERATORS))
+    parser.add_argument('rows', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.format, args.filename, args.rows, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Benchmark suite measuring how ccp2qif scales with the size of the input.
+
+For each format and size a synthetic export is generated (see
+:py:mod:`benchmarks.generate`) and the following stages are timed
+separately, each one in a fresh process so that the reported peak memory
+belongs to that stage only:
+
+* ``sniff``: opening the file and detecting its type,
+* ``parse``: running the detected parser over all rows,
+* ``write``: writing the same number of transactions with ``write_qif``.
+
+Run it from the root of the repository::
+
+    python -m benchmarks.run --rows 10000 100000 --formats ccp-csv bilnet
+
+Results can be stored with ``--output`` and compared against a previous run
+with ``--baseline``. The exit code is non-zero if any stage lost more than
+``--tolerance`` of its throughput.
+"""
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from multiprocessing import get_context
+from os import devnull
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import resource
+import sys
+
+from benchmarks.generate import (
+    GENERATORS,
+    XLS_MAX_ROWS,
+    XLSX_MAX_ROWS,
+    generate,
+)
+
+DEFAULT_ROWS = [10000, 100000]
+STAGES = ('sniff', 'parse', 'write')
+ROW_LIMITS = {
+    'ccp-xls': XLS_MAX_ROWS,
+    'ccp-xlsx': XLSX_MAX_ROWS,
+}
+
+
+def stage_sniff(filename):
+    from ccp2qif.detect import detect
+    with open(filename, 'rb') as infile:
+        detect(infile)
+    return 1
+
+
+def stage_parse(filename):
+    from ccp2qif.detect import detect
+    count = 0
+    with open(filename, 'rb') as infile:
+        parser = detect(infile)
+        for _ in parser(infile).transactions:
+            count += 1
+    return count
+
+
+def stage_write(filename):
+    from ccp2qif.core import TransactionList, write_qif
+    from ccp2qif.detect import detect
+    with open(filename, 'rb') as infile:
+        parser = detect(infile)
+        data = parser(infile)
+        sample = list(islice(data.transactions, 1000))
+        rows = len(sample) + sum(1 for _ in data.transactions)
+    transactions = islice(cycle(sample), rows)
+    with open(devnull, 'w', encoding='cp1252') as outfile:
+        start = perf_counter()
+        write_qif(TransactionList(data.account, transactions), outfile)
+        return rows, perf_counter() - start
+
+
+def _measure(stage, filename, connection):
+    """
+    Runs one stage and sends ``(seconds, rows, peak_rss_kb, error)`` back to
+    the parent process.
+    """
+    # Import time is not part of any stage
+    import ccp2qif.core
+    import ccp2qif.detect
+
+    function = globals()['stage_%s' % stage]
+    try:
+        start = perf_counter()
+        rows = function(filename)
+        duration = perf_counter() - start
+    except Exception as exc:
+        connection.send((0, 0, 0, '%s: %s' % (exc.__class__.__name__, exc)))
+        connection.close()
+        return
+    if isinstance(rows, tuple):
+        # The stage did some preparation which is not part of the timing
+        rows, duration = rows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send((duration, rows, peak, None))
+    connection.close()
+
+
+def measure(stage, filename):
+    context = get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure,
+                              args=(stage, filename, sender))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def run(formats, sizes, workdir):
+    results = []
+    for fmt in formats:
+        _, extension = GENERATORS[fmt]
+        for rows in sizes:
+            if rows > ROW_LIMITS.get(fmt, rows):
+                print('Skipping %s with %d rows (format limit)' % (fmt, rows),
+                      file=sys.stderr)
+                continue
+            filename = join(workdir, '%s-%d%s' % (fmt, rows, extension))
+            if not exists(filename):
+                try:
+                    generate(fmt, filename, rows)
+                except ImportError as exc:
+                    print('Skipping %s (%s, install ccp2qif[bench])' % (
+                        fmt, exc), file=sys.stderr)
+                    break
+            for stage in STAGES:
+                duration, count, peak, error = measure(stage, filename)
+                if error:
+                    print('%-9s %9d %-6s FAILED: %s' % (
+                        fmt, rows, stage, error), file=sys.stderr)
+                    continue
+                results.append({
+                    'format': fmt,
+                    'rows': rows,
+                    'stage': stage,
+                    'seconds': duration,
+                    'rows_per_second': count / duration if duration else 0,
+                    'peak_rss_kb': peak,
+                })
+                print_result(results[-1])
+    return results
+
+
+def print_result(result):
+    print('%-9s %9d %-6s %10.4f %14.0f %10.1f' % (
+        result['format'], result['rows'], result['stage'], result['seconds'],
+        result['rows_per_second'], result['peak_rss_kb'] / 1024))
+    sys.stdout.flush()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the results which are slower than in *baseline* by more than
+    *tolerance* (a fraction).
+    """
+    reference = {(row['format'], row['rows'], row['stage']): row
+                 for row in baseline}
+    regressions = []
+    for row in results:
+        old = reference.get((row['format'], row['rows'], row['stage']))
+        if not old or row['stage'] == 'sniff':
+            # Sniffing takes microseconds, its timing is mostly noise
+            continue
+        if row['rows_per_second'] < old['rows_per_second'] * (1 - tolerance):
+            regressions.append((old, row))
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='Sizes of the generated files (default: '
+                        '%(default)s)')
+    parser.add_argument('--formats', nargs='+', choices=sorted(GENERATORS),
+                        default=sorted(GENERATORS))
+    parser.add_argument('--workdir', default=None,
+                        help='Keep generated files in this folder and reuse '
+                        'them in later runs.')
+    parser.add_argument('--output', default=None,
+                        help='Write the results as JSON to this file.')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON results of a previous run to compare to.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed loss of throughput when comparing to '
+                        'the baseline (default: %(default)s).')
+    args = parser.parse_args()
+
+    print('%-9s %9s %-6s %10s %14s %10s' % (
+        'format', 'rows', 'stage', 'seconds', 'rows/s', 'peak MiB'))
+    if args.workdir:
+        results = run(args.formats, args.rows, args.workdir)
+    else:
+        with TemporaryDirectory() as workdir:
+            results = run(args.formats, args.rows, workdir)
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        regressions = compare(results, baseline, args.tolerance)
+        for old, new in regressions:
+            print('REGRESSION %s/%d/%s: %.0f -> %.0f rows/s' % (
+                new['format'], new['rows'], new['stage'],
+                old['rows_per_second'], new['rows_per_second']),
+                file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
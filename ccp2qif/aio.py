@@ -0,0 +1,109 @@
+'''
+Conversion API for asyncio applications.
+
+Detection and parsing are blocking and CPU-bound, so they run in an
+executor while the event loop keeps serving other requests. The QIF output
+is produced lazily and handed back chunk by chunk::
+
+    async def upload(request):
+        data = await request.read()
+        async for chunk in convert_async(data, 'LU00 1234'):
+            await response.write(chunk)
+
+The source may be :py:class:`bytes` (or any bytes-like object), a stream
+with a coroutine ``read()`` method such as :py:class:`asyncio.StreamReader`,
+or an async iterable of byte chunks.
+'''
+from asyncio import get_running_loop, shield, wait
+from concurrent.futures import Executor
+from typing import AsyncIterator, Union
+
+from ccp2qif.core import (
+    DEFAULT_DATE_FORMAT,
+    WRITE_BUFFER_SIZE,
+    convert_stream,
+)
+
+#: Number of bytes requested per ``read()`` call from async streams
+READ_SIZE = 64 * 1024
+
+_DONE = object()
+
+
+async def read_source(source):
+    '''
+    Collects the complete contents of *source* (see the module documentation
+    for the accepted types). Parsers need to seek back after detection, so
+    the input is held in memory.
+    '''
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, 'read'):
+        chunks = []
+        while True:
+            chunk = await source.read(READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+    if hasattr(source, '__aiter__'):
+        return b''.join([chunk async for chunk in source])
+    raise TypeError('Unsupported source type: %r' % type(source))
+
+
+async def convert_async(
+        source: Union[bytes, bytearray, memoryview, object],
+        account_name: str = None,
+        filename: str = None,
+        datefmt: str = DEFAULT_DATE_FORMAT,
+        columnar: bool = False,
+        normalise_counterparties: bool = False,
+        encoding: str = 'cp1252',
+        executor: Executor = None,
+        buffer_size: int = WRITE_BUFFER_SIZE) -> AsyncIterator[bytes]:
+    '''
+    Converts the export *source* to QIF and yields the result as encoded
+    chunks of about *buffer_size* characters.
+
+    *filename* is only used to help format detection by its extension. The
+    blocking work runs in *executor* (the default executor of the loop if
+    ``None``). It must be a thread pool: the conversion is a generator
+    advanced step by step, which cannot be sent to another process. Chunks
+    are produced one at a time, so a slow consumer does not make the output
+    pile up in memory.
+
+    :raises ValueError: if the format of the source is not recognised.
+    '''
+    loop = get_running_loop()
+    data = await read_source(source)
+    chunks = convert_stream(
+        data, account_name, columnar=columnar, datefmt=datefmt,
+        normalise_counterparties=normalise_counterparties, filename=filename,
+        encoding=encoding, buffer_size=buffer_size)
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(executor, next, chunks, _DONE)
+            # Shielded, so that a cancellation does not lose track of the
+            # generator still running in the executor
+            chunk = await shield(pending)
+            pending = None
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        if pending is not None:
+            # A running generator cannot be closed
+            await wait({pending})
+            if not pending.cancelled():
+                pending.exception()
+        chunks.close()
+
+
+async def convert_to_bytes_async(source, account_name: str = None,
+                                 **kwargs) -> bytes:
+    '''
+    Like :py:func:`convert_async` but returns the complete QIF document.
+    '''
+    return b''.join([chunk async for chunk in convert_async(
+        source, account_name, **kwargs)])
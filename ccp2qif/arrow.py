@@ -0,0 +1,123 @@
+'''
+Apache Arrow and Parquet output.
+
+The transactions are converted into Arrow record batches of
+:py:data:`~ccp2qif.decode.BATCH_SIZE` rows as they are produced by the
+parser, so the whole export is never held in memory. Amounts are stored as
+``decimal128(18, 2)``, dates as ``date32`` and the counterparty and account
+columns are dictionary-encoded.
+
+pyarrow is an optional dependency (``pip install ccp2qif[arrow]``).
+'''
+from typing import BinaryIO, Dict, Iterator
+
+from ccp2qif.decode import BATCH_SIZE, iter_batches
+from ccp2qif.model import TransactionList
+
+
+def schema():
+    '''
+    Returns the Arrow schema of the written tables.
+
+    :raises ImportError: If pyarrow is not installed.
+    '''
+    import pyarrow as pa
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('account', dictionary),
+        ('date', pa.date32()),
+        ('amount', pa.decimal128(18, 2)),
+        ('message', pa.string()),
+        ('counterparty', dictionary),
+        ('reference', pa.string()),
+    ])
+
+
+class DictionaryEncoder:
+    '''
+    Dictionary-encodes a column across batches. The dictionary only grows,
+    so later batches are written as dictionary deltas. Only the values new
+    in a batch are converted; they are appended to the dictionary of the
+    previous batch.
+    '''
+
+    def __init__(self):
+        self.indices = {}  # type: Dict[str, int]
+        self.dictionary = None
+
+    def encode(self, values):
+        import pyarrow as pa
+        indices = self.indices
+        codes = []
+        added = []
+        for value in values:
+            code = indices.get(value)
+            if code is None:
+                code = indices[value] = len(indices)
+                added.append(value)
+            codes.append(code)
+        if self.dictionary is None:
+            self.dictionary = pa.array(added, pa.string())
+        elif added:
+            self.dictionary = pa.concat_arrays(
+                [self.dictionary, pa.array(added, pa.string())])
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, pa.int32()), self.dictionary)
+
+
+def record_batches(transaction_list: TransactionList,
+                   batch_size: int = BATCH_SIZE) -> Iterator:
+    '''
+    Converts the transactions into Arrow record batches.
+
+    :raises ImportError: If pyarrow is not installed.
+    '''
+    import pyarrow as pa
+    table_schema = schema()
+    account = DictionaryEncoder()
+    counterparties = DictionaryEncoder()
+    account_number = transaction_list.account.account_number
+    for batch in iter_batches(transaction_list.transactions, batch_size):
+        yield pa.record_batch([
+            account.encode([account_number] * len(batch)),
+            pa.array([row.date for row in batch], pa.date32()),
+            pa.array([row.value for row in batch], pa.decimal128(18, 2)),
+            pa.array([row.message for row in batch], pa.string()),
+            counterparties.encode([row.counterparty for row in batch]),
+            pa.array([row.reference for row in batch], pa.string()),
+        ], schema=table_schema)
+
+
+def _metadata(transaction_list: TransactionList) -> Dict[bytes, bytes]:
+    account = transaction_list.account
+    return {
+        b'account_number': account.account_number.encode('utf8'),
+        b'account_description': account.description.encode('utf8'),
+    }
+
+
+def write_arrow(transaction_list: TransactionList, outfile: BinaryIO,
+                datefmt: str = None, batch_size: int = BATCH_SIZE):
+    '''
+    Writes the transactions as Arrow IPC file (also known as Feather V2).
+    *datefmt* is ignored as dates are stored as such.
+    '''
+    import pyarrow.ipc as ipc
+    table_schema = schema().with_metadata(_metadata(transaction_list))
+    options = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with ipc.new_file(outfile, table_schema, options=options) as writer:
+        for batch in record_batches(transaction_list, batch_size):
+            writer.write_batch(batch)
+
+
+def write_parquet(transaction_list: TransactionList, outfile: BinaryIO,
+                  datefmt: str = None, batch_size: int = BATCH_SIZE):
+    '''
+    Writes the transactions as Parquet file. *datefmt* is ignored as dates
+    are stored as such.
+    '''
+    import pyarrow.parquet as pq
+    table_schema = schema().with_metadata(_metadata(transaction_list))
+    with pq.ParquetWriter(outfile, table_schema) as writer:
+        for batch in record_batches(transaction_list, batch_size):
+            writer.write_batch(batch)
@@ -0,0 +1,142 @@
+'''
+Conversion of many exports in one invocation.
+
+The files are distributed over a pool of worker processes, each of which runs
+:py:func:`ccp2qif.core.convert` on one file at a time.
+'''
+from collections import defaultdict, namedtuple
+from functools import partial
+from glob import glob, has_magic
+from os import listdir
+from os.path import basename, isdir, join, realpath, splitext
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+import logging
+
+LOG = logging.getLogger(__name__)
+
+BatchJob = namedtuple('BatchJob', 'source target options')
+BatchResult = namedtuple('BatchResult', 'source target error duration stats',
+                         defaults=(None,))
+
+
+def collect_inputs(
+        patterns: Iterable[str],
+        output_extensions: Iterable[str] = ()) -> List[str]:
+    '''
+    Expands a list of file names, folders and glob patterns into a list of
+    input files. Folders are not searched recursively. QIF files and files
+    with one of the *output_extensions* (those of the selected output
+    format) are skipped as they are outputs, not inputs.
+    '''
+    skipped = {'.qif'}
+    skipped.update(extension.lower() for extension in output_extensions)
+    output = []
+    for pattern in patterns:
+        if isdir(pattern):
+            candidates = sorted(join(pattern, name)
+                                for name in listdir(pattern))
+            candidates = [name for name in candidates if not isdir(name)]
+        elif has_magic(pattern):
+            candidates = sorted(glob(pattern))
+        else:
+            candidates = [pattern]
+        for candidate in candidates:
+            if splitext(candidate)[1].lower() in skipped:
+                LOG.debug('Skipping output file %r', candidate)
+                continue
+            output.append(candidate)
+    return output
+
+
+def target_filename(source: str, outdir: Optional[str] = None,
+                    extension: str = '.qif') -> str:
+    '''
+    Determines the name of the output file for *source*. If *outdir* is
+    given, the file is placed into that folder, otherwise next to the
+    source.
+    '''
+    base, _ = splitext(source)
+    target = base + extension
+    if outdir:
+        target = join(outdir, basename(target))
+    return target
+
+
+def duplicate_targets(
+        pairs: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+    '''
+    Finds the targets of ``(source, target)`` *pairs* which more than one
+    source would be written to, for example ``a/x.csv`` and ``b/x.txt``
+    converted into the same folder. Returns the sources for each of them.
+    '''
+    sources = defaultdict(list)
+    for source, target in pairs:
+        sources[realpath(target)].append(source)
+    return {target: names for target, names in sources.items()
+            if len(names) > 1}
+
+
+def _run_job(job: BatchJob, collect_stats: bool = False) -> BatchResult:
+    from ccp2qif.core import convert
+    stats = None
+    if collect_stats:
+        from ccp2qif.stats import ConversionStats
+        stats = ConversionStats()
+    start = perf_counter()
+    try:
+        convert(job.source, job.target, stats=stats, **job.options)
+    except Exception as exc:
+        LOG.debug('Unable to convert %r', job.source, exc_info=True)
+        error = '%s: %s' % (exc.__class__.__name__, exc)
+    else:
+        error = None
+    return BatchResult(job.source, job.target, error,
+                       perf_counter() - start,
+                       stats.as_dict() if stats else None)
+
+
+def convert_batch(jobs: Iterable[BatchJob],
+                  workers: Optional[int] = None,
+                  collect_stats: bool = False) -> List[BatchResult]:
+    '''
+    Converts all *jobs* using a pool of *workers* processes (defaulting to
+    the number of CPUs). The ``options`` of each job are passed as keyword
+    arguments to :py:func:`ccp2qif.core.convert`. Failures do not abort the
+    batch, they are reported in the ``error`` field of the corresponding
+    result. If *collect_stats* is true, the ``stats`` field of each result
+    holds the statistics of the conversion (see :py:mod:`ccp2qif.stats`).
+
+    :raises ValueError: If several jobs have the same target, as their
+        results would overwrite each other.
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = list(jobs)
+    clashes = duplicate_targets((job.source, job.target) for job in jobs)
+    if clashes:
+        raise ValueError('Several inputs would be written to the same file: '
+                         + '; '.join('%s <- %s' % (target, ', '.join(names))
+                                     for target, names in clashes.items()))
+    run_job = partial(_run_job, collect_stats=collect_stats)
+    if workers == 1 or len(jobs) < 2:
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+def print_report(results: List[BatchResult], total_duration: float,
+                 stream: TextIO):
+    '''
+    Prints a per-file summary of a batch run to *stream*.
+    '''
+    failures = 0
+    for result in results:
+        if result.error:
+            failures += 1
+            print('FAIL %7.3fs %s: %s' % (
+                result.duration, result.source, result.error), file=stream)
+        else:
+            print('OK   %7.3fs %s -> %s' % (
+                result.duration, result.source, result.target), file=stream)
+    print('%d converted, %d failed in %.3fs' % (
+        len(results) - failures, failures, total_duration), file=stream)
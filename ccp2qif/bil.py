@@ -1,45 +1,84 @@
-import csv
 import logging
-from datetime import datetime
 from decimal import Decimal
 
-from ccp2qif.core import AccountInfo, QIFTransaction, TransactionList
+from ccp2qif.decode import DateDecoder, decode_dates_columnar, iter_batches
+from ccp2qif.model import AccountInfo, QIFTransaction, TransactionList
+from ccp2qif.registry import module_parser
+from ccp2qif.tokenizer import open_records
+from ccp2qif.util import skip_blank_rows
 
 LOG = logging.getLogger(__name__)
 
+DATE_FORMAT = '%d/%m/%Y'
+#: Number of lines preceding the transactions
+HEADER_LINES = 5
+
 
 def sniff(file_pointer):
+    '''
+    Returns a parser if *file_pointer* looks like a BILnet export. The
+    signature is declared in :py:data:`ccp2qif.registry.BUILTIN_FORMATS`.
+    '''
     LOG.debug('Trying to detect file-type using %s', __name__)
-    file_pointer.seek(0)
-    try:
-        magic = file_pointer.read(6)
-    except Exception as exc:
-        LOG.debug('Unable to read from file (%s)!', exc)
-        magic = None
-    file_pointer.seek(0)
-    if magic == 'BILnet':
-        return parse
-    return None
+    return module_parser(file_pointer, __name__)
 
 
-def parse(file_pointer, account_number=''):
-    next(file_pointer)  # magic marker
-    next(file_pointer)  # redundant heading
-    raw_account_info = next(file_pointer).strip()
+def stream(file_pointer, account_number='', columnar=False,
+           normalise_counterparties=False):
+    '''
+    Like :py:func:`parse`, but the transactions are read lazily from
+    *file_pointer* while they are consumed. The file must therefore remain
+    open until the transactions have been fully iterated.
+
+    If *columnar* is true, the rows are decoded in batches using NumPy (see
+    :py:mod:`ccp2qif.decode`). This pays off for very large files.
+
+    BILnet exports contain no counterparty accounts, so
+    *normalise_counterparties* has no effect.
+    '''
+    header, reader = open_records(file_pointer, HEADER_LINES)
+    # header[0] is the magic marker, header[1] a redundant heading
+    raw_account_info = header[2].strip()
     account_number, _, description = raw_account_info.partition(' ')
     description = description.strip('\r\n\t "')
     account_info = AccountInfo(account_number, description)
-    next(file_pointer)  # Empty line
-    next(file_pointer)  # Column Names
+    # header[3] is empty, header[4] holds the column names
 
     # Data starts now
-    transactions = []
-    reader = csv.reader(file_pointer, delimiter=';', quotechar='"')
+    return TransactionList(account_info, transactions_from_rows(reader,
+                                                                columnar))
+
+
+def transactions_from_rows(rows, columnar=False):
+    '''
+    Converts the CSV rows following the header into transactions.
+    '''
+    rows = skip_blank_rows(rows)
+    if columnar:
+        return _iter_columnar(rows)
+    return _iter_transactions(rows)
+
+
+def _to_transaction(line, date, value):
+    _, _, label, message, _, _ = line
+    message = '%s | %s' % (label, message)
+    return QIFTransaction(date, value, message, '', '')
+
+
+def _iter_transactions(reader):
+    decode_date = DateDecoder(DATE_FORMAT)
     for line in reader:
-        _, value_date, label, message, value, _ = line
-        message = '%s | %s' % (label, message)
-        date = datetime.strptime(value_date, '%d/%m/%Y').date()
-        value = Decimal(value)
-        transactions.append(QIFTransaction(date, value, message, '', ''))
+        yield _to_transaction(line, decode_date(line[1]), Decimal(line[4]))
+
 
-    return TransactionList(account_info, transactions)
+def _iter_columnar(reader):
+    for batch in iter_batches(reader):
+        dates = decode_dates_columnar([line[1] for line in batch],
+                                      DATE_FORMAT)
+        for line, date in zip(batch, dates):
+            yield _to_transaction(line, date, Decimal(line[4]))
+
+
+def parse(file_pointer, account_number=''):
+    result = stream(file_pointer, account_number)
+    return TransactionList(result.account, list(result.transactions))
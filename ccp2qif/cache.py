@@ -0,0 +1,163 @@
+'''
+A persistent cache of conversion results.
+
+Entries are keyed on the SHA-256 hash of the input file, the parser which
+was selected for it and the conversion options. Each entry consists of the
+produced QIF file and a small JSON file recording where it was last written
+to. If the input has not changed and the output file is still in place,
+nothing needs to be done. If the output is missing or was modified, it is
+restored from the cache without parsing the input again.
+
+The cache lives in a plain folder which can be shared by several processes.
+Entries which have not been used for *max_age* seconds are evicted, as are
+the least recently used entries once the total size exceeds *max_bytes*.
+'''
+from hashlib import sha256
+from os import listdir, makedirs, replace, stat, unlink, utime
+from os.path import abspath, exists, join
+from shutil import copyfile, copyfileobj
+from tempfile import NamedTemporaryFile
+from time import time
+from typing import IO, Any, Callable, Dict, Optional
+import json
+import logging
+
+LOG = logging.getLogger(__name__)
+
+#: Bump this whenever the QIF output changes for the same input
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(infile: IO) -> str:
+    '''
+    Returns the hex SHA-256 digest of the binary file *infile* and rewinds
+    it.
+    '''
+    infile.seek(0)
+    digest = sha256()
+    for chunk in iter(lambda: infile.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    infile.seek(0)
+    return digest.hexdigest()
+
+
+def cache_key(source_hash: str, parser: Callable,
+              options: Dict[str, Any]) -> str:
+    '''
+    Combines everything which determines the output of a conversion into
+    one key.
+    '''
+    identity = {
+        'version': CACHE_VERSION,
+        'source': source_hash,
+        'parser': '%s:%s' % (parser.__module__, parser.__qualname__),
+        'options': options,
+    }
+    return sha256(json.dumps(identity, sort_keys=True).encode('utf8')
+                  ).hexdigest()
+
+
+def _output_state(filename: str) -> Optional[list]:
+    try:
+        info = stat(filename)
+    except FileNotFoundError:
+        return None
+    return [info.st_size, info.st_mtime_ns]
+
+
+class ConversionCache:
+    '''
+    A conversion cache stored in *directory*.
+    '''
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = join(self.directory, key)
+        return base + '.qif', base + '.json'
+
+    def restore(self, key: str, target_filename: str) -> bool:
+        '''
+        Brings *target_filename* up to date from the cache. Returns
+        ``False`` if there is no entry for *key*.
+        '''
+        blob, meta = self._paths(key)
+        try:
+            with open(meta) as infile:
+                metadata = json.load(infile)
+            utime(blob)  # mark as recently used
+        except (FileNotFoundError, ValueError):
+            return False
+
+        state = _output_state(target_filename)
+        if (metadata.get('target') == abspath(target_filename) and
+                metadata.get('state') == state):
+            LOG.debug('%r is up to date', target_filename)
+            return True
+        LOG.debug('Restoring %r from cache', target_filename)
+        copyfile(blob, target_filename)
+        self._write_metadata(key, target_filename)
+        return True
+
+    def store(self, key: str, target_filename: str):
+        '''
+        Adds the freshly written *target_filename* to the cache.
+        '''
+        blob, _ = self._paths(key)
+        with NamedTemporaryFile(dir=self.directory, suffix='.tmp',
+                                delete=False) as tmp:
+            with open(target_filename, 'rb') as infile:
+                copyfileobj(infile, tmp)
+        replace(tmp.name, blob)
+        self._write_metadata(key, target_filename)
+        self.evict()
+
+    def _write_metadata(self, key, target_filename):
+        _, meta = self._paths(key)
+        metadata = {
+            'target': abspath(target_filename),
+            'state': _output_state(target_filename),
+        }
+        with NamedTemporaryFile('w', dir=self.directory, suffix='.tmp',
+                                delete=False) as tmp:
+            json.dump(metadata, tmp)
+        replace(tmp.name, meta)
+
+    def evict(self):
+        '''
+        Removes entries older than *max_age* and, oldest first, as many
+        entries as needed to bring the cache below *max_bytes*.
+        '''
+        entries = []
+        for name in listdir(self.directory):
+            if not name.endswith('.qif'):
+                continue
+            try:
+                info = stat(join(self.directory, name))
+            except FileNotFoundError:
+                continue  # removed concurrently
+            entries.append((info.st_mtime, info.st_size, name[:-4]))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time() - self.max_age
+        for mtime, size, key in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            LOG.debug('Evicting cache entry %s', key)
+            for filename in self._paths(key):
+                try:
+                    unlink(filename)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def __contains__(self, key):
+        return exists(self._paths(key)[0])
@@ -1,17 +1,28 @@
 import logging
 from collections import namedtuple
-from datetime import datetime, date
 from decimal import Decimal
-from xlrd import open_workbook, xldate_as_tuple
-import csv
-
-from schwifty import IBAN
 
+from ccp2qif.decode import (
+    DateDecoder,
+    decode_amount,
+    decode_amounts,
+    decode_dates_columnar,
+    iter_batches,
+)
+from ccp2qif.iban import normalise_counterparty, normalise_iban
 from ccp2qif.model import QIFTransaction, AccountInfo, TransactionList
+from ccp2qif.registry import module_parser
+from ccp2qif.spreadsheet import SheetReader, excel_dates
+from ccp2qif.tokenizer import open_records
+from ccp2qif.util import skip_blank_rows
 
 
 LOG = logging.getLogger(__name__)
 
+CSV_DATE_FORMAT = '%d-%m-%Y'
+#: Number of lines preceding the transactions in CSV exports
+CSV_HEADER_LINES = 2
+
 
 DataRow = namedtuple(
     'DataRow',
@@ -28,38 +39,20 @@ DataRow = namedtuple(
 
 
 def sniff(file_pointer):
+    '''
+    Returns a parser if *file_pointer* looks like a CCP export (CSV or
+    workbook). The signatures are declared in
+    :py:data:`ccp2qif.registry.BUILTIN_FORMATS`.
+    '''
     LOG.debug('Trying to detect file-type using %s', __name__)
-    file_pointer.seek(0)
-    try:
-        magic = file_pointer.read(17)
-    except Exception as exc:
-        LOG.debug('Unable to read from file (%s)!', exc)
-        magic = None
-    file_pointer.seek(0)
-    if magic == 'Account number :;':
-        return parse_csv
-
-    # Assuming excel file
-    book = open_workbook(file_pointer.name)
-    sheet = book.sheet_by_index(0)
-    row = sheet.row(0)
-    book.release_resources()
-    del book
-    if len(row) == 6 and row[-2].value == 'Original amount':
-        return parse_xls_2
-    return None
+    return module_parser(file_pointer, __name__)
 
 
 def try_getting_account_number(line: str) -> str:
     if line.lower().startswith('account number'):
         account_info = line.split(';')
         raw_account_number = account_info[1]
-        try:
-            account_number = IBAN(raw_account_number)
-        except ValueError:
-            return None
-        else:
-            return account_number.formatted
+        return normalise_iban(raw_account_number)
     else:
         return None
 
@@ -86,24 +79,91 @@ def to_qif(record: DataRow) -> QIFTransaction:
     return output
 
 
+def stream_workbook(infile, account_number='unknown', columnar=False,
+                    normalise_counterparties=False):
+    '''
+    Parses a spreadsheet export, picking the layout (see
+    :py:func:`parse_xls` and :py:func:`parse_xls_2`) from the header row.
+    The workbook is only opened once.
+
+    *columnar* is accepted for compatibility with the other parsers. It has
+    no effect as spreadsheet cells are already typed. For
+    *normalise_counterparties* see :py:func:`stream_csv`.
+
+    :raises ValueError: If the sheet is empty or its layout is unknown.
+    '''
+    account_info = AccountInfo(account_number or 'unknown', '')
+    reader = SheetReader(infile)
+    rows = iter(reader)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('Empty workbook')
+    if len(header) == 6 and header[-2] == 'Original amount':
+        return TransactionList(account_info, _iter_xls_2(rows,
+                                                         reader.datemode))
+    if len(header) == 5:
+        normalise = normalise_counterparty if normalise_counterparties else None
+        return TransactionList(account_info, _iter_xls(
+            rows, reader.datemode, normalise))
+    reader.close()
+    raise ValueError('Unsupported spreadsheet layout: %r' % (header,))
+
+
+def stream_xls(infile, account_number='unknown'):
+    '''
+    Like :py:func:`parse_xls`, but yields the transactions lazily.
+    '''
+    account_info = AccountInfo(account_number, '')
+    reader = SheetReader(infile)
+    rows = iter(reader)
+    next(rows)  # column names
+    return TransactionList(account_info, _iter_xls(rows, reader.datemode))
+
+
+def _iter_xls(rows, datemode, normalise=None):
+    for batch in iter_batches(rows):
+        dates = excel_dates([row[0] for row in batch], datemode)
+        for line, acdate_value in zip(batch, dates):
+            _, description, cp_acct, cp_name, amount = line
+            if normalise:
+                cp_acct = normalise(cp_acct)
+            yield QIFTransaction(
+                acdate_value,
+                Decimal('%.2f' % amount),
+                description,
+                cp_acct,
+                ''
+            )
+
+
 def parse_xls(infile, account_number='unknown'):
+    result = stream_xls(infile, account_number)
+    return TransactionList(result.account, list(result.transactions))
+
+
+def stream_xls_2(infile, account_number='unknown'):
+    '''
+    Like :py:func:`parse_xls_2`, but yields the transactions lazily.
+    '''
     account_info = AccountInfo(account_number, '')
-    book = open_workbook(infile)
-    sheet = book.sheet_by_index(0)
-    transactions = []
-    for row_index in range(1, sheet.nrows):
-        line = [sheet.cell(row_index, col_index).value
-                for col_index in range(sheet.ncols)]
-        acdate_value, description, cp_acct, cp_name, amount = line
-        acdate_value = date(*xldate_as_tuple(acdate_value, book.datemode)[:3])
-        transactions.append(QIFTransaction(
-            acdate_value,
-            Decimal('%.2f' % amount),
-            description,
-            cp_acct,
-            ''
-        ))
-    return TransactionList(account_info, transactions)
+    reader = SheetReader(infile)
+    rows = iter(reader)
+    next(rows)  # column names
+    return TransactionList(account_info, _iter_xls_2(rows, reader.datemode))
+
+
+def _iter_xls_2(rows, datemode):
+    for batch in iter_batches(rows):
+        dates = excel_dates([row[0] for row in batch], datemode)
+        for line, acdate in zip(batch, dates):
+            _, op_date, card_no, description, orig_amount, real_amount = line
+            yield QIFTransaction(
+                acdate,
+                Decimal('%.2f' % real_amount),
+                description,
+                '',
+                ''
+            )
 
 
 def parse_xls_2(infile, account_number='unknown'):
@@ -120,51 +180,82 @@ def parse_xls_2(infile, account_number='unknown'):
         * Original amount
         * Amount EUR
     '''
+    result = stream_xls_2(infile, account_number)
+    return TransactionList(result.account, list(result.transactions))
 
-    account_info = AccountInfo(account_number, '')
-    book = open_workbook(infile.name)
-    sheet = book.sheet_by_index(0)
-    transactions = []
-    for row_index in range(1, sheet.nrows):
-        line = [sheet.cell(row_index, col_index).value
-                for col_index in range(sheet.ncols)]
-        acdate, op_date, card_no, description, orig_amount, real_amount = line
-        acdate = date(*xldate_as_tuple(acdate, book.datemode)[:3])
-        op_date = date(*xldate_as_tuple(op_date, book.datemode)[:3])
-        transactions.append(QIFTransaction(
-            acdate,
-            Decimal('%.2f' % real_amount),
-            description,
-            '',
-            ''
-        ))
-    return TransactionList(account_info, transactions)
 
+def stream_csv(infile, account_number='', columnar=False,
+               normalise_counterparties=False):
+    '''
+    Like :py:func:`parse_csv`, but the transactions are read lazily from
+    *infile* while they are consumed.
 
-def parse_csv(infile, account_number=''):
-    raw_account_info = next(infile)
-    _, account_number, _ = raw_account_info.split(';')
-    next(infile)  # column names
-    reader = csv.reader(infile, delimiter=';', quotechar='"')
+    If *columnar* is true, the rows are decoded in batches using NumPy (see
+    :py:mod:`ccp2qif.decode`). This pays off for very large files.
+
+    If *normalise_counterparties* is true, counterparty accounts which are
+    valid IBANs are written in their printed form (see
+    :py:mod:`ccp2qif.iban`).
+    '''
+    header, reader = open_records(infile, CSV_HEADER_LINES)
+    _, account_number, _ = header[0].split(';')
+    # header[1] holds the column names
     account_info = AccountInfo(account_number, '')
-    transactions = []
+    return TransactionList(account_info, csv_transactions_from_rows(
+        reader, columnar, normalise_counterparties))
+
+
+def csv_transactions_from_rows(rows, columnar=False,
+                               normalise_counterparties=False):
+    '''
+    Converts the CSV rows following the header into transactions.
+    '''
+    rows = skip_blank_rows(rows)
+    normalise = normalise_counterparty if normalise_counterparties else None
+    if columnar:
+        return _iter_csv_columnar(rows, normalise)
+    return _iter_csv(rows, normalise)
+
+
+def _csv_to_qif(row, value_date, amount, normalise=None):
+    desc = row[1].strip()
+    comm1 = row[7].strip()
+    comm2 = row[8].strip()
+    cp_acct = row[5].strip()
+    if normalise:
+        cp_acct = normalise(cp_acct)
+    cp_name = row[6].strip()
+    reference = row[9]
+
+    message_fields = [desc, comm1, comm2]
+    cp_fields = [cp_acct, cp_name]
+    message = ' | '.join([fld for fld in message_fields if fld])
+    counterparty = ' | '.join([fld for fld in cp_fields if fld])
+    return QIFTransaction(
+        value_date,
+        amount,
+        message,
+        counterparty,
+        reference
+    )
+
+
+def _iter_csv(reader, normalise=None):
+    decode_date = DateDecoder(CSV_DATE_FORMAT)
     for row in reader:
-        desc = row[1].strip()
-        comm1 = row[7].strip()
-        comm2 = row[8].strip()
-        cp_acct = row[5].strip()
-        cp_name = row[6].strip()
-        reference = row[9]
-
-        message_fields = [desc, comm1, comm2]
-        cp_fields = [cp_acct, cp_name]
-        message = ' | '.join([fld for fld in message_fields if fld])
-        counterparty = ' | '.join([fld for fld in cp_fields if fld])
-        transactions.append(QIFTransaction(
-            datetime.strptime(row[4], '%d-%m-%Y').date(),
-            Decimal(row[2].replace('.', '').replace(',', '.')),
-            message,
-            counterparty,
-            reference
-        ))
-    return TransactionList(account_info, transactions)
+        yield _csv_to_qif(row, decode_date(row[4]), decode_amount(row[2]),
+                          normalise)
+
+
+def _iter_csv_columnar(reader, normalise=None):
+    for batch in iter_batches(reader):
+        dates = decode_dates_columnar([row[4] for row in batch],
+                                      CSV_DATE_FORMAT)
+        amounts = decode_amounts([row[2] for row in batch])
+        for row, value_date, amount in zip(batch, dates, amounts):
+            yield _csv_to_qif(row, value_date, amount, normalise)
+
+
+def parse_csv(infile, account_number=''):
+    result = stream_csv(infile, account_number)
+    return TransactionList(result.account, list(result.transactions))
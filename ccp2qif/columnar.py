@@ -0,0 +1,160 @@
+'''
+A compact, array-backed container for transactions.
+
+A list of :py:class:`~ccp2qif.model.QIFTransaction` instances costs several
+hundred bytes per transaction (the tuple, a ``date``, a ``Decimal`` and
+three strings). :py:class:`ColumnarTransactions` stores the same data in
+typed arrays instead:
+
+* dates as ordinals (see :py:meth:`datetime.date.toordinal`),
+* amounts as scaled 64-bit integers together with their decimal exponent
+  (``Decimal('-16.70')`` is stored as ``-1670`` and ``-2``), so values are
+  written back exactly as they were read. The rare amounts which do not fit
+  (negative zero, more than 18 digits or an exponent outside -127..127)
+  are kept as ``Decimal`` on the side,
+* strings as indices into a shared, offset-indexed string buffer.
+
+It can be used wherever a sequence of transactions is expected, for example
+as ``transactions`` of a :py:class:`~ccp2qif.model.TransactionList` passed to
+:py:func:`ccp2qif.core.write_qif`.
+'''
+from array import array
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator
+
+from ccp2qif.model import QIFTransaction
+
+#: Exponent marking amounts which are kept as Decimal
+EXCEPTIONAL = -128
+#: Number of digits which always fit into a 64-bit integer
+MAX_DIGITS = 18
+
+
+class StringTable:
+    '''
+    Stores strings UTF-8 encoded in one shared buffer and refers to them by
+    index.
+
+    Recently seen strings are deduplicated so that recurring values (like
+    counterparties) are only stored once. The lookup table used for this is
+    reset once it holds *dedup_size* entries to keep its memory bounded.
+    '''
+
+    def __init__(self, dedup_size: int = 65536):
+        self.buffer = bytearray()
+        self.offsets = array('Q', [0])
+        self.dedup_size = dedup_size
+        self.recent: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start = self.offsets[index]
+        end = self.offsets[index + 1]
+        return self.buffer[start:end].decode('utf8')
+
+    def intern(self, value: str) -> int:
+        try:
+            return self.recent[value]
+        except KeyError:
+            pass
+        position = len(self)
+        self.buffer += value.encode('utf8')
+        self.offsets.append(len(self.buffer))
+        if len(self.recent) >= self.dedup_size:
+            self.recent.clear()
+        self.recent[value] = position
+        return position
+
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.itemsize * len(self.offsets)
+
+
+class ColumnarTransactions:
+    '''
+    A sequence of transactions stored column by column.
+
+    :param transactions: Initial transactions to store.
+    :param strings: A string table. Can be shared between several
+        instances to deduplicate strings across files.
+    '''
+
+    def __init__(self, transactions: Iterable[QIFTransaction] = (),
+                 strings: StringTable = None):
+        self.strings = StringTable() if strings is None else strings
+        self.dates = array('i')
+        self.amounts = array('q')
+        self.exponents = array('b')
+        self.exceptional: Dict[int, Decimal] = {}
+        self.messages = array('I')
+        self.counterparties = array('I')
+        self.references = array('I')
+        self.extend(transactions)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return '<%s with %d transactions>' % (self.__class__.__name__,
+                                             len(self))
+
+    def append(self, transaction: QIFTransaction):
+        value = transaction.value
+        sign, digits, exponent = value.as_tuple()
+        if not isinstance(exponent, int):
+            raise ValueError('Unable to store non-finite amount %r' % (
+                value,))
+        if (len(digits) > MAX_DIGITS or not EXCEPTIONAL < exponent < 128 or
+                sign and not any(digits)):
+            self.exceptional[len(self)] = value
+            amount, exponent = 0, EXCEPTIONAL
+        else:
+            amount = int(value.scaleb(-exponent))
+        intern = self.strings.intern
+        self.dates.append(transaction.date.toordinal())
+        self.amounts.append(amount)
+        self.exponents.append(exponent)
+        self.messages.append(intern(transaction.message))
+        self.counterparties.append(intern(transaction.counterparty))
+        self.references.append(intern(transaction.reference))
+
+    def extend(self, transactions: Iterable[QIFTransaction]):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def _build(self, index: int) -> QIFTransaction:
+        strings = self.strings
+        exponent = self.exponents[index]
+        if exponent == EXCEPTIONAL:
+            value = self.exceptional[index]
+        else:
+            value = Decimal(self.amounts[index]).scaleb(exponent)
+        return QIFTransaction(
+            date.fromordinal(self.dates[index]),
+            value,
+            strings[self.messages[index]],
+            strings[self.counterparties[index]],
+            strings[self.references[index]],
+        )
+
+    def __getitem__(self, index: int) -> QIFTransaction:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('transaction index out of range')
+        return self._build(index)
+
+    def __iter__(self) -> Iterator[QIFTransaction]:
+        for index in range(len(self)):
+            yield self._build(index)
+
+    def nbytes(self) -> int:
+        '''
+        Returns the size of the array buffers in bytes. The string table is
+        not included as it may be shared.
+        '''
+        columns = (self.dates, self.amounts, self.exponents, self.messages,
+                   self.counterparties, self.references)
+        return sum(column.itemsize * len(column) for column in columns)
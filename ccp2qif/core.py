@@ -1,106 +1,555 @@
 from __future__ import print_function
 from collections import namedtuple
-from functools import partial
-from os.path import splitext
-from typing import TextIO
-import codecs
+from contextlib import nullcontext
+from glob import has_magic
+from os.path import getsize, isdir, splitext
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterator, TextIO
 import logging
 import sys
 
-from gouge.colourcli import Simple
-from schwifty import IBAN
-
-from ccp2qif.util import UnicodeReader
 from ccp2qif.model import QIFTransaction, TransactionList, AccountInfo
-import ccp2qif.bil
-import ccp2qif.ccp
+from ccp2qif.detect import detect
+from ccp2qif.util import same_file
+
+if TYPE_CHECKING:
+    from ccp2qif.cache import ConversionCache
+    from ccp2qif.stats import ConversionStats
+
+# Modules which are only needed for some features (batch conversion, the
+# conversion cache, coloured logging) are imported where they are used to
+# keep the startup time of the CLI low.
 
 
 LOG = logging.getLogger(__name__)
 
 
+DEFAULT_DATE_FORMAT = '%d/%m/%Y'
+
+#: Number of characters collected by :py:func:`write_qif` before writing
+WRITE_BUFFER_SIZE = 256 * 1024
+
+
+def qif_account_header(account: AccountInfo) -> str:
+    '''
+    Renders the account block which starts a QIF file.
+    '''
+    return (
+        '!Account\n'
+        'N%s\n'
+        'D"%s"\n'
+        'TBank\n'
+        '^\n'
+        '!Type:Bank\n' % (account.account_number, account.description)
+    )
+
+
+def qif_record(transaction: QIFTransaction, date_text: str) -> str:
+    '''
+    Renders one transaction as QIF record using the already formatted date.
+    '''
+    record = 'D%s\nT%s\nM%s\n' % (date_text, transaction.value,
+                                  transaction.message)
+    if transaction.counterparty:
+        record += 'P%s\n' % transaction.counterparty
+    if transaction.reference:
+        record += 'N%s\n' % transaction.reference
+    return record + '^\n'
+
+
+def qif_chunks(transaction_list: TransactionList,
+               datefmt: str = DEFAULT_DATE_FORMAT,
+               buffer_size: int = WRITE_BUFFER_SIZE) -> Iterator[str]:
+    '''
+    Renders a transaction list as QIF and yields the text in chunks of about
+    *buffer_size* characters. The first chunk is the account header.
+
+    The transactions are consumed in a single pass, so
+    ``transaction_list.transactions`` may be a lazy iterator as returned by
+    the ``stream*`` functions of the parser modules.
+    '''
+    yield qif_account_header(transaction_list.account)
+    debug = LOG.isEnabledFor(logging.DEBUG)
+    dates = {}
+    chunks = []
+    size = 0
+    for transaction in transaction_list.transactions:
+        if debug:
+            LOG.debug('Writing transaction at %s', transaction.date)
+        date_text = dates.get(transaction.date)
+        if date_text is None:
+            date_text = transaction.date.strftime(datefmt)
+            dates[transaction.date] = date_text
+        record = qif_record(transaction, date_text)
+        chunks.append(record)
+        size += len(record)
+        if size >= buffer_size:
+            yield ''.join(chunks)
+            chunks.clear()
+            size = 0
+    if chunks:
+        yield ''.join(chunks)
+
+
 def write_qif(transaction_list: TransactionList, outfile: TextIO,
-              datefmt: str = '%d/%m/%Y'):
+              datefmt: str = DEFAULT_DATE_FORMAT,
+              buffer_size: int = WRITE_BUFFER_SIZE):
     '''
     Converts a transaction list to a QIF file
+
+    Records are collected and written to *outfile* in chunks of about
+    *buffer_size* characters (see :py:func:`qif_chunks`).
     '''
-    write = partial(print, file=outfile)
-    write('!Account')
-    write('N%s' % transaction_list.account.account_number)
-    write('D"%s"' % transaction_list.account.description)
-    write('TBank')
-    write('^')
-    write('!Type:Bank')
-    for transaction in transaction_list.transactions:
-        LOG.debug('Writing transaction at %s to %r',
-                  transaction.date, outfile.name)
-        write('D%s' % transaction.date.strftime(datefmt))
-        write('T%s' % transaction.value)
-        write('M%s' % transaction.message)
-        if transaction.counterparty:
-            write('P%s' % transaction.counterparty)
-        if transaction.reference:
-            write('N%s' % transaction.reference)
-        write('^')
-
-
-def convert(source_filename, target_filename, account_name=None):
-    _, _, extension = source_filename.lower().rpartition('.')
-
-    parser = None
-    for mod in (ccp2qif.bil, ccp2qif.ccp):
-        LOG.debug('Probing %r with %r', source_filename, mod)
-        with open(source_filename, encoding='cp1252') as infile:
-            try:
-                parser = mod.sniff(infile)
-            except Exception:
-                LOG.debug('Module %r was unable to process %r',
-                          mod, source_filename, exc_info=True)
-                continue
-        if parser:
-            break
+    LOG.debug('Writing QIF to %r', getattr(outfile, 'name', outfile))
+    for chunk in qif_chunks(transaction_list, datefmt, buffer_size):
+        outfile.write(chunk)
 
-    if not parser:
-        raise ValueError('No parser found for %r' % source_filename)
 
-    LOG.debug('Selected parser: %s:%s', parser.__module__, parser.__name__)
-    if not parser:
-        raise ValueError('No valid parser found')
+def write_csv(transaction_list: TransactionList, outfile: TextIO,
+              datefmt: str = None):
+    '''
+    Writes the transactions as normalised CSV: one header row, ISO dates,
+    amounts with a decimal point and the account number on each row.
+    *datefmt* is ignored.
+    '''
+    import csv
+    from ccp2qif.decode import iter_batches
+    writer = csv.writer(outfile)
+    writer.writerow(CSV_COLUMNS)
+    account_number = transaction_list.account.account_number
+    for batch in iter_batches(transaction_list.transactions):
+        writer.writerows([
+            (account_number, row.date.isoformat(), row.value, row.message,
+             row.counterparty, row.reference)
+            for row in batch
+        ])
+
+
+#: Columns written by :py:func:`write_csv`
+CSV_COLUMNS = ('account', 'date', 'amount', 'message', 'counterparty',
+               'reference')
+
+#: A writer for one output format. *writer* is a function or a
+#: ``"module:function"`` reference taking a transaction list, the open
+#: output file and ``datefmt``. Files are opened in binary mode if
+#: *encoding* is ``None``.
+OutputFormat = namedtuple('OutputFormat', 'name extensions encoding writer')
+
+OUTPUT_FORMATS = {fmt.name: fmt for fmt in (
+    OutputFormat('qif', ('.qif',), 'cp1252', write_qif),
+    OutputFormat('csv', ('.csv',), 'utf8', write_csv),
+    OutputFormat('arrow', ('.arrow', '.feather'), None,
+                 'ccp2qif.arrow:write_arrow'),
+    OutputFormat('parquet', ('.parquet', '.pq'), None,
+                 'ccp2qif.arrow:write_parquet'),
+)}
+
+
+def find_output_format(name: str = None,
+                       filename: str = None) -> OutputFormat:
+    '''
+    Returns the output format called *name*. Without a name, the format is
+    chosen by the extension of *filename*, falling back to QIF.
+
+    :raises ValueError: If there is no format called *name*.
+    '''
+    if name:
+        try:
+            return OUTPUT_FORMATS[name]
+        except KeyError:
+            raise ValueError('Unknown output format: %r' % name)
+    if filename:
+        extension = splitext(filename)[1].lower()
+        for fmt in OUTPUT_FORMATS.values():
+            if extension in fmt.extensions:
+                return fmt
+    return OUTPUT_FORMATS['qif']
+
+
+def output_extension(name: str = None) -> str:
+    '''
+    Returns the default file extension of the output format *name*.
+    '''
+    return find_output_format(name).extensions[0]
+
+
+def _open_output(fmt: OutputFormat, filename: str):
+    if fmt.encoding is None:
+        return open(filename, 'wb')
+    # The csv module does its own newline handling
+    newline = '' if fmt.name == 'csv' else None
+    return open(filename, 'w', encoding=fmt.encoding, newline=newline)
+
+
+def convert(source_filename, target_filename, account_name=None,
+            columnar=False, datefmt=DEFAULT_DATE_FORMAT,
+            cache: 'ConversionCache' = None, force=False,
+            normalise_counterparties=False, stats: 'ConversionStats' = None,
+            parallel: int = None, output_format: str = None):
+    '''
+    Converts the export *source_filename* to the QIF file *target_filename*.
+
+    Other output formats (see :py:data:`OUTPUT_FORMATS`) are selected with
+    *output_format* or by the extension of *target_filename*.
 
-    with open(source_filename, encoding='cp1252') as infile:
-        data = parser(infile, account_name)
+    If a *cache* is given, the conversion is skipped when the same input was
+    already converted with the same options, unless *force* is true.
 
-    with open(target_filename, 'w', encoding='cp1252') as out:
-        write_qif(data, out)
+    If *normalise_counterparties* is true, counterparty accounts which are
+    valid IBANs are written in their printed form.
+
+    If *stats* is given, timings and counters of the conversion are
+    collected into it (see :py:mod:`ccp2qif.stats`). They are also collected
+    when statistics hooks are registered.
+
+    If *parallel* is given, large CSV and BILnet exports are parsed with
+    that many processes (see :py:mod:`ccp2qif.parallel`).
+    '''
+    from ccp2qif import stats as stats_module
+    fmt = find_output_format(output_format, target_filename)
+    if stats is None and stats_module.has_hooks():
+        stats = stats_module.ConversionStats()
+    if stats is None:
+        _convert(source_filename, target_filename, account_name, columnar,
+                 datefmt, cache, force, normalise_counterparties, None,
+                 parallel, fmt)
+        return
+    stats.source = source_filename
+    stats.target = target_filename
+    with stats_module.collecting(stats):
+        _convert(source_filename, target_filename, account_name, columnar,
+                 datefmt, cache, force, normalise_counterparties, stats,
+                 parallel, fmt)
+    stats.count('bytes_read', getsize(source_filename))
+    stats.count('bytes_written', getsize(target_filename))
+    stats_module.publish(stats)
+
+
+def _convert(source_filename, target_filename, account_name, columnar,
+             datefmt, cache, force, normalise_counterparties, stats,
+             parallel, fmt):
+    with open(source_filename, 'rb') as infile:
+        with _stage(stats, 'detect'):
+            parser = detect(infile, source_filename)
+        if not parser:
+            raise ValueError('No parser found for %r' % source_filename)
+        parser_name = '%s:%s' % (parser.__module__, parser.__name__)
+        LOG.debug('Selected parser: %s', parser_name)
+        if stats:
+            stats.parser = parser_name
+
+        key = None
+        if cache:
+            from ccp2qif.cache import cache_key, file_hash
+            with _stage(stats, 'cache'):
+                key = cache_key(file_hash(infile), parser, {
+                    'account_name': account_name,
+                    'datefmt': datefmt,
+                    'normalise_counterparties': normalise_counterparties,
+                    'output_format': fmt.name,
+                })
+                restored = not force and cache.restore(key, target_filename)
+            if restored:
+                LOG.info('%r is up to date (cached)', target_filename)
+                if stats:
+                    stats.cached = True
+                return
+
+        if parallel:
+            from ccp2qif.parallel import parallel_parser, supports
+            if supports(parser):
+                parser = parallel_parser(parser, workers=parallel)
+            else:
+                LOG.info('Parallel parsing is not supported for %s, '
+                         'parsing sequentially', parser_name)
+
+        convert_file(parser, infile, target_filename, account_name,
+                     columnar=columnar, datefmt=datefmt,
+                     normalise_counterparties=normalise_counterparties,
+                     stats=stats, output_format=fmt)
+    if key:
+        cache.store(key, target_filename)
+
+
+def _stage(stats, name):
+    if stats is None:
+        return nullcontext()
+    return stats.stage(name)
+
+
+def convert_file(parser, infile, target_filename, account_name=None,
+                 columnar=False, datefmt=DEFAULT_DATE_FORMAT,
+                 normalise_counterparties=False,
+                 stats: 'ConversionStats' = None,
+                 output_format: OutputFormat = None):
+    '''
+    Runs *parser* on the already opened *infile* and writes the result as
+    QIF (or *output_format*) to *target_filename*. If *columnar* is true,
+    the parser decodes the rows in NumPy-backed batches.
+    '''
+    fmt = output_format or OUTPUT_FORMATS['qif']
+    write = fmt.writer
+    if isinstance(write, str):
+        from ccp2qif.registry import load_object
+        write = load_object(write)
+    # The parser yields transactions lazily, so the source file must stay
+    # open until everything has been written.
+    with _open_output(fmt, target_filename) as out:
+        if stats is None:
+            data = parser(infile, account_name, columnar=columnar,
+                          normalise_counterparties=normalise_counterparties)
+            write(data, out, datefmt=datefmt)
+        else:
+            # Parsing happens while the transactions are consumed, so the
+            # time spent producing them is taken out of the write stage.
+            with stats.stage('parse'):
+                data = parser(
+                    infile, account_name, columnar=columnar,
+                    normalise_counterparties=normalise_counterparties)
+            data = TransactionList(data.account,
+                                   stats.timed(data.transactions, 'parse'))
+            parse_before = dict(stats.stages['parse'])
+            with stats.stage('write'):
+                write(data, out, datefmt=datefmt)
+            write_stage = stats.stages['write']
+            for key in ('wall', 'cpu'):
+                write_stage[key] -= (stats.stages['parse'][key] -
+                                     parse_before[key])
         LOG.info('Written to %r' % target_filename)
 
 
+def convert_stream(source, account_name=None, columnar=False,
+                   datefmt=DEFAULT_DATE_FORMAT,
+                   normalise_counterparties=False, filename=None,
+                   encoding='cp1252',
+                   buffer_size=WRITE_BUFFER_SIZE) -> Iterator[bytes]:
+    '''
+    Converts an export held in memory and yields the encoded QIF output in
+    chunks of about *buffer_size* characters.
+
+    *source* is a bytes-like object (:py:class:`bytes`,
+    :py:class:`bytearray`, :py:class:`memoryview`, ...) or a seekable binary
+    file object. *filename* is only used to help format detection by its
+    extension. Nothing is written to disk.
+
+    :raises ValueError: if the format of the source is not recognised. As
+        this is a generator, the error is raised by the first ``next()``.
+    '''
+    from ccp2qif.util import open_bytes
+    infile = source if hasattr(source, 'read') else open_bytes(source)
+    parser = detect(infile, filename)
+    if not parser:
+        raise ValueError('No parser found for %r' % (filename or 'input'))
+    data = parser(infile, account_name, columnar=columnar,
+                  normalise_counterparties=normalise_counterparties)
+    for chunk in qif_chunks(data, datefmt, buffer_size):
+        yield chunk.encode(encoding)
+
+
+def convert_bytes(source, account_name=None, **kwargs) -> bytes:
+    '''
+    Like :py:func:`convert_stream`, but returns the complete QIF document.
+    '''
+    return b''.join(convert_stream(source, account_name, **kwargs))
+
+
+def add_logging_arguments(parser):
+    '''
+    Adds the options controlling the log output to an argument *parser*.
+    '''
+    parser.add_argument('-v', '--verbose', dest='log_level',
+                        action='store_const', const='DEBUG',
+                        help='Show debug messages. Same as --log-level '
+                        'DEBUG.')
+    parser.add_argument('--log-level', dest='log_level', default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='The minimum level of log messages to show '
+                        '(default: %(default)s).')
+
+
 def setup_logging(args):
-    Simple.basicConfig(level=logging.DEBUG)
+    from gouge.colourcli import Simple
+    level = getattr(args, 'log_level', None) or 'INFO'
+    Simple.basicConfig(level=getattr(logging, level))
+
+
+def print_formats(stream: TextIO):
+    '''
+    Prints the registered input formats to *stream*.
+    '''
+    from ccp2qif.registry import default_registry
+    registry = default_registry()
+    registry.load_plugins()
+    for fmt in registry.formats:
+        print('%-14s %s' % (fmt.name, fmt.description), file=stream)
+        print('%-14s   extensions: %s, probe cost: %d' % (
+            '', ' '.join(fmt.extensions) or '-', fmt.cost), file=stream)
 
 
 def climain():
     from argparse import ArgumentParser
+    from ccp2qif.cache import DEFAULT_MAX_AGE, DEFAULT_MAX_BYTES
     parser = ArgumentParser()
+    add_logging_arguments(parser)
     parser.add_argument('-n', '--account-name', dest='account_name',
                         help='The name of the account for this import',
                         default=None)
     parser.add_argument('-o', '--outfile', dest='outfile',
-                        help='The output file.', default=None)
-    parser.add_argument('infile', nargs=1)
+                        help='The output file. When converting more than '
+                        'one file, this is the folder receiving the QIF '
+                        'files.', default=None)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+                        help='Number of worker processes used when '
+                        'converting more than one file (default: number of '
+                        'CPUs).')
+    parser.add_argument('--parallel', dest='parallel', type=int,
+                        default=None, metavar='N',
+                        help='Parse a large CSV or BILnet export with N '
+                        'processes.')
+    parser.add_argument('--columnar', action='store_true', default=False,
+                        help='Decode dates and amounts in batches using '
+                        'NumPy. Faster on very large files.')
+    parser.add_argument('--format', dest='output_format', default=None,
+                        choices=sorted(OUTPUT_FORMATS),
+                        help='The output format. By default it is chosen '
+                        'by the extension of the output file, falling back '
+                        'to QIF.')
+    parser.add_argument('--date-format', dest='datefmt',
+                        default=DEFAULT_DATE_FORMAT,
+                        help='The format of dates in the QIF file '
+                        '(default: %(default)s).')
+    parser.add_argument('--normalise-iban', dest='normalise_counterparties',
+                        action='store_true', default=False,
+                        help='Write counterparty accounts which are valid '
+                        'IBANs in their printed form.')
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None,
+                        help='Keep converted files in this folder and skip '
+                        'conversions of unchanged inputs.')
+    parser.add_argument('--cache-max-size', dest='cache_max_size', type=int,
+                        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Maximum size of the cache in MiB '
+                        '(default: %(default)s).')
+    parser.add_argument('--cache-max-age', dest='cache_max_age', type=int,
+                        default=DEFAULT_MAX_AGE // (24 * 3600),
+                        help='Remove cache entries unused for this many '
+                        'days (default: %(default)s).')
+    parser.add_argument('-f', '--force', action='store_true', default=False,
+                        help='Convert even if the cache is up to date.')
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help='Print timings and counters of the conversion '
+                        'as JSON to standard error.')
+    parser.add_argument('--stats-file', dest='stats_file', default=None,
+                        help='Write the statistics as JSON to this file '
+                        'instead (implies --stats).')
+    parser.add_argument('--list-formats', action='store_true',
+                        default=False,
+                        help='List the supported input formats and exit.')
+    parser.add_argument('infile', nargs='*',
+                        help='Files to convert. Folders and glob patterns '
+                        'are expanded to the files they contain.')
     args = parser.parse_args()
     setup_logging(args)
 
+    if args.list_formats:
+        print_formats(sys.stdout)
+        return 0
+    if not args.infile:
+        parser.error('At least one input file is required')
+
+    options = {
+        'account_name': args.account_name,
+        'columnar': args.columnar,
+        'datefmt': args.datefmt,
+        'force': args.force,
+        'normalise_counterparties': args.normalise_counterparties,
+        'parallel': args.parallel,
+        'output_format': args.output_format,
+    }
+    if args.cache_dir:
+        from ccp2qif.cache import ConversionCache
+        options['cache'] = ConversionCache(
+            args.cache_dir,
+            max_bytes=args.cache_max_size * 1024 * 1024,
+            max_age=args.cache_max_age * 24 * 3600)
+
+    is_batch = len(args.infile) > 1 or any(
+        isdir(name) or has_magic(name) for name in args.infile)
+    if is_batch:
+        return batch_main(args, options)
+
     if args.outfile:
         outfile = args.outfile
     else:
-        base, ext = splitext(args.infile[0])
-        if ext.lower() == 'qif':
-            print('Error: The input file seems to be a qif file already!',
-                  file=sys.stderr)
-            return 9
-        outfile = '{0}.qif'.format(base)
-
-    convert(args.infile[0],
-            outfile,
-            account_name=args.account_name)
+        base, _ = splitext(args.infile[0])
+        outfile = base + output_extension(args.output_format)
+    if same_file(args.infile[0], outfile):
+        print('Error: The input file seems to be a %s file already!' %
+              find_output_format(args.output_format, outfile).name,
+              file=sys.stderr)
+        return 9
+
+    stats = None
+    if args.stats or args.stats_file:
+        from ccp2qif.stats import ConversionStats
+        stats = ConversionStats()
+    convert(args.infile[0], outfile, stats=stats, **options)
+    if stats:
+        write_stats(stats.as_dict(), args.stats_file)
+
+
+def write_stats(report, filename=None):
+    '''
+    Writes a statistics *report* as JSON to *filename*, or to standard error
+    if no file name is given.
+    '''
+    import json
+    if filename:
+        with open(filename, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+    else:
+        json.dump(report, sys.stderr, indent=2)
+        print(file=sys.stderr)
+
+
+def batch_main(args, options):
+    from ccp2qif.batch import (
+        BatchJob,
+        collect_inputs,
+        convert_batch,
+        print_report,
+        target_filename,
+    )
+    output_format = find_output_format(args.output_format)
+    infiles = collect_inputs(args.infile, output_format.extensions)
+    if args.outfile and not isdir(args.outfile):
+        print('Error: %r must be an existing folder when converting more '
+              'than one file!' % args.outfile, file=sys.stderr)
+        return 9
+    # Batch conversions already use one process per file
+    options = dict(options, parallel=None)
+    jobs = [BatchJob(infile,
+                     target_filename(infile, args.outfile,
+                                     output_format.extensions[0]),
+                     options)
+            for infile in infiles]
+    overwritten = [job.source for job in jobs
+                   if same_file(job.source, job.target)]
+    if overwritten:
+        print('Error: Converting %s would overwrite the input!' %
+              ', '.join(map(repr, overwritten)), file=sys.stderr)
+        return 9
+    start = perf_counter()
+    collect_stats = args.stats or args.stats_file
+    try:
+        results = convert_batch(jobs, workers=args.jobs,
+                                collect_stats=bool(collect_stats))
+    except ValueError as exc:
+        print('Error: %s' % exc, file=sys.stderr)
+        return 9
+    print_report(results, perf_counter() - start, sys.stderr)
+    if collect_stats:
+        write_stats([result.stats for result in results if result.stats],
+                    args.stats_file)
+    if any(result.error for result in results):
+        return 1
+    return 0
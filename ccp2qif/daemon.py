@@ -0,0 +1,443 @@
+'''
+A resident conversion service watching an inbox folder.
+
+New exports dropped into the inbox are queued and converted by a pool of
+worker processes which have the parsers already imported. The QIF files are
+written to a temporary name in the outbox and renamed once complete, so
+consumers never see partial files. Processed exports are moved to the
+``processed`` (or ``failed``) sub-folder of the inbox.
+
+The inbox is watched with inotify on Linux. Elsewhere (or with
+``--polling``) it is scanned periodically; files are only picked up once
+their size and modification time are stable between two scans.
+
+The queue is bounded: when it is full, the watcher waits, and files not
+yet taken are found again by the next scan. A status endpoint on a local
+Unix socket reports queue depth and throughput as JSON::
+
+    $ ccp2qifd inbox outbox --status-socket /tmp/ccp2qifd.sock &
+    $ python -c "import socket; s = socket.socket(socket.AF_UNIX); \\
+        s.connect('/tmp/ccp2qifd.sock'); print(s.recv(4096).decode())"
+'''
+from concurrent.futures import ProcessPoolExecutor
+from os import listdir, makedirs, replace, stat, unlink
+from os.path import basename, exists, isfile, join, split, splitext
+from queue import Empty, Full, Queue
+from socketserver import BaseRequestHandler, ThreadingUnixStreamServer
+from threading import BoundedSemaphore, Event, Lock, Thread
+from time import monotonic
+from typing import Callable, Dict
+import ctypes
+import ctypes.util
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import struct
+import sys
+
+LOG = logging.getLogger(__name__)
+
+PROCESSED_FOLDER = 'processed'
+FAILED_FOLDER = 'failed'
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_candidate(name: str) -> bool:
+    '''
+    Tells whether a file in the inbox should be converted. Hidden files and
+    files which are still being written by tools using temporary names are
+    ignored.
+    '''
+    return not (name.startswith('.') or name.endswith(('.tmp', '.part')) or
+                splitext(name)[1].lower() == '.qif')
+
+
+class PollingWatcher:
+    '''
+    Finds new files by scanning the folder every *interval* seconds.
+    '''
+
+    def __init__(self, folder: str, interval: float = 2.0):
+        self.folder = folder
+        self.interval = interval
+        self.seen: Dict[str, tuple] = {}
+
+    def scan(self):
+        '''
+        Returns the files whose size and modification time have not changed
+        since the previous scan.
+        '''
+        current = {}
+        for name in listdir(self.folder):
+            path = join(self.folder, name)
+            if not is_candidate(name) or not isfile(path):
+                continue
+            info = stat(path)
+            current[name] = (info.st_size, info.st_mtime_ns)
+        stable = [join(self.folder, name) for name, state in current.items()
+                  if self.seen.get(name) == state]
+        self.seen = current
+        return sorted(stable)
+
+    def run(self, stop: Event, callback: Callable[[str], None]):
+        while not stop.is_set():
+            for path in self.scan():
+                callback(path)
+            stop.wait(self.interval)
+
+
+class InotifyWatcher:
+    '''
+    Receives new files from the Linux kernel through inotify. Files which
+    already exist on start-up, or which are missed because of an event
+    queue overflow, are found by a full scan. As they may still be open for
+    writing, they are only passed on once their size and modification time
+    are stable for *settle_interval* seconds.
+    '''
+
+    def __init__(self, folder: str, settle_interval: float = 1.0):
+        self.folder = folder
+        self.settle_interval = settle_interval
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError('libc not found')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        watch = libc.inotify_add_watch(self.fd, folder.encode(),
+                                       IN_CLOSE_WRITE | IN_MOVED_TO)
+        if watch < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+    def _events(self, data):
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            yield mask, os.fsdecode(name)
+
+    def run(self, stop: Event, callback: Callable[[str], None]):
+        settling = PollingWatcher(self.folder)
+        settling.scan()
+        unsettled = True
+        next_scan = monotonic() + self.settle_interval
+        try:
+            while not stop.is_set():
+                if unsettled and monotonic() >= next_scan:
+                    stable = settling.scan()
+                    for path in stable:
+                        callback(path)
+                    # Keep scanning while some of the files are changing
+                    unsettled = len(stable) < len(settling.seen)
+                    next_scan = monotonic() + self.settle_interval
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+                if not readable:
+                    continue
+                data = os.read(self.fd, 64 * 1024)
+                for mask, name in self._events(data):
+                    if mask & IN_Q_OVERFLOW:
+                        LOG.warning('inotify queue overflow, rescanning')
+                        settling.scan()
+                        unsettled = True
+                        next_scan = monotonic() + self.settle_interval
+                    elif mask & IN_ISDIR:
+                        continue
+                    elif name and is_candidate(name):
+                        callback(join(self.folder, name))
+        finally:
+            os.close(self.fd)
+
+
+def _warm_up():
+    '''
+    Imports everything a conversion needs when a worker process starts, so
+    the first file does not pay for it.
+    '''
+    import ccp2qif.bil  # NOQA
+    import ccp2qif.ccp  # NOQA
+    import ccp2qif.core  # NOQA
+    import ccp2qif.spreadsheet  # NOQA
+
+
+def _convert(source: str, target: str, options: dict):
+    '''
+    Converts *source* into a temporary file next to *target* and renames it
+    once complete.
+    '''
+    from ccp2qif.core import convert
+    folder, name = split(target)
+    temporary = join(folder, '.%s.tmp' % name)
+    try:
+        convert(source, temporary, **options)
+        replace(temporary, target)
+    finally:
+        if exists(temporary):
+            unlink(temporary)
+
+
+class ConversionService:
+    '''
+    Converts the files dropped into *inbox* and writes the QIF files to
+    *outbox*.
+
+    :param workers: Number of worker processes.
+    :param queue_size: Maximum number of files waiting for a worker.
+    :param options: Keyword arguments for :py:func:`ccp2qif.core.convert`.
+    :param polling: Scan the inbox instead of using inotify.
+    '''
+
+    def __init__(self, inbox: str, outbox: str, workers: int = None,
+                 queue_size: int = 100, options: dict = None,
+                 polling: bool = False, poll_interval: float = 2.0):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers or os.cpu_count() or 1
+        self.options = options or {}
+        self.queue = Queue(maxsize=queue_size)
+        self.stop_event = Event()
+        self.lock = Lock()
+        self.known = set()
+        self.claimed = set()
+        self.slots = BoundedSemaphore(self.workers * 2)
+        self.counters = {'processed': 0, 'failed': 0, 'in_progress': 0}
+        self.started = None
+        self.threads = []
+        self.pool = None
+        for folder in (outbox, join(inbox, PROCESSED_FOLDER),
+                       join(inbox, FAILED_FOLDER)):
+            makedirs(folder, exist_ok=True)
+        self.watcher = None
+        if not polling:
+            try:
+                self.watcher = InotifyWatcher(inbox)
+            except OSError as exc:
+                LOG.info('inotify unavailable (%s), using polling', exc)
+        if self.watcher is None:
+            self.watcher = PollingWatcher(inbox, poll_interval)
+
+    def enqueue(self, path: str):
+        '''
+        Queues *path* unless it is already queued or being converted. Blocks
+        while the queue is full.
+        '''
+        with self.lock:
+            if path in self.known:
+                return
+            self.known.add(path)
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(path, timeout=0.5)
+                LOG.debug('Queued %r', path)
+                return
+            except Full:
+                continue
+
+    def _dispatch(self):
+        while not self.stop_event.is_set():
+            try:
+                path = self.queue.get(timeout=0.5)
+            except Empty:
+                continue
+            # Limit the number of files handed to the pool so that the
+            # bounded queue, not the pool, holds the backlog.
+            while not self.slots.acquire(timeout=0.5):
+                if self.stop_event.is_set():
+                    return
+            target = self.claim_target(path)
+            with self.lock:
+                self.counters['in_progress'] += 1
+            future = self.pool.submit(_convert, path, target, self.options)
+            future.add_done_callback(
+                lambda future, path=path, target=target:
+                self._done(path, target, future))
+
+    def claim_target(self, path: str) -> str:
+        '''
+        Reserves the name of the QIF file for *path* in the outbox. Exports
+        sharing a base name (``a.csv`` and ``a.txt``) or clashing with an
+        existing file get a numbered name (``a-1.qif``) instead of
+        overwriting each other.
+        '''
+        base, _ = splitext(basename(path))
+        target = join(self.outbox, base + '.qif')
+        counter = 0
+        with self.lock:
+            while target in self.claimed or exists(target):
+                counter += 1
+                target = join(self.outbox, '%s-%d.qif' % (base, counter))
+            self.claimed.add(target)
+        return target
+
+    def _done(self, path, target, future):
+        error = future.exception()
+        if error:
+            LOG.error('Unable to convert %r: %s', path, error)
+            folder = FAILED_FOLDER
+        else:
+            LOG.info('Converted %r', path)
+            folder = PROCESSED_FOLDER
+        try:
+            replace(path, join(self.inbox, folder, basename(path)))
+        except OSError:
+            LOG.warning('Unable to move %r out of the inbox', path,
+                        exc_info=True)
+        with self.lock:
+            self.counters['in_progress'] -= 1
+            self.counters['failed' if error else 'processed'] += 1
+            self.known.discard(path)
+            self.claimed.discard(target)
+        self.slots.release()
+
+    def status(self) -> dict:
+        '''
+        Returns a snapshot of the queue and the throughput.
+        '''
+        with self.lock:
+            status = dict(self.counters)
+        uptime = monotonic() - self.started if self.started else 0
+        done = status['processed'] + status['failed']
+        status.update({
+            'queued': self.queue.qsize(),
+            'workers': self.workers,
+            'uptime': uptime,
+            'files_per_second': done / uptime if uptime else 0,
+            'watcher': self.watcher.__class__.__name__,
+        })
+        return status
+
+    def start(self):
+        self.started = monotonic()
+        # The workers are started from the dispatcher thread while the other
+        # threads run; forking then could copy locks held by those threads
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in methods else 'spawn')
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=context,
+                                        initializer=_warm_up)
+        for target in (self._dispatch,
+                       lambda: self.watcher.run(self.stop_event,
+                                                self.enqueue)):
+            thread = Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        if self.pool:
+            self.pool.shutdown(wait=True)
+
+
+class StatusHandler(BaseRequestHandler):
+    '''
+    Sends the service status as one JSON document and closes the
+    connection.
+    '''
+
+    def handle(self):
+        status = self.server.service.status()
+        self.request.sendall(json.dumps(status).encode('utf8') + b'\n')
+
+
+def serve_status(service: ConversionService,
+                 path: str) -> ThreadingUnixStreamServer:
+    '''
+    Starts the status endpoint for *service* on the Unix socket *path*.
+    '''
+    if exists(path):
+        unlink(path)
+    server = ThreadingUnixStreamServer(path, StatusHandler)
+    server.daemon_threads = True
+    server.service = service
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    from argparse import ArgumentParser
+    from ccp2qif.core import (
+        DEFAULT_DATE_FORMAT,
+        add_logging_arguments,
+        setup_logging,
+    )
+
+    parser = ArgumentParser(description='Watches an inbox folder and '
+                            'converts new exports to QIF.')
+    add_logging_arguments(parser)
+    parser.add_argument('-n', '--account-name', dest='account_name',
+                        default=None,
+                        help='The name of the account for all imports')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+                        help='Number of worker processes (default: number '
+                        'of CPUs).')
+    parser.add_argument('--queue-size', dest='queue_size', type=int,
+                        default=100,
+                        help='Maximum number of files waiting for a worker '
+                        '(default: %(default)s).')
+    parser.add_argument('--date-format', dest='datefmt',
+                        default=DEFAULT_DATE_FORMAT,
+                        help='The format of dates in the QIF file '
+                        '(default: %(default)s).')
+    parser.add_argument('--polling', action='store_true', default=False,
+                        help='Scan the inbox periodically instead of using '
+                        'inotify.')
+    parser.add_argument('--poll-interval', dest='poll_interval', type=float,
+                        default=2.0,
+                        help='Seconds between two scans when polling '
+                        '(default: %(default)s).')
+    parser.add_argument('--status-socket', dest='status_socket',
+                        default=None,
+                        help='Serve the status as JSON on this Unix socket.')
+    parser.add_argument('inbox')
+    parser.add_argument('outbox')
+    args = parser.parse_args()
+    setup_logging(args)
+
+    service = ConversionService(
+        args.inbox, args.outbox, workers=args.jobs,
+        queue_size=args.queue_size, polling=args.polling,
+        poll_interval=args.poll_interval,
+        options={'account_name': args.account_name,
+                 'datefmt': args.datefmt})
+    server = None
+    if args.status_socket:
+        server = serve_status(service, args.status_socket)
+
+    stopped = Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    service.start()
+    LOG.info('Watching %r using %s', args.inbox,
+             service.watcher.__class__.__name__)
+    while not stopped.wait(1):
+        pass
+    LOG.info('Shutting down')
+    service.stop()
+    if server:
+        server.shutdown()
+        server.server_close()
+        unlink(args.status_socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
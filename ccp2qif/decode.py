@@ -0,0 +1,130 @@
+'''
+Fast decoders for the fixed date and amount formats used in the exports.
+
+The banks always write dates zero-padded (``09/03/2018``) and amounts with
+a European notation (``-1.234,56``). These helpers take advantage of that
+and only fall back to :py:func:`datetime.strptime` for values which do not
+fit the fixed-width layout, so the result is always identical to the
+generic implementation.
+
+The ``*_columnar`` functions decode a whole column at once using NumPy. They
+are only used when explicitly requested as NumPy is an optional dependency.
+'''
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+#: Number of rows decoded at once in columnar mode
+BATCH_SIZE = 10000
+
+#: Translation table turning ``-1.234,56`` into ``-1234.56``
+EU_AMOUNT_TABLE = str.maketrans({'.': None, ',': '.'})
+
+
+class DateDecoder:
+    '''
+    Decodes dates in the format ``<DD><sep><MM><sep><YYYY>``. Exports contain
+    many transactions on the same day, so decoded values are cached for the
+    lifetime of the decoder (typically one file).
+
+    :param fmt: The :py:func:`~datetime.datetime.strptime` format which is
+        used for values which are not fixed-width (for example
+        ``'%d/%m/%Y'``).
+    '''
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.separator = fmt[2]
+        self.cache: Dict[str, date] = {}
+
+    def __call__(self, text: str) -> date:
+        try:
+            return self.cache[text]
+        except KeyError:
+            pass
+        output = self._decode(text)
+        self.cache[text] = output
+        return output
+
+    def _decode(self, text: str) -> date:
+        sep = self.separator
+        if len(text) == 10 and text[2] == sep and text[5] == sep:
+            digits = text[:2] + text[3:5] + text[6:]
+            if digits.isascii() and digits.isdigit():
+                return date(int(text[6:]), int(text[3:5]), int(text[:2]))
+        return datetime.strptime(text, self.fmt).date()
+
+
+def decode_amount(text: str) -> Decimal:
+    '''
+    Decodes an amount in European notation (``-1.234,56``).
+    '''
+    return Decimal(text.translate(EU_AMOUNT_TABLE))
+
+
+def decode_amounts(values: Sequence[str]) -> List[Decimal]:
+    '''
+    Decodes a batch of amounts in European notation. The whole batch is
+    normalised with one call to :py:meth:`str.translate`.
+    '''
+    if not values:
+        return []
+    normalised = '\n'.join(values).translate(EU_AMOUNT_TABLE).split('\n')
+    return [Decimal(value) for value in normalised]
+
+
+def decode_dates_columnar(values: Sequence[str], fmt: str) -> List[date]:
+    '''
+    Decodes a batch of dates (see :py:class:`DateDecoder`) using vectorised
+    NumPy operations. Batches containing values which are not fixed-width
+    are decoded with :py:class:`DateDecoder` instead.
+
+    :raises ImportError: If NumPy is not installed.
+    '''
+    import numpy
+
+    if not values:
+        return []
+    joined = ''.join(values)
+    sep = fmt[2]
+    if len(joined) != 10 * len(values) or not joined.isascii():
+        return _decode_fallback(values, fmt)
+
+    chars = numpy.frombuffer(joined.encode('ascii'), dtype=numpy.uint8)
+    chars = chars.reshape(-1, 10)
+    digits = chars[:, [0, 1, 3, 4, 6, 7, 8, 9]].astype(numpy.int64) - 48
+    separators = chars[:, [2, 5]]
+    if ((digits < 0) | (digits > 9)).any() or (separators != ord(sep)).any():
+        return _decode_fallback(values, fmt)
+
+    days = digits[:, 0] * 10 + digits[:, 1]
+    months = digits[:, 2] * 10 + digits[:, 3]
+    years = (digits[:, 4] * 1000 + digits[:, 5] * 100 +
+             digits[:, 6] * 10 + digits[:, 7])
+    if ((months < 1) | (months > 12) | (days < 1) | (years < 1)).any():
+        return _decode_fallback(values, fmt)
+
+    month_starts = ((years - 1970) * 12 + (months - 1)).astype('M8[M]')
+    result = month_starts.astype('M8[D]') + (days - 1).astype('m8[D]')
+    # Days overflowing into the next month (like 31/04) are invalid
+    if (result.astype('M8[M]') != month_starts).any():
+        return _decode_fallback(values, fmt)
+    return result.astype(object).tolist()
+
+
+def _decode_fallback(values: Sequence[str], fmt: str) -> List[date]:
+    decoder = DateDecoder(fmt)
+    return [decoder(value) for value in values]
+
+
+def iter_batches(rows: Iterable, size: int = BATCH_SIZE) -> Iterator[List]:
+    '''
+    Splits *rows* into lists of at most *size* elements.
+    '''
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
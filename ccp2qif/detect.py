@@ -0,0 +1,24 @@
+'''
+File-type detection based on the leading bytes of an export.
+
+The header of the file is read once and looked up in the signature index of
+the format registry (see :py:mod:`ccp2qif.registry`), so the cost of
+detection does not depend on the size of the file. Heavy dependencies of
+the parsers are only imported once a file of their format has been
+detected.
+'''
+from typing import BinaryIO, Callable, Optional
+
+from ccp2qif.registry import default_registry
+
+
+def detect(infile: BinaryIO,
+           filename: Optional[str] = None) -> Optional[Callable]:
+    '''
+    Returns a parser for the already opened file *infile* or ``None`` if no
+    parser recognises it. The file is rewound before returning, so it can be
+    passed on to the parser directly. *filename* is used to prioritise
+    expensive probes if the file type can not be determined from its magic
+    bytes.
+    '''
+    return default_registry().find_parser(infile, filename)
@@ -0,0 +1,36 @@
+'''
+Memoised IBAN validation and formatting.
+
+Batch runs validate the same few account numbers over and over, so results
+are kept in a bounded LRU cache. :py:mod:`schwifty` (whose registry takes a
+noticeable time to load) is only imported when the first IBAN needs to be
+validated.
+'''
+from functools import lru_cache
+from typing import Optional
+
+#: Maximum number of distinct values remembered by :py:func:`normalise_iban`
+IBAN_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=IBAN_CACHE_SIZE)
+def normalise_iban(text: str) -> Optional[str]:
+    '''
+    Returns *text* in the printed IBAN format (``LU28 0019 4006 4475 0000``)
+    or ``None`` if it is not a valid IBAN.
+    '''
+    if not text or not text.strip():
+        return None
+    from schwifty import IBAN
+    try:
+        return IBAN(text).formatted
+    except ValueError:
+        return None
+
+
+def normalise_counterparty(text: str) -> str:
+    '''
+    Formats *text* as IBAN if it is a valid one, otherwise it is returned
+    unchanged (counterparty accounts are not always IBANs).
+    '''
+    return normalise_iban(text) or text
@@ -0,0 +1,292 @@
+'''
+A local SQLite store collecting the transactions of many exports.
+
+Exports are ingested once and any account and date range can then be
+written to QIF without parsing the original files again::
+
+    $ ccp2qif_ledger ledger.db ingest exports/*.csv
+    $ ccp2qif_ledger ledger.db export -a "LU12 3456 7890 1234 5678" \\
+        --from 2018-07-01 --to 2018-09-30 -o q3.qif
+
+Transactions are identified like in :py:mod:`ccp2qif.merge`: by a digest of
+date, value, reference and message, plus the number of times the same
+transaction occurred before in the same export. Ingesting a file twice, or
+exports with overlapping date ranges, therefore does not create duplicates,
+while identical payments on the same day are kept.
+
+Rows are inserted in batches with :py:meth:`sqlite3.Cursor.executemany`, one
+database transaction per export.
+'''
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Tuple
+import logging
+import sqlite3
+import sys
+
+from ccp2qif.decode import BATCH_SIZE, iter_batches
+from ccp2qif.merge import transaction_digest
+from ccp2qif.model import AccountInfo, QIFTransaction, TransactionList
+
+LOG = logging.getLogger(__name__)
+
+#: Size of the SQLite page cache
+CACHE_KIB = 64 * 1024
+
+#: Incremented whenever the layout of the database changes
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS accounts (
+    account_number TEXT PRIMARY KEY,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    account_number TEXT NOT NULL REFERENCES accounts (account_number),
+    date TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    message TEXT NOT NULL,
+    counterparty TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    occurrence INTEGER NOT NULL
+);
+-- The digest includes the date, so the date does not change what is
+-- unique. Leading with it keeps inserts of date-ordered exports local and
+-- serves the range queries of the exports.
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_account_date
+    ON transactions (account_number, date, digest, occurrence);
+'''
+
+INSERT = '''
+INSERT OR IGNORE INTO transactions (
+    account_number, date, amount, message, counterparty, reference, digest,
+    occurrence)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class Occurrences:
+    '''
+    Numbers repeated occurrences of the same transaction within one export.
+
+    The counts are kept for the whole export, as exports are not
+    necessarily ordered by date. The digest includes the date, so the
+    number of counts is bounded by the number of distinct transactions of
+    the export.
+    '''
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+
+    def __call__(self, digest: bytes) -> int:
+        occurrence = self.counts[digest]
+        self.counts[digest] = occurrence + 1
+        return occurrence
+
+
+class Ledger:
+    '''
+    The transaction store in the SQLite database *filename*.
+    '''
+
+    def __init__(self, filename: str):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA cache_size = -%d' % CACHE_KIB)
+        version, = self.connection.execute('PRAGMA user_version').fetchone()
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError('%r uses schema version %d, expected %d' % (
+                filename, version, SCHEMA_VERSION))
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('PRAGMA user_version = %d' %
+                                    SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def ingest(self, transaction_list: TransactionList,
+               batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+        '''
+        Stores the transactions of one export. Returns the number of
+        transactions read and the number of those which were new.
+        '''
+        account = transaction_list.account
+        occurrences = Occurrences()
+        read = 0
+        connection = self.connection
+        with connection:
+            connection.execute(
+                'INSERT INTO accounts (account_number, description) '
+                'VALUES (?, ?) ON CONFLICT (account_number) DO UPDATE SET '
+                'description = excluded.description '
+                "WHERE excluded.description != ''",
+                (account.account_number, account.description))
+            changes = connection.total_changes
+            for batch in iter_batches(transaction_list.transactions,
+                                      batch_size):
+                rows = []
+                for transaction in batch:
+                    digest = transaction_digest(transaction)
+                    rows.append((
+                        account.account_number,
+                        transaction.date.isoformat(),
+                        str(transaction.value),
+                        transaction.message,
+                        transaction.counterparty,
+                        transaction.reference,
+                        digest,
+                        occurrences(digest),
+                    ))
+                connection.executemany(INSERT, rows)
+                read += len(rows)
+        return read, connection.total_changes - changes
+
+    def accounts(self) -> List[AccountInfo]:
+        return [AccountInfo(*row) for row in self.connection.execute(
+            'SELECT account_number, description FROM accounts '
+            'ORDER BY account_number')]
+
+    def account(self, account_number: str) -> Optional[AccountInfo]:
+        row = self.connection.execute(
+            'SELECT account_number, description FROM accounts '
+            'WHERE account_number = ?', (account_number,)).fetchone()
+        return AccountInfo(*row) if row else None
+
+    def transactions(self, account_number: str, start: date = None,
+                     end: date = None) -> Iterator[QIFTransaction]:
+        '''
+        Yields the transactions of an account between *start* and *end*
+        (both inclusive) ordered by date.
+        '''
+        query = ('SELECT date, amount, message, counterparty, reference '
+                 'FROM transactions WHERE account_number = ?')
+        arguments = [account_number]
+        if start:
+            query += ' AND date >= ?'
+            arguments.append(start.isoformat())
+        if end:
+            query += ' AND date <= ?'
+            arguments.append(end.isoformat())
+        query += ' ORDER BY date, id'
+        cursor = self.connection.execute(query, arguments)
+        cursor.arraysize = BATCH_SIZE
+        from_iso = date.fromisoformat
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            for day, amount, message, counterparty, reference in rows:
+                yield QIFTransaction(from_iso(day), Decimal(amount), message,
+                                     counterparty, reference)
+
+    def export(self, account_number: str, start: date = None,
+               end: date = None) -> TransactionList:
+        '''
+        Returns a transaction list for :py:func:`ccp2qif.core.write_qif`.
+
+        :raises KeyError: If the account is not in the ledger.
+        '''
+        account = self.account(account_number)
+        if account is None:
+            raise KeyError(account_number)
+        return TransactionList(account, self.transactions(
+            account_number, start, end))
+
+
+def ingest_files(ledger: Ledger, filenames: Iterable[str],
+                 account_name: str = None) -> List[Tuple[str, int, int]]:
+    '''
+    Parses the exports *filenames* and stores their transactions. Returns
+    the number of transactions read and added for each file.
+    '''
+    from ccp2qif.detect import detect
+    results = []
+    for filename in filenames:
+        with open(filename, 'rb') as infile:
+            parser = detect(infile, filename)
+            if not parser:
+                raise ValueError('No parser found for %r' % filename)
+            read, added = ledger.ingest(parser(infile, account_name))
+        LOG.info('%s: %d transactions, %d new', filename, read, added)
+        results.append((filename, read, added))
+    return results
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    from ccp2qif.batch import collect_inputs
+    from ccp2qif.core import (
+        DEFAULT_DATE_FORMAT,
+        add_logging_arguments,
+        setup_logging,
+        write_qif,
+    )
+
+    parser = ArgumentParser(description='Keeps the transactions of many '
+                            'exports in an SQLite database.')
+    add_logging_arguments(parser)
+    parser.add_argument('database')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    ingest = commands.add_parser('ingest', help='Add exports to the ledger.')
+    ingest.add_argument('-n', '--account-name', dest='account_name',
+                        default=None,
+                        help='The name of the account for these imports')
+    ingest.add_argument('infile', nargs='+',
+                        help='Exports to add. Folders and glob patterns are '
+                        'expanded to the files they contain.')
+
+    export = commands.add_parser('export', help='Write the transactions of '
+                                 'an account to a QIF file.')
+    export.add_argument('-a', '--account', required=True)
+    export.add_argument('--from', dest='start', type=date.fromisoformat,
+                        default=None, help='First date (YYYY-MM-DD).')
+    export.add_argument('--to', dest='end', type=date.fromisoformat,
+                        default=None, help='Last date (YYYY-MM-DD).')
+    export.add_argument('--date-format', dest='datefmt',
+                        default=DEFAULT_DATE_FORMAT,
+                        help='The format of dates in the QIF file '
+                        '(default: %(default)s).')
+    export.add_argument('-o', '--outfile', required=True)
+
+    commands.add_parser('accounts', help='List the accounts in the ledger.')
+    args = parser.parse_args(argv)
+    setup_logging(args)
+
+    with Ledger(args.database) as ledger:
+        if args.command == 'ingest':
+            results = ingest_files(ledger, collect_inputs(args.infile),
+                                   args.account_name)
+            print('%d transactions read, %d new' % (
+                sum(row[1] for row in results),
+                sum(row[2] for row in results)), file=sys.stderr)
+        elif args.command == 'export':
+            try:
+                data = ledger.export(args.account, args.start, args.end)
+            except KeyError:
+                print('Error: Unknown account %r' % args.account,
+                      file=sys.stderr)
+                return 1
+            with open(args.outfile, 'w', encoding='cp1252') as outfile:
+                write_qif(data, outfile, datefmt=args.datefmt)
+        else:
+            for account in ledger.accounts():
+                print('%s %s' % (account.account_number,
+                                 account.description))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+'''
+Merging of overlapping exports of the same account into one QIF file.
+
+Banks export overlapping date ranges, so consecutive exports share many
+transactions. This module combines any number of exports, drops the
+transactions which were already seen in another export and writes the
+result sorted by date.
+
+The inputs are processed like an external sort: each export is streamed,
+cut into runs of *run_size* transactions which are sorted and spilled to
+temporary files, and the runs are then combined with a k-way merge.
+Duplicates always share the same date, so the index used to detect them
+only needs to hold the transactions of the date currently being merged.
+Memory use is therefore independent of the total number of rows.
+
+A transaction occurring several times in the same export (for example two
+identical payments on the same day) is kept as often as it occurs in the
+export containing it most often.
+'''
+from collections import Counter, defaultdict, namedtuple
+from hashlib import blake2b
+from heapq import merge as heap_merge
+from itertools import islice
+from os.path import join
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator, List, Optional
+import logging
+import pickle
+import sys
+
+from ccp2qif.detect import detect
+from ccp2qif.model import AccountInfo, QIFTransaction, TransactionList
+
+LOG = logging.getLogger(__name__)
+
+#: Number of transactions sorted in memory at once
+RUN_SIZE = 100000
+
+MergeRecord = namedtuple('MergeRecord',
+                         'ordinal source position digest transaction')
+MergeResult = namedtuple('MergeResult', 'account read written duplicates')
+
+
+def transaction_digest(transaction: QIFTransaction) -> bytes:
+    '''
+    Returns a compact hash identifying a transaction by its date, value,
+    reference and message.
+    '''
+    identity = '%s\x00%s\x00%s\x00%s' % (
+        transaction.date.toordinal(), transaction.value,
+        transaction.reference, transaction.message)
+    return blake2b(identity.encode('utf8'), digest_size=16).digest()
+
+
+def _records(transactions: Iterable[QIFTransaction],
+             source: int) -> Iterator[MergeRecord]:
+    for position, transaction in enumerate(transactions):
+        yield MergeRecord(transaction.date.toordinal(), source, position,
+                          transaction_digest(transaction), transaction)
+
+
+def _spill(records: List[MergeRecord], filename: str):
+    records.sort()
+    with open(filename, 'wb') as outfile:
+        pickler = pickle.Pickler(outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        for record in records:
+            pickler.dump(tuple(record))
+            pickler.clear_memo()
+
+
+def _read_run(filename: str) -> Iterator[MergeRecord]:
+    with open(filename, 'rb') as infile:
+        unpickler = pickle.Unpickler(infile)
+        while True:
+            try:
+                yield MergeRecord(*unpickler.load())
+            except EOFError:
+                return
+
+
+def _deduplicate(records: Iterable[MergeRecord], result: Counter):
+    '''
+    Drops duplicates from the sorted *records*. All records of one date are
+    adjacent and ordered by source, so it is enough to count, for the
+    current date only, how often each transaction occurred per source and
+    how often it has been emitted so far.
+    '''
+    current = None
+    occurrences = defaultdict(int)
+    emitted = defaultdict(int)
+    for record in records:
+        result['read'] += 1
+        if record.ordinal != current:
+            current = record.ordinal
+            occurrences.clear()
+            emitted.clear()
+        occurrences[record.source, record.digest] += 1
+        count = occurrences[record.source, record.digest]
+        if count <= emitted[record.digest]:
+            result['duplicates'] += 1
+            continue
+        emitted[record.digest] = count
+        result['written'] += 1
+        yield record.transaction
+
+
+def merge_exports(filenames: List[str], target_filename: str,
+                  account_name: Optional[str] = None,
+                  datefmt: str = '%d/%m/%Y',
+                  run_size: int = RUN_SIZE) -> MergeResult:
+    '''
+    Merges the exports *filenames* into the QIF file *target_filename*.
+
+    :param account_name: The account number written to the QIF file.
+        Defaults to the account of the first export.
+    :return: The account and the number of transactions read, written and
+        dropped as duplicates.
+    '''
+    from ccp2qif.core import write_qif
+
+    account = None
+    counts = Counter()
+    with TemporaryDirectory(prefix='ccp2qif-merge-') as workdir:
+        runs = []
+        for source, filename in enumerate(filenames):
+            with open(filename, 'rb') as infile:
+                parser = detect(infile, filename)
+                if not parser:
+                    raise ValueError('No parser found for %r' % filename)
+                data = parser(infile, account_name)
+                if account is None:
+                    account = data.account
+                elif data.account.account_number != account.account_number:
+                    LOG.warning('%r belongs to account %r, not %r',
+                                filename, data.account.account_number,
+                                account.account_number)
+                records = _records(data.transactions, source)
+                while True:
+                    batch = list(islice(records, run_size))
+                    if not batch:
+                        break
+                    run_filename = join(workdir, 'run-%d' % len(runs))
+                    _spill(batch, run_filename)
+                    runs.append(run_filename)
+            LOG.debug('Split %r into runs (%d runs total)', filename,
+                      len(runs))
+
+        if account is None:
+            raise ValueError('No exports to merge')
+        if account_name:
+            account = AccountInfo(account_name, account.description)
+        merged = heap_merge(*[_read_run(run) for run in runs])
+        transactions = _deduplicate(merged, counts)
+        with open(target_filename, 'w', encoding='cp1252') as outfile:
+            write_qif(TransactionList(account, transactions), outfile,
+                      datefmt=datefmt)
+    return MergeResult(account, counts['read'], counts['written'],
+                       counts['duplicates'])
+
+
+def main():
+    from argparse import ArgumentParser
+    from ccp2qif.batch import collect_inputs
+    from ccp2qif.core import (
+        DEFAULT_DATE_FORMAT,
+        add_logging_arguments,
+        setup_logging,
+    )
+
+    parser = ArgumentParser(description='Merges overlapping exports of one '
+                            'account into a single QIF file without '
+                            'duplicates.')
+    add_logging_arguments(parser)
+    parser.add_argument('-n', '--account-name', dest='account_name',
+                        help='The name of the account (default: taken from '
+                        'the first export)', default=None)
+    parser.add_argument('-o', '--outfile', dest='outfile', required=True,
+                        help='The output file.')
+    parser.add_argument('--date-format', dest='datefmt',
+                        default=DEFAULT_DATE_FORMAT,
+                        help='The format of dates in the QIF file '
+                        '(default: %(default)s).')
+    parser.add_argument('--run-size', dest='run_size', type=int,
+                        default=RUN_SIZE,
+                        help='Number of transactions sorted in memory at '
+                        'once (default: %(default)s).')
+    parser.add_argument('infile', nargs='+',
+                        help='Exports to merge. Folders and glob patterns '
+                        'are expanded to the files they contain.')
+    args = parser.parse_args()
+    setup_logging(args)
+
+    result = merge_exports(collect_inputs(args.infile), args.outfile,
+                           account_name=args.account_name,
+                           datefmt=args.datefmt, run_size=args.run_size)
+    print('%d transactions read, %d written, %d duplicates dropped' % (
+        result.read, result.written, result.duplicates), file=sys.stderr)
+    return 0
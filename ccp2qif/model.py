@@ -11,3 +11,28 @@ QIFTransaction = namedtuple(
         'counterparty',
         'reference',
     ])
+Format = namedtuple('Format', [
+    'name',
+    'description',
+    'magic',
+    'extensions',
+    'cost',
+    'parser',
+    'probe',
+])
+Format.__new__.__defaults__ = ((), (), 0, None, None)
+Format.__doc__ = '''
+An export format.
+
+:param name: A short identifier.
+:param description: A human readable description.
+:param magic: Byte strings files of this format start with.
+:param extensions: Usual file extensions (lowercase, with dot).
+:param cost: Relative cost of confirming that a file has this format.
+    Cheaper formats are tried first.
+:param parser: The parser as ``"module:function"``.
+:param probe: An optional ``"module:function"`` called with the header and
+    the open file. It must return a true value if it accepts the file.
+    Formats with magic bytes but without probe are selected on the magic
+    bytes alone.
+'''
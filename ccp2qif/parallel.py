@@ -0,0 +1,146 @@
+'''
+Parsing of one large CSV or BILnet export on several cores.
+
+The fixed header lines are parsed as usual. The remaining body is split into
+byte ranges of about :py:data:`CHUNK_SIZE` bytes whose boundaries fall on
+record boundaries (see :py:func:`ccp2qif.tokenizer.record_ranges`), so line
+breaks inside quoted fields are never split. Each range is parsed by a
+worker process and the transactions are yielded in their original order.
+
+Only the CSV based formats can be split this way. Files smaller than two
+chunks are parsed sequentially, as starting the workers would cost more than
+it saves.
+'''
+from collections import deque
+from functools import partial
+from typing import Callable, Iterator, List, Optional
+import io
+import logging
+import mmap
+import os
+
+from ccp2qif.model import QIFTransaction, TransactionList
+from ccp2qif.tokenizer import iter_rows, record_ranges
+
+LOG = logging.getLogger(__name__)
+
+#: Approximate size of the byte range given to each worker
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _formats():
+    from ccp2qif import bil, ccp
+    return {
+        bil.stream: ('bilnet', bil.HEADER_LINES),
+        ccp.stream_csv: ('ccp-csv', ccp.CSV_HEADER_LINES),
+    }
+
+
+def supports(parser: Callable) -> bool:
+    '''
+    Tells whether exports read by *parser* can be parsed in parallel.
+    '''
+    return parser in _formats()
+
+
+def parallel_parser(parser: Callable, workers: Optional[int] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Callable:
+    '''
+    Returns a function with the signature of *parser* which parses the file
+    with *workers* processes. The file object given to it must have a
+    ``name`` as the workers open the file themselves.
+    '''
+    name, header_lines = _formats()[parser]
+    return partial(stream_parallel, parser=parser, format_name=name,
+                   header_lines=header_lines, workers=workers,
+                   chunk_size=chunk_size)
+
+
+def _body_offset(view, header_lines: int) -> int:
+    '''
+    Returns the offset of the first byte after *header_lines* lines, or -1
+    if the file is shorter.
+    '''
+    position = 0
+    for _ in range(header_lines):
+        newline = view.find(b'\n', position)
+        if newline < 0:
+            return -1
+        position = newline + 1
+    return position
+
+
+def _parse_range(format_name: str, filename: str, start: int, end: int,
+                 columnar: bool,
+                 normalise_counterparties: bool) -> List[QIFTransaction]:
+    from ccp2qif import bil, ccp
+    with open(filename, 'rb') as infile:
+        infile.seek(start)
+        data = infile.read(end - start)
+    rows = iter_rows(data)
+    if format_name == 'bilnet':
+        transactions = bil.transactions_from_rows(rows, columnar)
+    else:
+        transactions = ccp.csv_transactions_from_rows(
+            rows, columnar, normalise_counterparties)
+    return list(transactions)
+
+
+def stream_parallel(infile, account_number='', columnar=False,
+                    normalise_counterparties=False, *, parser, format_name,
+                    header_lines, workers=None,
+                    chunk_size=CHUNK_SIZE) -> TransactionList:
+    '''
+    Parses *infile* like *parser* does, distributing the body of the file
+    over *workers* processes. See :py:func:`parallel_parser`.
+    '''
+    filename = infile.name
+    with open(filename, 'rb') as fptr:
+        size = os.fstat(fptr.fileno()).st_size
+        view = mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_READ) \
+            if size else b''
+    try:
+        body = _body_offset(view, header_lines)
+        if body < 0 or size - body < 2 * chunk_size:
+            LOG.debug('%r is too small to be parsed in parallel', filename)
+            infile.seek(0)
+            return parser(infile, account_number, columnar=columnar,
+                          normalise_counterparties=normalise_counterparties)
+        header = parser(io.BytesIO(view[:body]), account_number)
+        ranges = record_ranges(view, body, size, chunk_size)
+    finally:
+        if size:
+            view.close()
+    LOG.debug('Parsing %r in %d chunks', filename, len(ranges))
+    work = partial(_parse_range, format_name, filename, columnar=columnar,
+                   normalise_counterparties=normalise_counterparties)
+    return TransactionList(header.account,
+                           _run_ranges(work, ranges, workers))
+
+
+def _run_ranges(work, ranges, workers) -> Iterator[QIFTransaction]:
+    '''
+    Runs *work* on all *ranges* in a process pool and yields the results in
+    order. Only a few ranges are in flight at a time, so the parsed
+    transactions do not pile up when the consumer is slower than the
+    workers.
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    ranges = iter(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for start, end in ranges:
+                pending.append(pool.submit(work, start, end))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                transactions = pending.popleft().result()
+                for start, end in ranges:
+                    pending.append(pool.submit(work, start, end))
+                    break
+                yield from transactions
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,260 @@
+"""
+Anonymisation of QIF files for development and demonstration purposes.
+
+Memos, references, counterparties, amounts and account details are replaced
+by values derived from the original with a keyed BLAKE2b hash. The same
+input always maps to the same replacement for a given key, so a counterparty
+keeps its (fake) identity across all files anonymised with that key. Nothing
+needs to be remembered between records, so files of any size are processed
+in a single streaming pass with constant memory.
+
+Replacements use 96 bits of the hash, so different values practically never
+map to the same replacement (the chance of any collision among a billion
+distinct values is below 10^-10).
+
+Dates are kept. Fields which are not part of
+:py:class:`~ccp2qif.model.QIFTransaction` (categories, splits, ...) are
+dropped.
+"""
+from decimal import Decimal
+from glob import glob
+from hashlib import blake2b
+from os import environ, makedirs
+from os.path import basename, isdir, join
+from typing import IO, Iterable, List, Optional, Tuple
+import secrets
+import sys
+
+from ccp2qif.core import (
+    DEFAULT_DATE_FORMAT,
+    WRITE_BUFFER_SIZE,
+    qif_account_header,
+    qif_record,
+)
+from ccp2qif.model import AccountInfo, QIFTransaction
+from ccp2qif.qiftools.reader import read_qif
+from ccp2qif.util import same_file
+
+#: Environment variable holding the default key
+KEY_VARIABLE = 'CCP2QIF_ANONYMISE_KEY'
+
+DIGEST_SIZE = 12
+
+
+class Anonymiser:
+    """
+    Derives replacement values from *key* (up to 64 bytes).
+    """
+
+    def __init__(self, key: bytes):
+        if not key or len(key) > 64:
+            raise ValueError('The key must be between 1 and 64 bytes long')
+        self.key = key
+
+    def digest(self, kind: bytes, value: str) -> bytes:
+        # The personalisation keeps equal values of different fields apart
+        return blake2b(value.encode('utf8'), digest_size=DIGEST_SIZE,
+                       key=self.key, person=kind).digest()
+
+    def message(self, value: str) -> str:
+        if not value:
+            return value
+        return 'Message %s' % self.digest(b'memo', value).hex()
+
+    def reference(self, value: str) -> str:
+        if not value:
+            return value
+        return 'MC%s' % self.digest(b'reference', value).hex()
+
+    def counterparty(self, value: str) -> str:
+        if not value:
+            return value
+        digest = self.digest(b'counterparty', value)
+        return 'Counterparty %s (%s)' % (digest[:4].hex(),
+                                         self._iban(digest[4:]))
+
+    def account(self, account: AccountInfo) -> AccountInfo:
+        digest = self.digest(b'account', account.account_number)
+        return AccountInfo(self._iban(digest),
+                           'Account %s' % digest[:4].hex())
+
+    def amount(self, value: Decimal, context: str) -> Decimal:
+        """
+        Replaces the amount by one between 0.01 and 1000.00 with the same
+        sign. *context* is mixed into the hash so that equal amounts of
+        different transactions do not stay equal.
+        """
+        if value is None:
+            return value
+        digest = self.digest(b'amount', '%s|%s' % (value, context))
+        cents = int.from_bytes(digest[:8], 'big') % 100000 + 1
+        amount = Decimal(cents).scaleb(-2)
+        return -amount if value < 0 else amount
+
+    def transaction(self, transaction: QIFTransaction) -> QIFTransaction:
+        context = '%s|%s|%s' % (transaction.date, transaction.message,
+                                transaction.reference)
+        return QIFTransaction(
+            transaction.date,
+            self.amount(transaction.value, context),
+            self.message(transaction.message),
+            self.counterparty(transaction.counterparty),
+            self.reference(transaction.reference),
+        )
+
+    @staticmethod
+    def _iban(digest: bytes) -> str:
+        digits = '%016d' % (int.from_bytes(digest[:8], 'big') % 10 ** 16)
+        return 'LU00 %s %s %s %s' % (digits[:4], digits[4:8], digits[8:12],
+                                     digits[12:])
+
+
+def anonymise(source, outfile: IO, key: bytes,
+              datefmt: str = DEFAULT_DATE_FORMAT,
+              buffer_size: int = WRITE_BUFFER_SIZE):
+    """
+    Reads the QIF file *source* (a filename or file object, see
+    :py:func:`~ccp2qif.qiftools.reader.read_qif`) and writes an anonymised
+    copy to the text file *outfile*. Dates are read and written in the
+    format *datefmt*.
+    """
+    anonymiser = Anonymiser(key)
+    dates = {}
+    chunks = []
+    size = 0
+    started = False
+    for item in read_qif(source, datefmt=datefmt):
+        if isinstance(item, AccountInfo):
+            record = qif_account_header(anonymiser.account(item))
+        else:
+            if not started:
+                record = '!Type:Bank\n'
+                chunks.append(record)
+                size += len(record)
+            date_text = dates.get(item.date)
+            if date_text is None:
+                date_text = item.date.strftime(datefmt) if item.date else ''
+                dates[item.date] = date_text
+            record = qif_record(anonymiser.transaction(item), date_text)
+        started = True
+        chunks.append(record)
+        size += len(record)
+        if size >= buffer_size:
+            outfile.write(''.join(chunks))
+            chunks.clear()
+            size = 0
+    if chunks:
+        outfile.write(''.join(chunks))
+
+
+def anonymise_file(source: str, target: str, key: bytes,
+                   datefmt: str = DEFAULT_DATE_FORMAT) -> Optional[str]:
+    """
+    Anonymises *source* into *target*. Returns an error message on failure.
+    """
+    try:
+        with open(target, 'w', encoding='cp1252') as outfile:
+            anonymise(source, outfile, key, datefmt=datefmt)
+    except Exception as exc:
+        return '%s: %s: %s' % (source, exc.__class__.__name__, exc)
+    return None
+
+
+def anonymise_files(jobs: Iterable[Tuple[str, str]], key: bytes,
+                    workers: int = None,
+                    datefmt: str = DEFAULT_DATE_FORMAT) -> List[str]:
+    """
+    Anonymises the ``(source, target)`` pairs in *jobs* using a pool of
+    *workers* processes and returns the errors.
+
+    :raises ValueError: If a target is used more than once or is one of the
+        sources.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from ccp2qif.batch import duplicate_targets
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    clashes = duplicate_targets(jobs)
+    if clashes:
+        raise ValueError('Several inputs would be written to the same file: '
+                         + '; '.join('%s <- %s' % (target, ', '.join(names))
+                                     for target, names in clashes.items()))
+    for source, target in jobs:
+        if same_file(source, target):
+            raise ValueError('%s would be overwritten' % source)
+    sources, targets = zip(*jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(anonymise_file, sources, targets,
+                           [key] * len(sources), [datefmt] * len(sources))
+        return [error for error in results if error]
+
+
+def resolve_key(text: Optional[str]) -> bytes:
+    """
+    Returns the key given on the command line or in the environment. If
+    there is none, a random key is used, so the output differs between runs.
+    Keys longer than 64 bytes are hashed down to 64 bytes (as HMAC does) so
+    that every character of the secret counts.
+    """
+    text = text or environ.get(KEY_VARIABLE)
+    if text:
+        key = text.encode('utf8')
+        if len(key) > 64:
+            key = blake2b(key).digest()
+        return key
+    print('No key given, using a random one. Pass --key or set %s for '
+          'reproducible output.' % KEY_VARIABLE, file=sys.stderr)
+    return secrets.token_bytes(32)
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Anonymises QIF files.')
+    parser.add_argument('-k', '--key', default=None,
+                        help='Secret from which the replacements are '
+                        'derived (default: $%s).' % KEY_VARIABLE)
+    parser.add_argument('-o', '--outdir', default=None,
+                        help='Write the anonymised files to this folder '
+                        'instead of standard output.')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+                        help='Number of worker processes (default: number '
+                        'of CPUs).')
+    parser.add_argument('--date-format', dest='datefmt',
+                        default=DEFAULT_DATE_FORMAT,
+                        help='The format of dates in the QIF files '
+                        '(default: %(default)s).')
+    parser.add_argument('infile', nargs='+',
+                        help='QIF files or folders containing QIF files.')
+    args = parser.parse_args(argv)
+    key = resolve_key(args.key)
+
+    filenames = []
+    for name in args.infile:
+        if isdir(name):
+            filenames.extend(sorted(glob(join(name, '*.qif'))))
+        else:
+            filenames.append(name)
+
+    if not args.outdir:
+        for filename in filenames:
+            anonymise(filename, sys.stdout, key, datefmt=args.datefmt)
+        return 0
+
+    makedirs(args.outdir, exist_ok=True)
+    jobs = [(filename, join(args.outdir, basename(filename)))
+            for filename in filenames]
+    try:
+        errors = anonymise_files(jobs, key, workers=args.jobs,
+                                 datefmt=args.datefmt)
+    except ValueError as exc:
+        print('Error: %s' % exc, file=sys.stderr)
+        return 9
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
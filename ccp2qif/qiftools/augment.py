@@ -17,95 +17,209 @@ If the file does not exist, it's automatically created.
 
 The QIF files and hints file must be in the same folder. All QIF files in that
 folder will be processed. The original file will be written as a '.bak' file.
+
+In non-interactive mode (``--non-interactive``) the guessed account number is
+used without asking and files are processed in parallel. Files for which no
+hint matches are reported and left untouched.
 """
 
 from __future__ import print_function
 
+import os
 import sys
 from glob import glob
-from json import dump, load
 from os.path import basename, exists, isdir, join
-from shutil import move
+from shutil import copyfile, copyfileobj
+from tempfile import NamedTemporaryFile
+
+from ccp2qif.qiftools.hints import HintStore
+
+#: Maximum number of lines inspected when looking for an account header
+HEADER_LINES = 20
+
+
+def has_account_identifier(filename):
+    """
+    Checks whether the first block of the QIF file (up to the first "^")
+    contains an account header.
+    """
+    with open(filename, 'rb') as fp:
+        for _, line in zip(range(HEADER_LINES), fp):
+            line = line.strip()
+            if line.startswith(b'!Account'):
+                return True
+            if line.startswith(b'^'):
+                break
+    return False
 
 
-def process_file(filename, hints):
+def _copy_contents(source, target):
+    """
+    Appends the content of the binary file *source* to *target*, in the
+    kernel if possible.
+    """
+    target.flush()
+    if hasattr(os, 'sendfile'):
+        try:
+            offset = 0
+            while True:
+                sent = os.sendfile(target.fileno(), source.fileno(), offset,
+                                   1024 * 1024 * 64)
+                if not sent:
+                    return
+                offset += sent
+        except OSError:
+            # Not supported for these files. Fall back to a plain copy
+            source.seek(offset)
+            target.seek(0, os.SEEK_END)
+    copyfileobj(source, target, 1024 * 1024)
+
+
+def prepend_account(filename, account_number):
+    """
+    Prepends an account block to *filename*. The new content is written to a
+    temporary file which atomically replaces the original. The original is
+    kept as ".bak" file.
+    """
+    header = (u'!Account\n'
+              u'N{}\n'
+              u'TBank\n'
+              u'^\n').format(account_number).encode('cp1252')
+    folder = os.path.dirname(os.path.abspath(filename))
+    with open(filename, 'rb') as source, NamedTemporaryFile(
+            dir=folder, prefix='.augment-', delete=False) as tmp:
+        try:
+            tmp.write(header)
+            _copy_contents(source, tmp)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+    os.chmod(tmp.name, os.stat(filename).st_mode & 0o777)
+
+    backup = filename + '.bak'
+    if exists(backup):
+        os.unlink(backup)
+    try:
+        os.link(filename, backup)
+    except OSError:
+        copyfile(filename, backup)
+    os.replace(tmp.name, filename)
+
+
+def process_file(filename, hints, interactive=True):
+    """
+    Adds an account block to *filename* if it has none. *hints* is the
+    :py:class:`~ccp2qif.qiftools.hints.HintStore` of the folder.
+    """
 
     print('Processing %s' % filename)
-    with open(filename) as fp:
-        data = fp.read()
-
-    for line in data.splitlines():
-        line = line.strip()
-        if line.startswith('!Account'):
-            has_account_identifier = True
-            break
-    else:
-        has_account_identifier = False
-
-    if not has_account_identifier:
-        for account_number, guesses in hints.items():
-            if not isinstance(guesses, list):
-                raise ValueError('Value for hint key %r should be a list!' %
-                                 account_number)
-            if any([guess.lower() in filename.lower() for guess in guesses]):
-                guessed_account = account_number
-                break
-        else:
-            guessed_account = ''
+    if not has_account_identifier(filename):
+        guessed_account = hints.guess(filename) or ''
 
-        account_number = input(
-            'Account Number [%s]: ' % guessed_account).strip()
+        if interactive:
+            account_number = input(
+                'Account Number [%s]: ' % guessed_account).strip()
+        else:
+            account_number = ''
 
         if not account_number and not guessed_account:
             raise ValueError('Must have an account number!')
         elif not account_number and guessed_account:
             account_number = guessed_account
 
-        account_hints = set(hints.setdefault(account_number, []))
-        account_hints.add(basename(filename))
-        hints[account_number] = list(account_hints)
-        move(filename, filename + '.bak')
-        with open(filename, 'w') as outfile:
-            outfile.write(u'!Account\n')
-            outfile.write(u'N{}\n'.format(account_number))
-            outfile.write(u'TBank\n')
-            outfile.write(u'^\n')
-
-            # Copy the remaining data
-            outfile.write(data)
+        prepend_account(filename, account_number)
+        hints.add(account_number, basename(filename))
+        return account_number
     else:
         print('%s already contains an account identfidier' % filename)
-
-
-def process_folder(folder):
-    hints_file = join(folder, 'hints.json')
-    if exists(hints_file):
-        with open(hints_file) as fp:
-            hints = load(fp)
-    else:
-        hints = {}
-    for filename in glob(join(folder, '*.qif')):
-        process_file(filename, hints)
-        with open(hints_file, 'w') as fp:
-            dump(hints, fp, indent=4)
+        return None
+
+
+def _augment_unattended(filename, account_number):
+    """
+    Adds the guessed account to *filename* in a worker process. Returns
+    whether the file was modified and an error message on failure.
+    """
+    try:
+        print('Processing %s' % filename)
+        if has_account_identifier(filename):
+            print('%s already contains an account identfidier' % filename)
+            return False, None
+        if not account_number:
+            raise ValueError('Must have an account number!')
+        prepend_account(filename, account_number)
+        return True, None
+    except Exception as exc:
+        return False, '%s: %s' % (filename, exc)
+
+
+def process_folder(folder, interactive=True, jobs=None):
+    """
+    Processes all QIF files in *folder*. The hints file is written once
+    at the end. Returns the errors of a non-interactive run.
+    """
+    hints = HintStore(join(folder, 'hints.json'))
+    filenames = glob(join(folder, '*.qif'))
+    if interactive:
+        try:
+            for filename in filenames:
+                process_file(filename, hints)
+        finally:
+            hints.commit()
+        return []
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Guessing is cheap with the automaton, so it is done up front and only
+    # the file operations run in the workers.
+    guesses = [hints.guess(filename) for filename in filenames]
+    errors = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(_augment_unattended, filenames, guesses,
+                           chunksize=16)
+        for filename, account_number, (modified, error) in zip(
+                filenames, guesses, results):
+            if error:
+                errors.append(error)
+            elif modified:
+                hints.add(account_number, basename(filename))
+    hints.commit()
+    return errors
 
 
 def main():
+    from argparse import ArgumentParser
+
     if sys.version_info < (3, 0):
         print("Python 3 required!", file=sys.stderr)
         return 1
-    else:
-        dirname = sys.argv[1]
-        if not isdir(dirname):
-            print('%s should be a folder!' % dirname, file=sys.stderr)
-            return 1
 
-        try:
-            process_folder(dirname)
-            return 0
-        except Exception as exc:
-            print(str(exc), file=sys.stderr)
-            return 1
+    parser = ArgumentParser(description='Injects account information into '
+                            'QIF files.')
+    parser.add_argument('-y', '--non-interactive', dest='interactive',
+                        action='store_false', default=True,
+                        help='Use the account guessed from the hints '
+                        'without asking and process files in parallel.')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+                        help='Number of worker processes in non-interactive '
+                        'mode (default: number of CPUs).')
+    parser.add_argument('dirname')
+    args = parser.parse_args()
+
+    dirname = args.dirname
+    if not isdir(dirname):
+        print('%s should be a folder!' % dirname, file=sys.stderr)
+        return 1
+
+    try:
+        errors = process_folder(dirname, interactive=args.interactive,
+                                jobs=args.jobs)
+    except Exception as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
 
 
 if __name__ == '__main__':
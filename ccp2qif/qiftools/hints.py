@@ -0,0 +1,80 @@
+"""
+Crash-safe persistence of the ``hints.json`` file used by ``augment_qif``.
+
+New hints are appended to a journal next to the hints file (and flushed to
+disk) as soon as they are known. The hints file itself is only rewritten
+once, atomically, when :py:meth:`HintStore.commit` is called. If a run is
+interrupted, the journal is replayed the next time the store is opened, so
+no hint is lost.
+"""
+from json import dump, dumps, load, loads
+from os import fsync, replace, unlink
+from os.path import dirname, exists
+from tempfile import NamedTemporaryFile
+from typing import Optional
+
+from ccp2qif.qiftools.matcher import HintMatcher
+
+
+class HintStore:
+    """
+    The hints of one folder together with a matcher to guess accounts.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.journal_filename = filename + '.journal'
+        self.hints = {}
+        if exists(filename):
+            with open(filename) as fp:
+                self.hints = load(fp)
+        self.matcher = HintMatcher(self.hints)
+        self._journal = None
+        if exists(self.journal_filename):
+            self._replay()
+
+    def _replay(self):
+        with open(self.journal_filename) as fp:
+            for line in fp:
+                try:
+                    account_number, hint = loads(line)
+                except ValueError:
+                    break  # incomplete last line of an interrupted run
+                self._remember(account_number, hint)
+
+    def _remember(self, account_number, hint):
+        account_hints = self.hints.setdefault(account_number, [])
+        if hint not in account_hints:
+            account_hints.append(hint)
+            self.matcher.add(account_number, [hint])
+
+    def guess(self, filename: str) -> Optional[str]:
+        return self.matcher.match(filename)
+
+    def add(self, account_number: str, hint: str):
+        """
+        Records a new hint in memory and in the journal.
+        """
+        self._remember(account_number, hint)
+        if self._journal is None:
+            self._journal = open(self.journal_filename, 'a')
+        self._journal.write(dumps([account_number, hint]) + '\n')
+        self._journal.flush()
+        fsync(self._journal.fileno())
+
+    def commit(self):
+        """
+        Atomically writes all hints to the hints file and discards the
+        journal.
+        """
+        with NamedTemporaryFile('w', dir=dirname(self.filename) or '.',
+                                suffix='.tmp', delete=False) as tmp:
+            dump(self.hints, tmp, indent=4)
+            tmp.flush()
+            fsync(tmp.fileno())
+        replace(tmp.name, self.filename)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if exists(self.journal_filename):
+            unlink(self.journal_filename)
@@ -0,0 +1,133 @@
+"""
+Multi-pattern substring matching for account hints.
+
+An Aho-Corasick automaton over the lowercased hints finds all hints
+contained in a filename in a single pass over the name, regardless of the
+number of hints.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+#: Number of hints added after construction which are checked one by one
+#: before the automaton is rebuilt
+REBUILD_THRESHOLD = 64
+
+
+class AhoCorasick:
+    """
+    Finds which of a set of patterns occur in a text.
+
+    Each pattern carries a *value*. :py:meth:`search` returns the values of
+    all patterns found in the text.
+    """
+
+    def __init__(self, patterns: Dict[str, int]):
+        self.goto = [{}]  # type: List[Dict[str, int]]
+        self.fail = [0]
+        self.output = [[]]  # type: List[List[int]]
+        for pattern, value in patterns.items():
+            self._insert(pattern, value)
+        self._link()
+
+    def _insert(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = next_state
+            state = next_state
+        self.output[state].append(value)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = (self.output[next_state] +
+                                           self.output[self.fail[next_state]])
+
+    def search(self, text: str) -> List[int]:
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = []
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.extend(output[state])
+        return found
+
+
+class HintMatcher:
+    """
+    Guesses account numbers from filenames using the hints of
+    ``hints.json``.
+
+    If hints of several accounts match, the account which comes first in
+    the hints mapping wins, as with a linear scan over the mapping.
+    """
+
+    def __init__(self, hints: Dict[str, List[str]]):
+        self.accounts = []  # type: List[str]
+        self.ranks = {}  # type: Dict[str, int]
+        self.patterns = {}  # type: Dict[str, int]
+        self.pending = {}  # type: Dict[str, int]
+        for account_number, guesses in hints.items():
+            if not isinstance(guesses, list):
+                raise ValueError('Value for hint key %r should be a list!' %
+                                 account_number)
+            self._add(account_number, guesses, self.patterns)
+        self.automaton = AhoCorasick(self.patterns)
+
+    def _rank(self, account_number):
+        if account_number not in self.ranks:
+            self.ranks[account_number] = len(self.accounts)
+            self.accounts.append(account_number)
+        return self.ranks[account_number]
+
+    def _add(self, account_number, guesses, target):
+        rank = self._rank(account_number)
+        for guess in guesses:
+            guess = guess.lower()
+            if not guess:
+                continue
+            known = self.patterns.get(guess, self.pending.get(guess))
+            if known is None or rank < known:
+                target[guess] = rank
+
+    def add(self, account_number: str, guesses: Iterable[str]):
+        """
+        Adds hints. New hints are kept aside and checked linearly until
+        enough of them have accumulated to rebuild the automaton.
+        """
+        self._add(account_number, guesses, self.pending)
+        if len(self.pending) >= REBUILD_THRESHOLD:
+            self.patterns.update(self.pending)
+            self.pending.clear()
+            self.automaton = AhoCorasick(self.patterns)
+
+    def match(self, filename: str) -> Optional[str]:
+        """
+        Returns the account number whose hints occur in *filename* or
+        ``None``.
+        """
+        filename = filename.lower()
+        ranks = self.automaton.search(filename)
+        ranks.extend(rank for guess, rank in self.pending.items()
+                     if guess in filename)
+        if not ranks:
+            return None
+        return self.accounts[min(ranks)]
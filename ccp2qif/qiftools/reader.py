@@ -0,0 +1,122 @@
+"""
+Streaming reader for QIF files.
+
+The reader yields one :py:class:`~ccp2qif.model.AccountInfo` for each
+``!Account`` block and one :py:class:`~ccp2qif.model.QIFTransaction` for each
+record, so QIF files of any size can be processed with constant memory.
+Real files are memory-mapped and split into lines without going through
+Python-level buffering.
+"""
+from decimal import Decimal
+from typing import IO, Iterable, Iterator, Union
+import codecs
+import io
+import mmap
+
+from ccp2qif.decode import DateDecoder
+from ccp2qif.model import AccountInfo, QIFTransaction
+from ccp2qif.util import text_stream
+
+QIFItem = Union[AccountInfo, QIFTransaction]
+
+#: Number of bytes decoded at once from memory-mapped files
+CHUNK_SIZE = 1024 * 1024
+
+#: Maps QIF field codes to the names of the QIFTransaction fields
+FIELDS = {
+    'D': 'date',
+    'T': 'value',
+    'U': 'value',
+    'M': 'message',
+    'P': 'counterparty',
+    'N': 'reference',
+}
+
+
+def _transaction(fields, decode_date):
+    return QIFTransaction(
+        decode_date(fields['date']) if 'date' in fields else None,
+        Decimal(fields['value']) if 'value' in fields else None,
+        fields.get('message', ''),
+        fields.get('counterparty', ''),
+        fields.get('reference', ''),
+    )
+
+
+def _account(fields):
+    return AccountInfo(fields.get('N', ''), fields.get('D', '').strip('"'))
+
+
+def iter_qif(lines: Iterable[str],
+             datefmt: str = '%d/%m/%Y') -> Iterator[QIFItem]:
+    """
+    Parses QIF *lines* and yields account headers and transactions in the
+    order in which they appear. Fields which are not represented in
+    :py:class:`~ccp2qif.model.QIFTransaction` are ignored.
+    """
+    decode_date = DateDecoder(datefmt)
+    in_account = False
+    fields = {}
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        code = line[0]
+        if code == '!':
+            header = line.strip()
+            if header == '!Account':
+                in_account = True
+            elif header.startswith('!Type:'):
+                in_account = False
+            fields = {}
+        elif code == '^':
+            if in_account:
+                yield _account(fields)
+            elif fields:
+                yield _transaction(fields, decode_date)
+            fields = {}
+        elif in_account:
+            fields[code] = line[1:]
+        elif code in FIELDS:
+            fields[FIELDS[code]] = line[1:]
+    if fields and not in_account:
+        # The last record is not terminated by "^"
+        yield _transaction(fields, decode_date)
+
+
+def _mapped_lines(filename: str, encoding: str) -> Iterator[str]:
+    """
+    Decodes the memory-mapped file in large chunks and splits them into
+    lines (without line terminator).
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(filename, 'rb') as infile:
+        try:
+            buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        with buffer:
+            pending = ''
+            for offset in range(0, len(buffer), CHUNK_SIZE):
+                text = decoder.decode(buffer[offset:offset + CHUNK_SIZE])
+                lines = (pending + text).split('\n')
+                pending = lines.pop()
+                yield from lines
+            pending += decoder.decode(b'', final=True)
+            if pending:
+                yield pending
+
+
+def read_qif(source: Union[str, IO], encoding: str = 'cp1252',
+             datefmt: str = '%d/%m/%Y') -> Iterator[QIFItem]:
+    """
+    Like :py:func:`iter_qif` but reads from *source*, which is either a
+    filename (which is memory-mapped) or a text or binary file object.
+    """
+    if isinstance(source, str):
+        lines = _mapped_lines(source, encoding)
+    elif isinstance(source, io.TextIOBase):
+        lines = source
+    else:
+        lines = text_stream(source, encoding)
+    return iter_qif(lines, datefmt)
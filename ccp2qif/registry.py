@@ -0,0 +1,200 @@
+'''
+Registry of the export formats ccp2qif can convert.
+
+Each :py:class:`Format` declares how it is recognised: the magic bytes its
+files start with, the usual file extensions and the relative cost of
+probing a file with its (optional) probe function. The parser and probe are
+given as ``"module:function"`` strings and only imported when needed, so
+detecting a file does not import the parsers of the other formats.
+
+Detection first looks the header of a file up in an index of all magic
+signatures. Only if that is not conclusive are the probe functions run,
+cheapest first, and those of formats matching the file extension before
+the others.
+
+Additional formats can be provided by other packages through the
+``ccp2qif.formats`` entry point group. An entry point must refer to a
+:py:class:`Format` instance or to a list of them. Scanning the installed
+packages is slow, so the default registry only does it once a file matches
+none of the built-in formats::
+
+    setup(
+        ...
+        entry_points={
+            'ccp2qif.formats': ['mybank = mybank.ccp2qif:FORMAT'],
+        },
+    )
+'''
+from collections import defaultdict
+from importlib import import_module
+from os.path import splitext
+from typing import IO, Callable, Dict, List, Optional
+import logging
+
+from ccp2qif.model import Format
+from ccp2qif.util import HEADER_SIZE, read_header
+
+LOG = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'ccp2qif.formats'
+
+BUILTIN_FORMATS = [
+    Format('bilnet', 'BILnet account statement (CSV)',
+           magic=(b'BILnet',), extensions=('.txt', '.csv'),
+           parser='ccp2qif.bil:stream'),
+    Format('ccp-csv', 'CCP account statement (CSV)',
+           magic=(b'Account number :;',), extensions=('.csv',),
+           parser='ccp2qif.ccp:stream_csv'),
+    # Spreadsheets are only recognised by their container signature, the
+    # actual layout is determined once the workbook is opened
+    Format('ccp-workbook', 'CCP account or card statement (XLS/XLSX)',
+           magic=(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'PK\x03\x04'),
+           extensions=('.xls', '.xlsx'), cost=10,
+           parser='ccp2qif.ccp:stream_workbook'),
+]
+
+
+def load_object(name: str):
+    '''
+    Imports an object given as ``"module:attribute"``.
+    '''
+    module_name, _, attribute = name.partition(':')
+    return getattr(import_module(module_name), attribute)
+
+
+class FormatRegistry:
+    '''
+    A collection of formats with an index of their magic signatures.
+
+    :param entry_point_group: An entry point group whose formats are only
+        loaded once a file matches none of *formats* (or when calling
+        :py:meth:`load_plugins`).
+    '''
+
+    def __init__(self, formats=(), entry_point_group: Optional[str] = None):
+        self.entry_point_group = entry_point_group
+        self.formats: List[Format] = []
+        # magic bytes indexed by their length
+        self.signatures: Dict[int, Dict] = defaultdict(dict)
+        for fmt in formats:
+            self.register(fmt)
+
+    def register(self, fmt: Format):
+        for other in self.formats:
+            if other.name == fmt.name:
+                raise ValueError('Format %r is already registered' % fmt.name)
+        if any(len(magic) > HEADER_SIZE for magic in fmt.magic):
+            raise ValueError('Magic bytes of %r exceed the header size' %
+                             fmt.name)
+        self.formats.append(fmt)
+        for magic in fmt.magic:
+            self.signatures[len(magic)].setdefault(magic, []).append(fmt)
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP):
+        '''
+        Registers the formats published by installed packages.
+        '''
+        from importlib.metadata import entry_points
+        try:
+            points = entry_points(group=group)
+        except TypeError:  # Python < 3.10
+            points = entry_points().get(group, [])
+        for point in points:
+            try:
+                loaded = point.load()
+                for fmt in (loaded if isinstance(loaded, list) else [loaded]):
+                    self.register(fmt)
+            except Exception:
+                LOG.warning('Unable to load format from %r', point,
+                            exc_info=True)
+
+    def load_plugins(self) -> bool:
+        '''
+        Loads the formats of the deferred entry point group, once. Returns
+        whether new formats were registered.
+        '''
+        if self.entry_point_group is None:
+            return False
+        group, self.entry_point_group = self.entry_point_group, None
+        count = len(self.formats)
+        self.load_entry_points(group)
+        return len(self.formats) > count
+
+    def _probe(self, fmt, header, infile):
+        if fmt.probe is None:
+            return True
+        try:
+            result = load_object(fmt.probe)(header, infile)
+        except Exception:
+            LOG.debug('Probe of %r failed', fmt.name, exc_info=True)
+            result = False
+        finally:
+            infile.seek(0)
+        return result
+
+    def identify(self, infile: IO,
+                 filename: Optional[str] = None) -> Optional[Format]:
+        '''
+        Returns the format of the open file *infile* or ``None``. The file
+        is rewound before returning.
+        '''
+        fmt = self._identify(infile, filename)
+        if fmt is None and self.load_plugins():
+            fmt = self._identify(infile, filename)
+        return fmt
+
+    def _identify(self, infile, filename):
+        header = read_header(infile)
+        candidates = []
+        for length, signatures in self.signatures.items():
+            candidates.extend(signatures.get(header[:length], []))
+        candidates.sort(key=lambda fmt: fmt.cost)
+        for fmt in candidates:
+            if self._probe(fmt, header, infile):
+                return fmt
+
+        # No signature matched: run the probes of the remaining formats
+        extension = splitext(filename or '')[1].lower()
+        fallback = [fmt for fmt in self.formats
+                    if fmt.probe and fmt not in candidates]
+        fallback.sort(key=lambda fmt: (extension not in fmt.extensions,
+                                       fmt.cost))
+        for fmt in fallback:
+            LOG.debug('Probing %r', fmt.name)
+            if self._probe(fmt, header, infile):
+                return fmt
+        return None
+
+    def find_parser(self, infile: IO,
+                    filename: Optional[str] = None) -> Optional[Callable]:
+        fmt = self.identify(infile, filename)
+        if fmt is None:
+            return None
+        LOG.debug('Detected format %r', fmt.name)
+        return load_object(fmt.parser)
+
+
+_DEFAULT = None
+
+
+def default_registry() -> FormatRegistry:
+    '''
+    Returns the registry with the built-in formats and those published via
+    entry points (loaded when first needed).
+    '''
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = FormatRegistry(BUILTIN_FORMATS, ENTRY_POINT_GROUP)
+    return _DEFAULT
+
+
+def module_parser(infile: IO, module: str) -> Optional[Callable]:
+    '''
+    Returns the parser for *infile* if it has one of the built-in formats
+    handled by the parser module *module*, else ``None``. This backs the
+    ``sniff`` functions of the parser modules.
+    '''
+    registry = FormatRegistry(
+        fmt for fmt in BUILTIN_FORMATS
+        if fmt.parser.partition(':')[0] == module)
+    return registry.find_parser(infile)
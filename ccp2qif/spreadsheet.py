@@ -0,0 +1,137 @@
+'''
+Row-wise reading of spreadsheet exports.
+
+``.xlsx`` files are read with :py:mod:`openpyxl` in read-only mode, which
+streams the rows from the archive without loading the whole workbook.
+``.xls`` files are read with :py:mod:`xlrd`. The BIFF format can not be
+streamed, but the file is memory-mapped when possible and only the first
+sheet is loaded.
+
+In both cases whole rows are pulled at once instead of accessing the cells
+one by one.
+'''
+from datetime import date, datetime
+from typing import IO, Iterator, List, Sequence, Tuple, Union
+import io
+import logging
+import mmap
+
+from ccp2qif.util import read_header
+
+LOG = logging.getLogger(__name__)
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+#: Ordinal of the day before the first day of the Excel calendar, for each
+#: datemode
+EPOCH_ORDINALS = (
+    date(1899, 12, 30).toordinal(),
+    date(1904, 1, 1).toordinal(),
+)
+
+
+class SheetReader:
+    '''
+    Iterates over the rows of the first sheet of a workbook as tuples of
+    cell values.
+
+    :param infile: A filename or a binary file object.
+    '''
+
+    def __init__(self, infile: Union[str, IO]):
+        self.datemode = 0
+        self._close = lambda: None
+        if isinstance(infile, io.TextIOBase):
+            infile = infile.buffer
+        if isinstance(infile, str):
+            with open(infile, 'rb') as fptr:
+                header = read_header(fptr, len(ZIP_MAGIC))
+        else:
+            header = read_header(infile, len(ZIP_MAGIC))
+        if header == ZIP_MAGIC:
+            self._rows = self._open_xlsx(infile)
+        else:
+            self._rows = self._open_xls(infile)
+
+    def _open_xlsx(self, infile) -> Iterator[Tuple]:
+        from openpyxl import load_workbook
+        book = load_workbook(infile, read_only=True, data_only=True)
+        self._close = book.close
+        if book.epoch.year == 1904:
+            self.datemode = 1
+        sheet = book.worksheets[0]
+        # Read-only sheets may report trailing rows without content
+        return (row for row in sheet.iter_rows(values_only=True)
+                if any(value is not None for value in row))
+
+    def _open_xls(self, infile) -> Iterator[Tuple]:
+        from xlrd import open_workbook
+        if isinstance(infile, str):
+            book = open_workbook(infile, on_demand=True)
+            self._close = book.release_resources
+        else:
+            contents = _contents(infile)
+            try:
+                book = open_workbook(file_contents=contents, on_demand=True)
+            except Exception:
+                _release(contents)
+                raise
+
+            def close():
+                book.release_resources()
+                _release(contents)
+            self._close = close
+        self.datemode = book.datemode
+        sheet = book.sheet_by_index(0)
+        return (tuple(sheet.row_values(row_index))
+                for row_index in range(sheet.nrows))
+
+    def __iter__(self) -> Iterator[Tuple]:
+        try:
+            yield from self._rows
+        finally:
+            self.close()
+
+    def close(self):
+        self._close()
+
+
+def _contents(infile: IO):
+    '''
+    Returns the content of *infile*, memory-mapped if it is a real file.
+    '''
+    try:
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        infile.seek(0)
+        return infile.read()
+
+
+def _release(contents):
+    '''
+    Closes the memory map returned by :py:func:`_contents`, if it is one.
+    '''
+    if isinstance(contents, mmap.mmap):
+        contents.close()
+
+
+def excel_dates(values: Sequence, datemode: int) -> List[date]:
+    '''
+    Converts a column of Excel date serials into dates. Values which are
+    already dates (as returned for typed ``.xlsx`` cells) are passed through.
+    '''
+    epoch = EPOCH_ORDINALS[datemode]
+    output = []
+    for value in values:
+        if isinstance(value, datetime):
+            output.append(value.date())
+        elif isinstance(value, date):
+            output.append(value)
+        elif datemode == 0 and value < 61:
+            # The 1900 calendar contains the non-existing 29/02/1900. Let
+            # xlrd deal with the dates before it.
+            from xlrd import xldate_as_tuple
+            output.append(date(*xldate_as_tuple(value, datemode)[:3]))
+        else:
+            output.append(date.fromordinal(epoch + int(value)))
+    return output
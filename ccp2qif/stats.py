@@ -0,0 +1,164 @@
+'''
+Instrumentation of conversions.
+
+A :py:class:`ConversionStats` instance collects the wall-clock and CPU time
+spent in each stage of a conversion together with a few counters:
+
+* ``detect``: sniffing the file type.
+* ``cache``: hashing the input and looking it up in the conversion cache.
+* ``parse``: reading and decoding the rows (time spent producing
+  transactions). Decoding is not timed on its own: rows are decoded as the
+  parser yields them (or per batch in columnar mode), so a separate timer
+  would have to wrap every field and cost more than the decoding itself.
+* ``write``: rendering and writing the QIF output.
+
+Pass an instance to :py:func:`ccp2qif.core.convert` to collect the figures
+of one conversion. Callbacks registered with :py:func:`add_hook` receive the
+statistics of every conversion, which is the place to export them to a
+metrics system::
+
+    def export(stats):
+        statsd.timing('ccp2qif.parse', stats.stages['parse']['wall'])
+
+    add_hook(export)
+
+Timing the stages costs a little time per row, so it is only done when
+statistics are requested or a hook is registered.
+'''
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter, process_time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import json
+import logging
+
+LOG = logging.getLogger(__name__)
+
+_CURRENT = ContextVar('ccp2qif_stats', default=None)
+_HOOKS: List[Callable[['ConversionStats'], None]] = []
+
+
+class ConversionStats:
+    '''
+    Timings and counters of one conversion.
+    '''
+
+    def __init__(self):
+        self.source: Optional[str] = None
+        self.target: Optional[str] = None
+        self.parser: Optional[str] = None
+        self.cached = False
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters = {
+            'rows': 0,
+            'blank_rows': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+        }
+
+    def add_time(self, name: str, wall: float, cpu: float):
+        '''
+        Adds *wall* and *cpu* seconds to the stage *name*.
+        '''
+        stage = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+        stage['wall'] += wall
+        stage['cpu'] += cpu
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str):
+        '''
+        Times the enclosed block as stage *name*.
+        '''
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield self
+        finally:
+            self.add_time(name, perf_counter() - wall, process_time() - cpu)
+
+    def timed(self, items: Iterable, name: str = 'parse') -> Iterator:
+        '''
+        Passes *items* through, counting them as rows and adding the time
+        spent producing them to the stage *name*.
+        '''
+        iterator = iter(items)
+        wall = cpu = 0.0
+        rows = 0
+        try:
+            while True:
+                start_wall, start_cpu = perf_counter(), process_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall += perf_counter() - start_wall
+                    cpu += process_time() - start_cpu
+                rows += 1
+                yield item
+        finally:
+            self.add_time(name, wall, cpu)
+            self.count('rows', rows)
+
+    def as_dict(self) -> dict:
+        return {
+            'source': self.source,
+            'target': self.target,
+            'parser': self.parser,
+            'cached': self.cached,
+            'stages': self.stages,
+            'counters': self.counters,
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+def current() -> Optional[ConversionStats]:
+    '''
+    Returns the statistics of the conversion running in this context, if
+    they are being collected. Parsers use this to report skipped blank rows.
+    '''
+    return _CURRENT.get()
+
+
+@contextmanager
+def collecting(stats: ConversionStats):
+    '''
+    Makes *stats* the :py:func:`current` statistics for the enclosed block.
+    '''
+    token = _CURRENT.set(stats)
+    try:
+        yield stats
+    finally:
+        _CURRENT.reset(token)
+
+
+def add_hook(callback: Callable[[ConversionStats], None]):
+    '''
+    Registers *callback* to be called with the statistics of each completed
+    conversion.
+    '''
+    _HOOKS.append(callback)
+
+
+def remove_hook(callback: Callable[[ConversionStats], None]):
+    _HOOKS.remove(callback)
+
+
+def has_hooks() -> bool:
+    return bool(_HOOKS)
+
+
+def publish(stats: ConversionStats):
+    '''
+    Passes *stats* to all registered hooks. Errors in hooks are logged and
+    do not fail the conversion.
+    '''
+    for callback in list(_HOOKS):
+        try:
+            callback(stats)
+        except Exception:
+            LOG.exception('Statistics hook %r failed', callback)
@@ -0,0 +1,168 @@
+'''
+A fast reader for the semicolon separated exports.
+
+The file is memory-mapped and cut into blocks of about :py:data:`BLOCK_SIZE`
+bytes which end on record boundaries. Each block is decoded with a single
+call and split into lines and fields with :py:meth:`str.split`, so no Python
+code runs per field. Blocks containing quote characters are handed to
+:py:func:`csv.reader` instead, which keeps the exact CSV semantics for
+quoted fields (including line breaks within them).
+
+A newline only ends a record if the number of quote characters before it is
+even. The same rule is used by :py:mod:`ccp2qif.parallel` to split files
+between processes.
+
+Measured on synthetic exports, splitting the undecoded bytes and decoding
+only the used fields was slower than this: one decode per block is done in C
+whereas decoding single fields costs a Python call each.
+'''
+from itertools import chain, repeat
+from typing import IO, Iterator, List, Tuple
+import csv
+import io
+import mmap
+
+from ccp2qif.util import text_stream
+
+#: Approximate number of bytes decoded at once
+BLOCK_SIZE = 1024 * 1024
+
+#: Size of the blocks in which quote characters are counted
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+def _count_quotes(view, start: int, end: int) -> int:
+    if view.find(b'"', start, end) < 0:
+        return 0
+    total = 0
+    for offset in range(start, end, SCAN_BLOCK_SIZE):
+        total += view[offset:min(offset + SCAN_BLOCK_SIZE, end)].count(b'"')
+    return total
+
+
+def iter_record_ranges(view, start: int, end: int,
+                       size: int = BLOCK_SIZE) -> Iterator[Tuple[int, int]]:
+    '''
+    Splits the bytes *start* to *end* of *view* (``bytes`` or an ``mmap``)
+    into consecutive ranges of about *size* bytes ending on record
+    boundaries.
+    '''
+    begin = position = start
+    parity = 0  # number of quotes in view[start:position], modulo 2
+    while begin + size < end:
+        target = begin + size
+        parity ^= _count_quotes(view, position, target) & 1
+        position = target
+        while True:
+            newline = view.find(b'\n', position, end)
+            if newline < 0:
+                position = end
+                break
+            parity ^= _count_quotes(view, position, newline) & 1
+            position = newline + 1
+            if not parity:
+                break
+        if position >= end:
+            break
+        yield begin, position
+        begin = position
+    if begin < end:
+        yield begin, end
+
+
+def record_ranges(view, start: int, end: int,
+                  size: int = BLOCK_SIZE) -> List[Tuple[int, int]]:
+    '''
+    Like :py:func:`iter_record_ranges`, but returns a list.
+    '''
+    return list(iter_record_ranges(view, start, end, size))
+
+
+def _split_text(text: str) -> Iterator[list]:
+    if '\r' in text:
+        # Same as the universal newline mode of text files
+        text = text.replace('\r\n', '\n')
+        if '\r' in text:
+            text = text.replace('\r', '\n')
+    if '"' in text:
+        return csv.reader(io.StringIO(text), delimiter=';', quotechar='"')
+    lines = text.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    if '\n\n' in text or text.startswith('\n'):
+        # Blank lines become empty rows, like with csv.reader
+        return iter([line.split(';') if line else [] for line in lines])
+    return map(str.split, lines, repeat(';'))
+
+
+def _iter_blocks(view, start, end, encoding, block_size, close=False):
+    try:
+        for begin, stop in iter_record_ranges(view, start, end, block_size):
+            yield view[begin:stop].decode(encoding)
+    finally:
+        if close:
+            view.close()
+
+
+def iter_rows(view, start: int = 0, end: int = None,
+              encoding: str = 'cp1252',
+              block_size: int = BLOCK_SIZE) -> Iterator[list]:
+    '''
+    Yields the rows of the semicolon separated data in ``view[start:end]``
+    as lists of strings, like :py:func:`csv.reader` would.
+    '''
+    if end is None:
+        end = len(view)
+    # Rows are chained in C, only each block passes through Python code
+    return chain.from_iterable(map(_split_text, _iter_blocks(
+        view, start, end, encoding, block_size)))
+
+
+def _map(infile: IO):
+    try:
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def open_records(infile: IO, header_lines: int,
+                 encoding: str = 'cp1252') -> Tuple[List[str], Iterator]:
+    '''
+    Reads an export consisting of *header_lines* lines followed by
+    semicolon separated records.
+
+    Returns the header lines (including their line terminator, as when
+    iterating over a text file) and an iterator over the rows. Files which
+    can be memory-mapped are read with :py:func:`iter_rows`, other file
+    objects with :py:func:`csv.reader`. So are files without any line feed
+    (using a bare carriage return as line terminator), as
+    :py:func:`iter_rows` only splits records at line feeds.
+
+    :raises ValueError: If the file ends within the header.
+    '''
+    view = None
+    if not isinstance(infile, io.TextIOBase):
+        view = _map(infile)
+        if view is not None and view.find(b'\n') < 0:
+            view.close()
+            view = None
+    if view is None:
+        infile = text_stream(infile, encoding)
+        header = [infile.readline() for _ in range(header_lines)]
+        if header and not header[-1]:
+            raise ValueError('Unexpected end of file in the header')
+        return header, csv.reader(infile, delimiter=';', quotechar='"')
+
+    header = []
+    position = 0
+    for _ in range(header_lines):
+        newline = view.find(b'\n', position)
+        if newline < 0:
+            view.close()
+            raise ValueError('Unexpected end of file in the header')
+        line = view[position:newline + 1].decode(encoding)
+        header.append(line.replace('\r\n', '\n'))
+        position = newline + 1
+    blocks = _iter_blocks(view, position, len(view), encoding, BLOCK_SIZE,
+                          close=True)
+    return header, chain.from_iterable(map(_split_text, blocks))
@@ -1,8 +1,14 @@
-from os.path import basename
+from os.path import basename, realpath, samefile
+from typing import IO, Iterable, Iterator, TextIO
 import codecs
 import csv
+import io
 
-from schwifty import IBAN
+from ccp2qif.iban import normalise_iban
+from ccp2qif.stats import current as current_stats
+
+#: The number of bytes made available to file-type sniffers
+HEADER_SIZE = 512
 
 
 class UTF8Recoder:
@@ -40,10 +46,125 @@ class UnicodeReader:
 def account_name_from_filename(filename: str) -> str:
     # if the filename is a valid IBAN number, we take this as account number
     base_name, _, _ = basename(filename).rpartition('.')
+    return normalise_iban(base_name)
+
+
+class _BorrowedText(io.TextIOWrapper):
+    """
+    A text wrapper which leaves the wrapped binary file open when it is
+    closed or garbage collected. The caller owns the file.
+    """
+
+    def close(self):
+        try:
+            self.detach()
+        except ValueError:
+            pass  # already detached
+
+
+def text_stream(infile: IO, encoding: str = 'cp1252') -> TextIO:
+    """
+    Returns *infile* as a text stream. Binary files are wrapped into a text
+    decoder, text files are returned unchanged. Discarding the wrapper does
+    not close *infile*.
+    """
+    if isinstance(infile, io.TextIOBase):
+        return infile
+    return _BorrowedText(infile, encoding=encoding)
+
+
+class MemoryReader(io.RawIOBase):
+    """
+    A seekable, read-only binary file over a bytes-like object. Unlike
+    :py:class:`io.BytesIO` it does not copy the data up front.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        start = self._position
+        size = min(len(buffer), len(self._view) - start)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[start:start + size]
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError('negative seek position %d' % offset)
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+
+def open_bytes(data) -> IO:
+    """
+    Returns a binary file object reading from the bytes-like object *data*.
+    """
+    if isinstance(data, bytes):
+        # BytesIO shares immutable bytes until it is written to
+        return io.BytesIO(data)
+    return io.BufferedReader(MemoryReader(data))
+
+
+def same_file(first: str, second: str) -> bool:
+    """
+    Tells whether the paths *first* and *second* refer to the same file.
+    The files do not need to exist.
+    """
+    try:
+        return samefile(first, second)
+    except OSError:
+        return realpath(first) == realpath(second)
+
+
+def read_header(infile: IO, size: int = HEADER_SIZE) -> bytes:
+    """
+    Returns the first *size* bytes of *infile* and rewinds it. Text-mode
+    files are accepted as well, their content is encoded as cp1252.
+    """
+    infile.seek(0)
+    header = infile.read(size)
+    infile.seek(0)
+    if isinstance(header, str):
+        header = header.encode('cp1252', errors='replace')
+    return header
+
+
+def skip_blank_rows(rows: Iterable[list]) -> Iterator[list]:
+    """
+    Drops the empty rows produced by blank lines in CSV files. When
+    statistics are collected (see :py:mod:`ccp2qif.stats`) they are counted
+    as ``blank_rows``.
+    """
+    stats = current_stats()
+    if stats is None:
+        return filter(None, rows)
+    return _count_blank_rows(rows, stats)
+
+
+def _count_blank_rows(rows, stats):
+    blank = 0
     try:
-        iban = IBAN(base_name)
-    except ValueError:
-        # not a valid IBAN number. We can ignore this.
-        return None
-    else:
-        return iban.formatted
+        for row in rows:
+            if row:
+                yield row
+            else:
+                blank += 1
+    finally:
+        stats.count('blank_rows', blank)
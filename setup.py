@@ -12,14 +12,26 @@ setup(
     license='MIT',
     install_requires=[
         'gouge',
+        'openpyxl',
         'schwifty',
         'xlrd',
     ],
-    packages=find_packages(),
+    extras_require={
+        'columnar': ['numpy'],
+        'arrow': ['pyarrow'],
+        # Needed by benchmarks/generate.py for the ccp-xls format
+        'bench': ['xlwt'],
+    },
+    packages=find_packages(
+        exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
     entry_points={
         'console_scripts': {
             'ccp2qif=ccp2qif.core:climain',
             'augment_qif=ccp2qif.qiftools.augment:main',
+            'merge_exports=ccp2qif.merge:main',
+            'ccp2qifd=ccp2qif.daemon:main',
+            'anonymise_qif=ccp2qif.qiftools.anonymise:main',
+            'ccp2qif_ledger=ccp2qif.ledger:main',
         }
     },
     classifiers=[
@@ -0,0 +1,77 @@
+from asyncio import CancelledError, StreamReader, create_task, run, sleep
+import threading
+import time
+
+import pytest
+
+from ccp2qif import aio
+from ccp2qif.aio import convert_async, convert_to_bytes_async
+
+
+def expected():
+    with open('testdata/bil/liste_mouvements.qif',
+              encoding='cp1252') as infile:
+        return infile.read().encode('cp1252')
+
+
+def source_bytes():
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        return infile.read()
+
+
+def test_convert_bytes():
+    result = run(convert_to_bytes_async(source_bytes()))
+    assert result == expected()
+
+
+def test_convert_stream_reader():
+    async def convert():
+        reader = StreamReader()
+        reader.feed_data(source_bytes())
+        reader.feed_eof()
+        return [chunk async for chunk in convert_async(
+            reader, buffer_size=100)]
+
+    chunks = run(convert())
+    assert len(chunks) > 2
+    assert b''.join(chunks) == expected()
+
+
+def test_convert_async_iterable():
+    async def chunks():
+        data = source_bytes()
+        for start in range(0, len(data), 100):
+            yield data[start:start + 100]
+
+    assert run(convert_to_bytes_async(chunks())) == expected()
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        run(convert_to_bytes_async(b'no export'))
+
+
+def test_cancel_while_converting(monkeypatch):
+    started = threading.Event()
+
+    def slow_stream(*args, **kwargs):
+        yield b'first'
+        started.set()
+        time.sleep(0.2)
+        yield b'second'
+
+    monkeypatch.setattr(aio, 'convert_stream', slow_stream)
+
+    async def consume():
+        async for _ in convert_async(b''):
+            pass
+
+    async def cancel():
+        task = create_task(consume())
+        while not started.is_set():
+            await sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(CancelledError):
+        run(cancel())
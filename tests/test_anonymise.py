@@ -0,0 +1,82 @@
+from io import StringIO
+
+import pytest
+
+from ccp2qif.core import convert
+from ccp2qif.model import AccountInfo
+from ccp2qif.qiftools.anonymise import (
+    anonymise,
+    anonymise_files,
+    main,
+    resolve_key,
+)
+from ccp2qif.qiftools.reader import read_qif
+
+SOURCE = 'testdata/ccp/ccp_out.qif'
+
+
+def run(key, source=SOURCE):
+    output = StringIO()
+    anonymise(source, output, key)
+    return output.getvalue()
+
+
+def test_deterministic():
+    assert run(b'secret') == run(b'secret')
+    assert run(b'secret') != run(b'other')
+
+
+def test_replacements():
+    original = list(read_qif(SOURCE))
+    result = list(read_qif(StringIO(run(b'secret'))))
+    assert len(result) == len(original)
+    assert isinstance(result[0], AccountInfo)
+    assert result[0].account_number != original[0].account_number
+    for before, after in zip(original[1:], result[1:]):
+        assert after.date == before.date
+        assert (after.value < 0) == (before.value < 0)
+        assert after.message != before.message
+        assert after.counterparty != before.counterparty
+    # The same counterparty is always replaced by the same value
+    assert len({row.counterparty for row in original[1:]}) == \
+        len({row.counterparty for row in result[1:]})
+
+
+def test_anonymise_files(tmpdir):
+    jobs = [(SOURCE, str(tmpdir.join('a.qif'))),
+            (SOURCE, str(tmpdir.join('b.qif'))),
+            ('testdata/missing.qif', str(tmpdir.join('c.qif')))]
+    errors = anonymise_files(jobs, b'secret', workers=2)
+    assert len(errors) == 1
+    assert 'missing.qif' in errors[0]
+    assert tmpdir.join('a.qif').read() == tmpdir.join('b.qif').read()
+    assert tmpdir.join('a.qif').read() == run(b'secret')
+
+
+def test_anonymise_files_refuses_clashes(tmpdir):
+    target = str(tmpdir.join('out.qif'))
+    with pytest.raises(ValueError):
+        anonymise_files([(SOURCE, target), ('other/out.qif', target)],
+                        b'secret')
+    with pytest.raises(ValueError):
+        anonymise_files([(SOURCE, SOURCE)], b'secret')
+
+
+def test_long_keys_are_not_truncated():
+    common = 'x' * 64
+    assert resolve_key('secret') == b'secret'
+    assert len(resolve_key(common + 'a')) == 64
+    assert resolve_key(common + 'a') != resolve_key(common + 'b')
+
+
+def test_date_format(tmpdir, capsys):
+    source = str(tmpdir.join('iso.qif'))
+    convert('testdata/ccp/ccp_in.csv', source, datefmt='%Y-%m-%d')
+    assert main(['-k', 'secret', '--date-format', '%Y-%m-%d', source]) == 0
+
+    def dates(lines):
+        return [line for line in lines if line[:2] == 'D2']
+    with open(source, encoding='cp1252') as infile:
+        expected = dates(infile)
+    assert len(expected) == 5
+    assert dates(capsys.readouterr().out.splitlines(True)) == expected
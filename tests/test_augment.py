@@ -0,0 +1,42 @@
+import json
+
+from ccp2qif.qiftools.augment import (
+    has_account_identifier,
+    prepend_account,
+    process_folder,
+)
+
+BODY = '!Type:Bank\nD02/01/2017\nT-16.70\nMfoo\n^\n'
+
+
+def test_has_account_identifier(tmpdir):
+    assert has_account_identifier('testdata/bil/liste_mouvements.qif')
+    qif = tmpdir.join('plain.qif')
+    qif.write(BODY)
+    assert not has_account_identifier(str(qif))
+
+
+def test_prepend_account(tmpdir):
+    qif = tmpdir.join('plain.qif')
+    qif.write(BODY)
+    prepend_account(str(qif), 'LU00')
+    assert qif.read() == '!Account\nNLU00\nTBank\n^\n' + BODY
+    assert tmpdir.join('plain.qif.bak').read() == BODY
+
+
+def test_process_folder_unattended(tmpdir):
+    tmpdir.join('hints.json').write(json.dumps({'LU00': ['current']}))
+    tmpdir.join('current-2018.qif').write(BODY)
+    tmpdir.join('unknown.qif').write(BODY)
+    tmpdir.join('done.qif').write('!Account\nNLU01\n^\n' + BODY)
+
+    errors = process_folder(str(tmpdir), interactive=False, jobs=2)
+
+    assert len(errors) == 1
+    assert 'unknown.qif' in errors[0]
+    assert tmpdir.join('current-2018.qif').read().startswith(
+        '!Account\nNLU00\n')
+    assert tmpdir.join('unknown.qif').read() == BODY
+    assert not tmpdir.join('done.qif.bak').exists()
+    hints = json.loads(tmpdir.join('hints.json').read())
+    assert sorted(hints['LU00']) == ['current', 'current-2018.qif']
@@ -0,0 +1,56 @@
+from os.path import join
+
+import pytest
+
+from ccp2qif.batch import (
+    BatchJob,
+    collect_inputs,
+    convert_batch,
+    duplicate_targets,
+    target_filename,
+)
+
+
+def test_collect_inputs():
+    result = collect_inputs(['testdata/bil', 'testdata/ccp/*.csv'])
+    assert result == [
+        join('testdata/bil', 'liste_mouvements.txt'),
+        'testdata/ccp/ccp_in.csv',
+    ]
+
+
+def test_target_filename():
+    assert target_filename('a/b/c.csv') == 'a/b/c.qif'
+    assert target_filename('a/b/c.csv', 'out') == join('out', 'c.qif')
+
+
+def test_convert_batch(tmpdir):
+    jobs = [
+        BatchJob('testdata/bil/liste_mouvements.txt',
+                 str(tmpdir.join('bil.qif')), {}),
+        BatchJob('testdata/does-not-exist.csv',
+                 str(tmpdir.join('missing.qif')), {}),
+    ]
+    result = convert_batch(jobs, workers=2)
+    assert [row.source for row in result] == [job.source for job in jobs]
+    assert result[0].error is None
+    assert 'FileNotFoundError' in result[1].error
+    with open('testdata/bil/liste_mouvements.qif') as infile:
+        assert tmpdir.join('bil.qif').read() == infile.read()
+
+
+def test_duplicate_targets(tmpdir):
+    jobs = [
+        BatchJob('a/x.csv', target_filename('a/x.csv', str(tmpdir)), {}),
+        BatchJob('b/x.txt', target_filename('b/x.txt', str(tmpdir)), {}),
+        BatchJob('b/y.txt', target_filename('b/y.txt', str(tmpdir)), {}),
+    ]
+    assert duplicate_targets((job.source, job.target) for job in jobs) == {
+        str(tmpdir.join('x.qif')): ['a/x.csv', 'b/x.txt']}
+    with pytest.raises(ValueError):
+        convert_batch(jobs)
+
+
+def test_collect_inputs_skips_output_format():
+    result = collect_inputs(['testdata/ccp'], ('.csv',))
+    assert result == [join('testdata/ccp', 'ccp_in.xlsx')]
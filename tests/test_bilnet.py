@@ -2,7 +2,7 @@ from datetime import date
 from decimal import Decimal
 from io import StringIO
 
-from ccp2qif.bil import parse
+from ccp2qif.bil import parse, stream
 from ccp2qif.core import (
     AccountInfo,
     QIFTransaction as QT,
@@ -41,3 +41,14 @@ def test_to_qif():
     write_qif(input_data, output)
     result = output.getvalue()
     assert result == expected
+
+
+def test_stream():
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        expected = parse(infile)
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        result = stream(infile)
+        assert result.account == expected.account
+        assert not isinstance(result.transactions, list)
+        assert next(result.transactions) == expected.transactions[0]
+        assert list(result.transactions) == expected.transactions[1:]
@@ -0,0 +1,49 @@
+from os import utime
+from time import time
+
+from ccp2qif.cache import ConversionCache
+from ccp2qif.core import convert
+
+SOURCE = 'testdata/bil/liste_mouvements.txt'
+
+
+def test_skip_unchanged(tmpdir, monkeypatch):
+    cache = ConversionCache(str(tmpdir.join('cache')))
+    target = str(tmpdir.join('out.qif'))
+    convert(SOURCE, target, cache=cache)
+    expected = tmpdir.join('out.qif').read()
+
+    calls = []
+    monkeypatch.setattr('ccp2qif.core.convert_file',
+                        lambda *args, **kwargs: calls.append(args))
+    convert(SOURCE, target, cache=cache)
+    assert calls == []
+
+    # A deleted output is restored from the cache without parsing
+    tmpdir.join('out.qif').remove()
+    convert(SOURCE, target, cache=cache)
+    assert calls == []
+    assert tmpdir.join('out.qif').read() == expected
+
+    # Different options and --force do not use the cache
+    convert(SOURCE, target, cache=cache, account_name='other')
+    convert(SOURCE, target, cache=cache, force=True)
+    assert len(calls) == 2
+
+
+def test_evict(tmpdir):
+    cache = ConversionCache(str(tmpdir.join('cache')), max_bytes=700)
+    for index in range(3):
+        target = tmpdir.join('out%d.qif' % index)
+        target.write('x' * 300)
+        cache.store('key%d' % index, str(target))
+        timestamp = time() - 100 + index
+        utime(cache._paths('key%d' % index)[0], (timestamp, timestamp))
+    cache.evict()
+    assert 'key0' not in cache
+    assert 'key1' in cache
+    assert 'key2' in cache
+
+    cache.max_age = 0
+    cache.evict()
+    assert 'key2' not in cache
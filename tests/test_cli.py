@@ -0,0 +1,49 @@
+from shutil import copy
+import sys
+
+import pytest
+
+from ccp2qif.core import climain
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['ccp2qif'] + list(args))
+    return climain()
+
+
+@pytest.mark.parametrize('args', [
+    ['--format', 'csv'],
+    ['-o', '{source}'],
+])
+def test_refuses_to_overwrite_input(monkeypatch, tmpdir, args):
+    source = str(tmpdir.join('export.csv'))
+    copy('testdata/ccp/ccp_in.csv', source)
+    args = [arg.format(source=source) for arg in args]
+    assert run(monkeypatch, *args, source) == 9
+    with open('testdata/ccp/ccp_in.csv', 'rb') as infile:
+        assert tmpdir.join('export.csv').read_binary() == infile.read()
+
+
+def test_batch_skips_outputs(monkeypatch, tmpdir):
+    copy('testdata/ccp/ccp_in.csv', str(tmpdir.join('export.csv')))
+    copy('testdata/bil/liste_mouvements.txt', str(tmpdir.join('bil.txt')))
+    assert run(monkeypatch, '--format', 'csv', str(tmpdir)) == 0
+    with open('testdata/ccp/ccp_in.csv', 'rb') as infile:
+        assert tmpdir.join('export.csv').read_binary() == infile.read()
+    assert tmpdir.join('bil.csv').check()
+
+
+def test_batch_rerun(monkeypatch, tmpdir):
+    pytest.importorskip('pyarrow')
+    copy('testdata/ccp/ccp_in.csv', str(tmpdir.join('a.csv')))
+    copy('testdata/bil/liste_mouvements.txt', str(tmpdir.join('b.txt')))
+    for _ in range(2):
+        assert run(monkeypatch, '--format', 'parquet', str(tmpdir)) == 0
+    assert sorted(path.basename for path in tmpdir.listdir()) == [
+        'a.csv', 'a.parquet', 'b.parquet', 'b.txt']
+
+
+def test_qif_input(monkeypatch, tmpdir):
+    source = str(tmpdir.join('export.qif'))
+    copy('testdata/ccp/ccp_out.qif', source)
+    assert run(monkeypatch, source) == 9
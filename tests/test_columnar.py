@@ -0,0 +1,50 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from ccp2qif.bil import parse
+from ccp2qif.columnar import ColumnarTransactions
+from ccp2qif.core import QIFTransaction as QT
+
+
+def test_roundtrip():
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        expected = parse(infile).transactions
+    result = ColumnarTransactions(expected)
+    assert len(result) == len(expected)
+    assert list(result) == expected
+    assert result[-1] == expected[-1]
+    assert len(result.strings) == len(expected) + 1  # + empty string
+
+
+def test_amount_exponent_preserved():
+    result = ColumnarTransactions([
+        QT(date(2017, 1, 5), Decimal('500'), '', '', ''),
+        QT(date(2017, 1, 5), Decimal('-16.70'), '', '', ''),
+    ])
+    assert [str(row.value) for row in result] == ['500', '-16.70']
+
+
+def test_index_error():
+    with pytest.raises(IndexError):
+        ColumnarTransactions()[0]
+
+
+def test_non_finite():
+    with pytest.raises(ValueError):
+        ColumnarTransactions([QT(date(2017, 1, 5), Decimal('NaN'),
+                                 '', '', '')])
+
+
+@pytest.mark.parametrize('value', [
+    '-0.00', '0.00', '1E+200', '1.5E-200', '-1234567890123456789012.34',
+    '999999999999999999', '-0.01',
+])
+def test_amounts_which_do_not_fit_the_arrays(value):
+    result = ColumnarTransactions([
+        QT(date(2017, 1, 5), Decimal(value), '', '', ''),
+        QT(date(2017, 1, 6), Decimal('-16.70'), '', '', ''),
+    ])
+    assert [str(row.value) for row in result] == [
+        str(Decimal(value)), '-16.70']
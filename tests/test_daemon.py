@@ -0,0 +1,131 @@
+from shutil import copy
+from threading import Event, Thread
+from time import sleep, time
+import json
+import socket
+
+import pytest
+
+from ccp2qif.daemon import (
+    ConversionService,
+    InotifyWatcher,
+    PollingWatcher,
+    is_candidate,
+    serve_status,
+)
+
+
+def wait_for(condition, timeout=30):
+    deadline = time() + timeout
+    while time() < deadline:
+        if condition():
+            return True
+        sleep(0.1)
+    return False
+
+
+def test_is_candidate():
+    assert is_candidate('export.csv')
+    assert not is_candidate('.export.csv')
+    assert not is_candidate('export.csv.part')
+    assert not is_candidate('export.qif')
+
+
+def test_polling_watcher_waits_for_stable_files(tmpdir):
+    tmpdir.join('export.csv').write('data')
+    watcher = PollingWatcher(str(tmpdir))
+    assert watcher.scan() == []
+    assert watcher.scan() == [str(tmpdir.join('export.csv'))]
+
+
+def test_inotify_watcher_ignores_folders(tmpdir):
+    inbox = tmpdir.mkdir('inbox')
+    try:
+        watcher = InotifyWatcher(str(inbox))
+    except OSError:
+        pytest.skip('inotify is not available')
+    found = []
+    stop = Event()
+    thread = Thread(target=watcher.run, args=(stop, found.append))
+    thread.start()
+    try:
+        tmpdir.mkdir('folder.csv').move(inbox.join('folder.csv'))
+        inbox.join('export.csv').write('data')
+        assert wait_for(lambda: found)
+    finally:
+        stop.set()
+        thread.join()
+    assert set(found) == {str(inbox.join('export.csv'))}
+
+
+def test_inotify_watcher_waits_for_existing_files(tmpdir):
+    inbox = tmpdir.mkdir('inbox')
+    export = inbox.join('export.csv')
+    try:
+        watcher = InotifyWatcher(str(inbox), settle_interval=0.2)
+    except OSError:
+        pytest.skip('inotify is not available')
+    found = []
+    stop = Event()
+    thread = Thread(target=watcher.run, args=(stop, found.append))
+    with export.open('w') as outfile:
+        thread.start()
+        try:
+            # Still being written when the watcher starts
+            for _ in range(8):
+                outfile.write('data')
+                outfile.flush()
+                sleep(0.1)
+            assert found == []
+            outfile.close()
+            assert wait_for(lambda: found)
+        finally:
+            stop.set()
+            thread.join()
+    assert set(found) == {str(export)}
+
+
+def test_claim_target(tmpdir):
+    inbox = tmpdir.mkdir('inbox')
+    outbox = tmpdir.mkdir('outbox')
+    outbox.join('c.qif').write('')
+    service = ConversionService(str(inbox), str(outbox), polling=True)
+    assert service.claim_target(str(inbox.join('a.csv'))) == str(
+        outbox.join('a.qif'))
+    assert service.claim_target(str(inbox.join('a.txt'))) == str(
+        outbox.join('a-1.qif'))
+    assert service.claim_target(str(inbox.join('c.csv'))) == str(
+        outbox.join('c-1.qif'))
+
+
+def test_service(tmpdir):
+    inbox = tmpdir.mkdir('inbox')
+    outbox = tmpdir.join('outbox')
+    service = ConversionService(str(inbox), str(outbox), workers=1,
+                                poll_interval=0.1)
+    server = serve_status(service, str(tmpdir.join('status.sock')))
+    service.start()
+    try:
+        copy('testdata/bil/liste_mouvements.txt', str(inbox))
+        inbox.join('broken.txt').write('not an export')
+        assert wait_for(lambda: service.status()['processed'] +
+                        service.status()['failed'] == 2)
+    finally:
+        service.stop()
+
+    with open('testdata/bil/liste_mouvements.qif') as infile:
+        assert outbox.join('liste_mouvements.qif').read() == infile.read()
+    assert sorted(name.basename for name in outbox.listdir()) == [
+        'liste_mouvements.qif']
+    assert inbox.join('processed', 'liste_mouvements.txt').check()
+    assert inbox.join('failed', 'broken.txt').check()
+
+    client = socket.socket(socket.AF_UNIX)
+    client.connect(str(tmpdir.join('status.sock')))
+    status = json.loads(client.makefile().readline())
+    client.close()
+    server.shutdown()
+    server.server_close()
+    assert status['processed'] == 1
+    assert status['failed'] == 1
+    assert status['queued'] == 0
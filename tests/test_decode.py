@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+import pytest
+
+import ccp2qif.bil
+import ccp2qif.ccp
+from ccp2qif.core import write_qif
+from ccp2qif.decode import (
+    DateDecoder,
+    decode_amount,
+    decode_amounts,
+    decode_dates_columnar,
+)
+
+
+@pytest.mark.parametrize('text, fmt', [
+    ('09/03/2018', '%d/%m/%Y'),
+    ('9/3/2018', '%d/%m/%Y'),
+    ('31-12-1999', '%d-%m-%Y'),
+    ('29-02-2020', '%d-%m-%Y'),
+])
+def test_date_decoder(text, fmt):
+    decoder = DateDecoder(fmt)
+    expected = datetime.strptime(text, fmt).date()
+    assert decoder(text) == expected
+    assert decoder(text) == expected  # cached
+
+
+@pytest.mark.parametrize('text', ['31/04/2018', '00/01/2018', '+9/03/2018'])
+def test_date_decoder_invalid(text):
+    with pytest.raises(ValueError):
+        DateDecoder('%d/%m/%Y')(text)
+
+
+def test_decode_amount():
+    assert str(decode_amount('-1.234,56')) == '-1234.56'
+    assert str(decode_amount('500')) == '500'
+    assert [str(_) for _ in decode_amounts(['-16,70', '1.000', '20,10'])] == [
+        '-16.70', '1000', '20.10']
+
+
+def test_decode_dates_columnar():
+    pytest.importorskip('numpy')
+    values = ['09/03/2018', '29/02/2020', '01/01/1970', '31/12/1969']
+    assert decode_dates_columnar(values, '%d/%m/%Y') == [
+        date(2018, 3, 9), date(2020, 2, 29), date(1970, 1, 1),
+        date(1969, 12, 31)]
+    assert decode_dates_columnar(['9/3/2018'], '%d/%m/%Y') == [
+        date(2018, 3, 9)]
+    with pytest.raises(ValueError):
+        decode_dates_columnar(['31/04/2018'], '%d/%m/%Y')
+
+
+@pytest.mark.parametrize('parser, filename', [
+    (ccp2qif.bil.stream, 'testdata/bil/liste_mouvements.txt'),
+    (ccp2qif.ccp.stream_csv, 'testdata/ccp/ccp_in.csv'),
+])
+def test_columnar_output_identical(parser, filename, tmpdir):
+    pytest.importorskip('numpy')
+    outputs = []
+    for columnar in (False, True):
+        target = tmpdir.join('%s.qif' % columnar)
+        with open(filename, 'rb') as infile, open(str(target), 'w') as out:
+            write_qif(parser(infile, columnar=columnar), out)
+        outputs.append(target.read_binary())
+    assert outputs[0] == outputs[1]
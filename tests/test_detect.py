@@ -0,0 +1,58 @@
+from io import BytesIO
+import subprocess
+import sys
+
+import ccp2qif.bil
+import ccp2qif.ccp
+from ccp2qif.detect import detect
+
+
+def test_detect_bilnet():
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        assert detect(infile) is ccp2qif.bil.stream
+        assert infile.tell() == 0
+
+
+def test_detect_ccp_csv():
+    with open('testdata/ccp/ccp_in.csv', 'rb') as infile:
+        assert detect(infile) is ccp2qif.ccp.stream_csv
+
+
+def test_detect_workbook():
+    with open('testdata/ccp/ccp_in.xlsx', 'rb') as infile:
+        assert detect(infile) is ccp2qif.ccp.stream_workbook
+
+
+def test_detect_unknown():
+    assert detect(BytesIO(b'foo;bar\n')) is None
+
+
+def test_parse_binary_buffer():
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        expected = ccp2qif.bil.parse(infile)
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        parser = detect(infile)
+        result = parser(infile)
+        assert result.account == expected.account
+        assert list(result.transactions) == expected.transactions
+
+
+def test_parsers_are_imported_lazily():
+    code = (
+        'import sys\n'
+        'from ccp2qif.detect import detect\n'
+        'with open("testdata/bil/liste_mouvements.txt", "rb") as infile:\n'
+        '    detect(infile)\n'
+        'assert "ccp2qif.bil" in sys.modules\n'
+        'assert "ccp2qif.ccp" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_sniff():
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        assert ccp2qif.bil.sniff(infile) is ccp2qif.bil.stream
+        assert ccp2qif.ccp.sniff(infile) is None
+        assert infile.tell() == 0
+    with open('testdata/ccp/ccp_in.xlsx', 'rb') as infile:
+        assert ccp2qif.ccp.sniff(infile) is ccp2qif.ccp.stream_workbook
@@ -0,0 +1,30 @@
+import json
+
+from ccp2qif.qiftools.hints import HintStore
+
+
+def test_commit(tmpdir):
+    filename = str(tmpdir.join('hints.json'))
+    store = HintStore(filename)
+    store.add('LU01', 'current.qif')
+    assert store.guess('/data/CURRENT.qif') == 'LU01'
+    assert not tmpdir.join('hints.json').exists()
+    store.commit()
+    assert json.loads(tmpdir.join('hints.json').read()) == {
+        'LU01': ['current.qif']}
+    assert not tmpdir.join('hints.json.journal').exists()
+
+
+def test_replay_journal(tmpdir):
+    tmpdir.join('hints.json').write(json.dumps({'LU01': ['giro']}))
+    filename = str(tmpdir.join('hints.json'))
+    store = HintStore(filename)
+    store.add('LU02', 'savings.qif')
+    # simulate a crash: the store is never committed and the last journal
+    # line was only written partially
+    with open(filename + '.journal', 'a') as fp:
+        fp.write('["LU03", "tru')
+
+    store = HintStore(filename)
+    assert store.hints == {'LU01': ['giro'], 'LU02': ['savings.qif']}
+    assert store.guess('savings.qif') == 'LU02'
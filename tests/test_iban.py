@@ -0,0 +1,43 @@
+from io import StringIO
+
+from ccp2qif.ccp import parse_csv, stream_csv
+from ccp2qif.iban import normalise_counterparty, normalise_iban
+from ccp2qif.util import account_name_from_filename
+
+CSV = (
+    'Account number :;LU12 3456 7890 1234 5678;\n'
+    'Accounting date;Description;Operation amount;Currency;Value date;'
+    'Counterparty account;Counterparty name :;Communication 1 :;'
+    'Communication 2 :;Operation reference\n'
+    '02-01-2017;desc;-16,70;EUR;02-01-2017;lu280019400644750000;cp;;;ref\n'
+    '02-01-2017;desc;-16,70;EUR;02-01-2017;123-456;cp;;;ref\n'
+)
+
+
+def test_normalise_iban():
+    normalise_iban.cache_clear()
+    assert normalise_iban('lu280019400644750000') == (
+        'LU28 0019 4006 4475 0000')
+    assert normalise_iban('LU23 4567 8901 2345 1234') is None
+    assert normalise_iban('') is None
+    normalise_iban('lu280019400644750000')
+    assert normalise_iban.cache_info().hits == 1
+
+
+def test_normalise_counterparty():
+    assert normalise_counterparty('123-456') == '123-456'
+
+
+def test_account_name_from_filename():
+    assert account_name_from_filename('/data/LU280019400644750000.csv') == (
+        'LU28 0019 4006 4475 0000')
+    assert account_name_from_filename('/data/export.csv') is None
+
+
+def test_csv_counterparties():
+    plain = parse_csv(StringIO(CSV))
+    assert plain.transactions[0].counterparty == 'lu280019400644750000 | cp'
+    result = list(stream_csv(StringIO(CSV),
+                             normalise_counterparties=True).transactions)
+    assert [row.counterparty for row in result] == [
+        'LU28 0019 4006 4475 0000 | cp', '123-456 | cp']
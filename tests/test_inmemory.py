@@ -0,0 +1,76 @@
+from datetime import date
+from io import BytesIO
+import gc
+
+import pytest
+
+from ccp2qif.core import convert, convert_bytes, convert_stream
+from ccp2qif.util import open_bytes
+
+
+SOURCES = [
+    'testdata/bil/liste_mouvements.txt',
+    'testdata/ccp/ccp_in.csv',
+    'testdata/ccp/ccp_in.xlsx',
+]
+
+
+def read(filename):
+    with open(filename, 'rb') as infile:
+        return infile.read()
+
+
+@pytest.mark.parametrize('filename', SOURCES)
+@pytest.mark.parametrize('wrap', [bytes, bytearray, memoryview, BytesIO])
+def test_convert_bytes(tmpdir, filename, wrap):
+    target = str(tmpdir.join('out.qif'))
+    convert(filename, target)
+    assert convert_bytes(wrap(read(filename))) == read(target)
+
+
+def test_convert_xls():
+    xlwt = pytest.importorskip('xlwt')
+    book = xlwt.Workbook()
+    sheet = book.add_sheet('Sheet1')
+    for col_index, value in enumerate(('Accounting date', 'Operation date',
+                                       'Card number', 'Description',
+                                       'Original amount', 'Amount EUR')):
+        sheet.write(0, col_index, value)
+    style = xlwt.easyxf(num_format_str='DD/MM/YYYY')
+    sheet.write(1, 0, date(2018, 3, 23), style)
+    sheet.write(1, 1, date(2018, 3, 22), style)
+    for col_index, value in enumerate(('XXXX', 'Shop', -20.0, -18.9), 2):
+        sheet.write(1, col_index, value)
+    data = BytesIO()
+    book.save(data)
+    result = convert_bytes(memoryview(data.getvalue()), 'card')
+    assert b'D23/03/2018\nT-18.90\nMShop\n^\n' in result
+
+
+def test_convert_stream_chunks():
+    data = read('testdata/ccp/ccp_in.csv')
+    chunks = list(convert_stream(data, buffer_size=50))
+    assert len(chunks) > 2
+    assert b''.join(chunks) == convert_bytes(data)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        convert_bytes(b'no export')
+
+
+def test_open_bytes_seek():
+    infile = open_bytes(bytearray(b'0123456789'))
+    assert infile.read(4) == b'0123'
+    infile.seek(-2, 2)
+    assert infile.read() == b'89'
+    infile.seek(0)
+    assert infile.read() == b'0123456789'
+
+
+@pytest.mark.parametrize('filename', SOURCES)
+def test_source_stays_open(filename):
+    source = BytesIO(read(filename))
+    convert_bytes(source)
+    gc.collect()
+    assert not source.closed
@@ -0,0 +1,67 @@
+from io import StringIO
+
+from ccp2qif.bil import parse
+from ccp2qif.core import write_qif
+from ccp2qif.ledger import Ledger, ingest_files, main
+
+SOURCE = 'testdata/bil/liste_mouvements.txt'
+
+
+def test_ingest_is_idempotent(tmpdir):
+    with Ledger(str(tmpdir.join('ledger.db'))) as ledger:
+        assert ingest_files(ledger, [SOURCE]) == [(SOURCE, 7, 7)]
+        assert ingest_files(ledger, [SOURCE]) == [(SOURCE, 7, 0)]
+        assert [account.account_number for account in ledger.accounts()] \
+            == ['LU123456789012345678']
+
+
+def test_repeated_transactions_are_kept(tmpdir):
+    with open(SOURCE, 'rb') as infile:
+        data = parse(infile)
+    doubled = data._replace(transactions=[data.transactions[0]] * 2)
+    with Ledger(str(tmpdir.join('ledger.db'))) as ledger:
+        assert ledger.ingest(doubled) == (2, 2)
+        assert ledger.ingest(data) == (7, 6)
+        assert ledger.ingest(doubled) == (2, 0)
+
+
+def test_export_range(tmpdir):
+    with open(SOURCE, 'rb') as infile:
+        expected = sorted(parse(infile).transactions,
+                          key=lambda row: row.date)
+    with Ledger(str(tmpdir.join('ledger.db'))) as ledger:
+        ingest_files(ledger, [SOURCE])
+        everything = ledger.export('LU123456789012345678')
+        assert list(everything.transactions) == expected
+        start, end = expected[1].date, expected[-2].date
+        selected = ledger.export('LU123456789012345678', start, end)
+        assert list(selected.transactions) == [
+            row for row in expected if start <= row.date <= end]
+
+
+def test_cli(tmpdir):
+    database = str(tmpdir.join('ledger.db'))
+    target = tmpdir.join('out.qif')
+    assert main([database, 'ingest', SOURCE]) == 0
+    assert main([database, 'export', '-a', 'LU123456789012345678',
+                 '-o', str(target)]) == 0
+    with Ledger(database) as ledger:
+        output = StringIO()
+        write_qif(ledger.export('LU123456789012345678'), output)
+    assert target.read() == output.getvalue()
+    assert main([database, 'export', '-a', 'unknown',
+                 '-o', str(target)]) == 1
+
+
+def test_interleaved_dates(tmpdir):
+    with open(SOURCE, 'rb') as infile:
+        data = parse(infile)
+    first, second = data.transactions[:2]
+    assert first.date != second.date
+    interleaved = data._replace(transactions=[first, second, first])
+    with Ledger(str(tmpdir.join('ledger.db'))) as ledger:
+        assert ledger.ingest(interleaved) == (3, 3)
+        assert ledger.ingest(interleaved) == (3, 0)
+        exported = list(ledger.export(data.account.account_number)
+                        .transactions)
+    assert exported.count(first) == 2
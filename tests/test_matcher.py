@@ -0,0 +1,38 @@
+import pytest
+
+from ccp2qif.qiftools.matcher import AhoCorasick, HintMatcher
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick({'he': 1, 'she': 2, 'his': 3, 'hers': 4})
+    assert sorted(automaton.search('ushers')) == [1, 2, 4]
+    assert automaton.search('xyz') == []
+
+
+def test_hint_matcher():
+    hints = {
+        'LU01': ['Current', 'giro'],
+        'LU02': ['savings', 'rent'],
+        'LU03': ['current-2018'],
+    }
+    matcher = HintMatcher(hints)
+    assert matcher.match('/data/CURRENT-2018.qif') == 'LU01'
+    assert matcher.match('/data/savings.qif') == 'LU02'
+    assert matcher.match('/data/parents.qif') == 'LU02'
+    assert matcher.match('/data/other.qif') is None
+
+
+def test_hint_matcher_add():
+    matcher = HintMatcher({'LU01': ['foo']})
+    matcher.add('LU02', ['bar.qif'])
+    assert matcher.match('bar.qif') == 'LU02'
+    for index in range(100):
+        matcher.add('LU03', ['file%d' % index])
+    assert not matcher.pending or len(matcher.pending) < 64
+    assert matcher.match('file99.qif') == 'LU03'
+    assert matcher.match('bar.qif') == 'LU02'
+
+
+def test_invalid_hints():
+    with pytest.raises(ValueError):
+        HintMatcher({'LU01': 'foo'})
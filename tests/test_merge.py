@@ -0,0 +1,42 @@
+from ccp2qif.merge import merge_exports
+
+HEADER = (
+    'BILnet\r\n'
+    'LISTE DES MOUVEMENTS DU COMPTE\r\n'
+    'LU123456789012345678 "Account"\r\n'
+    '\r\n'
+    'Date;Date valeur;Libellé;Communication;Montant (EUR);\r\n'
+)
+
+
+def write_export(tmpdir, name, rows):
+    export = tmpdir.join(name)
+    export.write_text(HEADER + ''.join(
+        '%s;%s;%s;%s;%s;\r\n' % (day, day, label, label, value)
+        for day, label, value in rows), encoding='cp1252')
+    return str(export)
+
+
+def test_merge(tmpdir):
+    first = write_export(tmpdir, 'first.txt', [
+        ('03/01/2018', 'c', '-3.00'),
+        ('02/01/2018', 'b', '-2.00'),
+        ('02/01/2018', 'b', '-2.00'),  # genuinely twice on that day
+        ('01/01/2018', 'a', '-1.00'),
+    ])
+    second = write_export(tmpdir, 'second.txt', [
+        ('04/01/2018', 'd', '-4.00'),
+        ('03/01/2018', 'c', '-3.00'),
+        ('02/01/2018', 'b', '-2.00'),
+    ])
+    target = str(tmpdir.join('merged.qif'))
+    result = merge_exports([first, second], target, run_size=2)
+    assert result.read == 7
+    assert result.written == 5
+    assert result.duplicates == 2
+    assert result.account.account_number == 'LU123456789012345678'
+
+    content = tmpdir.join('merged.qif').read()
+    dates = [line for line in content.splitlines() if line.startswith('D0')]
+    assert dates == ['D01/01/2018', 'D02/01/2018', 'D02/01/2018',
+                     'D03/01/2018', 'D04/01/2018']
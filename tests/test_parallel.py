@@ -0,0 +1,45 @@
+from ccp2qif import bil, ccp
+from ccp2qif.parallel import parallel_parser
+
+
+def make_csv(tmpdir):
+    with open('testdata/ccp/ccp_in.csv', 'rb') as infile:
+        lines = infile.read().splitlines(keepends=True)
+    body = [line for line in lines[2:] if line.strip()]
+    body.append(b'04-01-2017;"multi\nline";1,00;EUR;04-01-2017;;;;;ref\n')
+    filename = tmpdir.join('large.csv')
+    filename.write_binary(b''.join(lines[:2] + body * 50))
+    return str(filename)
+
+
+def test_parallel_csv(tmpdir):
+    filename = make_csv(tmpdir)
+    with open(filename, 'rb') as infile:
+        expected = ccp.parse_csv(infile)
+    parse = parallel_parser(ccp.stream_csv, workers=2, chunk_size=256)
+    with open(filename, 'rb') as infile:
+        result = parse(infile, '')
+        assert result.account == expected.account
+        assert list(result.transactions) == expected.transactions
+
+
+def test_parallel_bilnet(tmpdir):
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        lines = infile.read().splitlines(keepends=True)
+    filename = tmpdir.join('large.txt')
+    filename.write_binary(b''.join(lines[:5] + lines[5:] * 50))
+    with open(str(filename), 'rb') as infile:
+        expected = bil.parse(infile)
+    parse = parallel_parser(bil.stream, workers=2, chunk_size=256)
+    with open(str(filename), 'rb') as infile:
+        result = parse(infile)
+        assert result.account == expected.account
+        assert list(result.transactions) == expected.transactions
+
+
+def test_small_file_is_parsed_sequentially():
+    parse = parallel_parser(bil.stream, workers=2)
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        result = list(parse(infile).transactions)
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        assert result == bil.parse(infile).transactions
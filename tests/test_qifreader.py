@@ -0,0 +1,45 @@
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from ccp2qif.bil import parse
+from ccp2qif.core import AccountInfo, QIFTransaction as QT
+from ccp2qif.qiftools.reader import iter_qif, read_qif
+
+
+def test_roundtrip():
+    with open('testdata/bil/liste_mouvements.txt') as infile:
+        expected = parse(infile)
+    result = list(read_qif('testdata/bil/liste_mouvements.qif'))
+    assert result[0] == expected.account
+    assert result[1:] == expected.transactions
+
+
+def test_file_objects():
+    with open('testdata/ccp/ccp_out.qif', 'rb') as infile:
+        data = infile.read()
+    from_bytes = list(read_qif(BytesIO(data)))
+    from_text = list(read_qif(StringIO(data.decode('cp1252'))))
+    assert from_bytes == from_text
+    assert from_bytes[-1] == QT(date(2017, 1, 5), Decimal('500'),
+                                'description 5 | comm 5-1 | comm 5-2',
+                                'LU23 4567 8901 2345 1234', 'ref 5')
+
+
+def test_without_account():
+    lines = ['!Type:Bank', 'D02/01/2017', 'T-16.70', 'Mfoo', '^',
+             'D03/01/2017', 'T1']
+    result = list(iter_qif(lines))
+    assert result == [
+        QT(date(2017, 1, 2), Decimal('-16.70'), 'foo', '', ''),
+        QT(date(2017, 1, 3), Decimal('1'), '', '', ''),
+    ]
+
+
+def test_multiple_accounts():
+    lines = ['!Account', 'Nfoo', 'TBank', '^', '!Type:Bank', 'T1', '^',
+             '!Account', 'Nbar', 'D"Bar"', '^']
+    result = list(iter_qif(lines))
+    assert result == [AccountInfo('foo', ''),
+                      QT(None, Decimal('1'), '', '', ''),
+                      AccountInfo('bar', 'Bar')]
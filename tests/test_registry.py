@@ -0,0 +1,81 @@
+from io import BytesIO
+
+import pytest
+
+from ccp2qif.registry import (
+    BUILTIN_FORMATS,
+    Format,
+    FormatRegistry,
+    default_registry,
+)
+
+CALLS = []
+
+
+def probe_semicolons(header, infile):
+    CALLS.append('semicolons')
+    return header.count(b';') > 2
+
+
+def probe_never(header, infile):
+    CALLS.append('never')
+    return False
+
+
+def test_magic_lookup():
+    registry = FormatRegistry(BUILTIN_FORMATS)
+    with open('testdata/ccp/ccp_in.csv', 'rb') as infile:
+        assert registry.identify(infile).name == 'ccp-csv'
+    with open('testdata/ccp/ccp_in.xlsx', 'rb') as infile:
+        assert registry.identify(infile).name == 'ccp-workbook'
+    assert registry.identify(BytesIO(b'nothing')) is None
+
+
+def test_probes():
+    registry = FormatRegistry(BUILTIN_FORMATS + [
+        Format('never', 'Never matches', extensions=('.txt',), cost=1,
+               parser='x:y', probe='tests.test_registry:probe_never'),
+        Format('semicolons', 'Anything with semicolons', cost=5,
+               extensions=('.csv',), parser='x:y',
+               probe='tests.test_registry:probe_semicolons'),
+    ])
+    del CALLS[:]
+    data = BytesIO(b'a;b;c;d\n')
+    assert registry.identify(data, 'export.csv').name == 'semicolons'
+    assert CALLS == ['semicolons']
+
+    # Magic bytes are conclusive, the probes are not run
+    del CALLS[:]
+    assert registry.identify(BytesIO(b'BILnet;;;;')).name == 'bilnet'
+    assert CALLS == []
+
+    # Without extension the cheaper probe comes first
+    assert registry.identify(data).name == 'semicolons'
+    assert CALLS == ['never', 'semicolons']
+
+
+def test_duplicate_name():
+    registry = FormatRegistry(BUILTIN_FORMATS)
+    with pytest.raises(ValueError):
+        registry.register(BUILTIN_FORMATS[0])
+
+
+def test_default_registry():
+    names = [fmt.name for fmt in default_registry().formats]
+    assert names[:3] == ['bilnet', 'ccp-csv', 'ccp-workbook']
+
+
+def test_entry_points_are_deferred(monkeypatch):
+    registry = FormatRegistry(BUILTIN_FORMATS, 'ccp2qif.test-formats')
+    groups = []
+
+    def load_entry_points(group):
+        groups.append(group)
+        registry.register(Format('plugin', 'A plugin format',
+                                 magic=(b'PLUGIN',), parser='x:y'))
+    monkeypatch.setattr(registry, 'load_entry_points', load_entry_points)
+    assert registry.identify(BytesIO(b'BILnet;;;;')).name == 'bilnet'
+    assert groups == []
+    assert registry.identify(BytesIO(b'PLUGIN')).name == 'plugin'
+    assert registry.identify(BytesIO(b'nothing')) is None
+    assert groups == ['ccp2qif.test-formats']
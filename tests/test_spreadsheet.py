@@ -0,0 +1,101 @@
+from datetime import date, datetime
+
+import pytest
+from xlrd import xldate_as_tuple
+
+from ccp2qif.ccp import parse_xls, stream_workbook
+from ccp2qif import spreadsheet
+from ccp2qif.spreadsheet import SheetReader, _contents, excel_dates
+
+
+def test_excel_dates():
+    serials = [43182.0, 43180.5, 61.0, 100.99]
+    expected = [date(*xldate_as_tuple(value, 0)[:3]) for value in serials]
+    assert excel_dates(serials, 0) == expected
+    serials = [43182.0, 1.0, 2.5]
+    expected = [date(*xldate_as_tuple(value, 1)[:3]) for value in serials]
+    assert excel_dates(serials, 1) == expected
+
+
+def test_excel_dates_passthrough():
+    values = [datetime(2018, 3, 23, 0, 0), date(2018, 3, 21)]
+    assert excel_dates(values, 0) == [date(2018, 3, 23), date(2018, 3, 21)]
+
+
+def test_reader_from_file_object():
+    with open('testdata/ccp/ccp_in.xlsx', 'rb') as infile:
+        rows = list(SheetReader(infile))
+    assert rows[0] == ('Accounting date', 'Description',
+                       'Counterparty account', 'Counterparty name', 'Amount')
+    assert len(rows) == 7
+
+
+def test_stream_workbook():
+    expected = parse_xls('testdata/ccp/ccp_in.xlsx', 'foo')
+    with open('testdata/ccp/ccp_in.xlsx', 'rb') as infile:
+        result = stream_workbook(infile, 'foo')
+        assert result.account == expected.account
+        assert list(result.transactions) == expected.transactions
+
+
+def test_xls(tmpdir):
+    xlwt = pytest.importorskip('xlwt')
+    filename = str(tmpdir.join('card.xls'))
+    book = xlwt.Workbook()
+    sheet = book.add_sheet('Sheet1')
+    style = xlwt.easyxf(num_format_str='DD/MM/YYYY')
+    rows = [
+        ('Accounting date', 'Operation date', 'Card number', 'Description',
+         'Original amount', 'Amount EUR'),
+        (date(2018, 3, 23), date(2018, 3, 22), 'XXXX', 'Shop', -20.0,
+         -18.9),
+    ]
+    for row_index, values in enumerate(rows):
+        for col_index, value in enumerate(values):
+            if isinstance(value, date):
+                sheet.write(row_index, col_index, value, style)
+            else:
+                sheet.write(row_index, col_index, value)
+    book.save(filename)
+
+    with open(filename, 'rb') as infile:
+        result = list(stream_workbook(infile, 'foo').transactions)
+    assert len(result) == 1
+    assert result[0].date == date(2018, 3, 23)
+    assert str(result[0].value) == '-18.90'
+    assert result[0].message == 'Shop'
+
+
+@pytest.mark.parametrize('valid', [True, False])
+def test_xls_unmaps_contents(tmpdir, monkeypatch, valid):
+    xlwt = pytest.importorskip('xlwt')
+    filename = str(tmpdir.join('book.xls'))
+    if valid:
+        book = xlwt.Workbook()
+        book.add_sheet('Sheet1').write(0, 0, 'value')
+        book.save(filename)
+    else:
+        tmpdir.join('book.xls').write_binary(
+            b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\0' * 1024)
+    mapped = []
+
+    def contents(infile):
+        mapped.append(_contents(infile))
+        return mapped[-1]
+    monkeypatch.setattr(spreadsheet, '_contents', contents)
+    with open(filename, 'rb') as infile:
+        if valid:
+            assert list(SheetReader(infile)) == [('value',)]
+        else:
+            with pytest.raises(Exception):
+                SheetReader(infile)
+    assert mapped[0].closed
+
+
+def test_empty_workbook(tmpdir):
+    from openpyxl import Workbook
+    filename = str(tmpdir.join('empty.xlsx'))
+    Workbook().save(filename)
+    with open(filename, 'rb') as infile:
+        with pytest.raises(ValueError):
+            stream_workbook(infile, 'foo')
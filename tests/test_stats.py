@@ -0,0 +1,35 @@
+from ccp2qif.core import convert
+from ccp2qif.stats import ConversionStats, add_hook, remove_hook
+
+
+def test_convert_collects_stats(tmpdir):
+    source = tmpdir.join('export.txt')
+    with open('testdata/bil/liste_mouvements.txt', 'rb') as infile:
+        # A trailing blank line is skipped and counted
+        source.write_binary(infile.read() + b'\r\n')
+    target = tmpdir.join('export.qif')
+    stats = ConversionStats()
+    convert(str(source), str(target), stats=stats)
+
+    report = stats.as_dict()
+    assert report['parser'] == 'ccp2qif.bil:stream'
+    assert report['counters'] == {
+        'rows': 7,
+        'blank_rows': 1,
+        'bytes_read': source.size(),
+        'bytes_written': target.size(),
+    }
+    assert set(report['stages']) == {'detect', 'parse', 'write'}
+    assert all(stage['wall'] >= 0 for stage in report['stages'].values())
+
+
+def test_hook(tmpdir):
+    received = []
+    add_hook(received.append)
+    try:
+        convert('testdata/bil/liste_mouvements.txt',
+                str(tmpdir.join('out.qif')))
+    finally:
+        remove_hook(received.append)
+    assert len(received) == 1
+    assert received[0].counters['rows'] == 7
@@ -0,0 +1,64 @@
+import csv
+import io
+
+import pytest
+
+from ccp2qif.tokenizer import iter_rows, open_records, record_ranges
+
+DATA = (b'a;"x\r\ny\nz";1\r\nb;2\r\n\r\nc;"\n";3\nd;\xe9;4\n'
+        b'e;"say ""hi""";5\nf;6')
+
+
+def expected_rows(data):
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='cp1252')
+    return list(csv.reader(text, delimiter=';', quotechar='"'))
+
+
+def test_record_ranges_respect_quotes():
+    data = b'a;"x\ny\nz";1\nb;2\nc;"\n";3\nd;4\n'
+    ranges = record_ranges(data, 0, len(data), size=3)
+    chunks = [data[start:end] for start, end in ranges]
+    assert chunks == [b'a;"x\ny\nz";1\n', b'b;2\n', b'c;"\n";3\n', b'd;4\n']
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1024])
+def test_iter_rows(block_size):
+    rows = list(iter_rows(DATA, block_size=block_size))
+    assert rows == expected_rows(DATA)
+
+
+def test_iter_rows_without_quotes():
+    data = b'a;1\r\n\r\nb;\xe9\r\nc;3\r\n'
+    assert list(iter_rows(data, block_size=4)) == expected_rows(data)
+
+
+def test_open_records(tmpdir):
+    filename = tmpdir.join('export.csv')
+    filename.write_binary(b'head 1\r\nhead 2\r\n' + DATA)
+    with open(str(filename), 'rb') as infile:
+        header, rows = open_records(infile, 2)
+        assert header == ['head 1\n', 'head 2\n']
+        assert list(rows) == expected_rows(DATA)
+    # File objects which cannot be memory-mapped use csv.reader
+    header, rows = open_records(io.BytesIO(filename.read_binary()), 2)
+    assert header == ['head 1\n', 'head 2\n']
+    assert list(rows) == expected_rows(DATA)
+
+
+def test_open_records_truncated_header(tmpdir):
+    filename = tmpdir.join('export.csv')
+    filename.write_binary(b'head 1\r\n')
+    with open(str(filename), 'rb') as infile:
+        with pytest.raises(ValueError):
+            open_records(infile, 2)
+    with pytest.raises(ValueError):
+        open_records(io.BytesIO(filename.read_binary()), 2)
+
+
+def test_open_records_carriage_returns(tmpdir):
+    filename = tmpdir.join('export.csv')
+    filename.write_binary(b'head 1\rhead 2\ra;1\rb;2\r')
+    with open(str(filename), 'rb') as infile:
+        header, rows = open_records(infile, 2)
+        assert header == ['head 1\n', 'head 2\n']
+        assert list(rows) == [['a', '1'], ['b', '2']]
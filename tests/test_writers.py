@@ -0,0 +1,77 @@
+from datetime import date
+from decimal import Decimal
+import csv
+
+import pytest
+
+from ccp2qif.core import convert, find_output_format
+from ccp2qif.model import AccountInfo, QIFTransaction, TransactionList
+
+SOURCE = 'testdata/ccp/ccp_in.csv'
+
+
+def test_find_output_format():
+    assert find_output_format(filename='out.qif').name == 'qif'
+    assert find_output_format(filename='out.CSV').name == 'csv'
+    assert find_output_format(filename='out.parquet').name == 'parquet'
+    assert find_output_format(filename='out.txt').name == 'qif'
+    assert find_output_format('arrow', 'out.qif').name == 'arrow'
+    with pytest.raises(ValueError):
+        find_output_format('xml')
+
+
+def test_csv(tmpdir):
+    target = str(tmpdir.join('out.csv'))
+    convert(SOURCE, target)
+    with open(target, newline='', encoding='utf8') as infile:
+        rows = list(csv.DictReader(infile))
+    assert len(rows) == 5
+    assert rows[0]['account'] == 'LU12 3456 7890 1234 5678'
+    assert rows[0]['date'] == '2017-01-02'
+    assert rows[0]['amount'] == '-16.70'
+    assert rows[0]['reference'] == 'ref 1'
+
+
+@pytest.mark.parametrize('output_format', ['arrow', 'parquet'])
+def test_arrow(tmpdir, output_format):
+    pa = pytest.importorskip('pyarrow')
+    target = str(tmpdir.join('out.bin'))
+    convert(SOURCE, target, output_format=output_format)
+    if output_format == 'arrow':
+        table = pa.ipc.open_file(target).read_all()
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(target)
+    assert table.num_rows == 5
+    assert table.column('date')[0].as_py() == date(2017, 1, 2)
+    assert table.column('amount')[0].as_py() == Decimal('-16.70')
+    assert table.schema.metadata[b'account_number'] == \
+        b'LU12 3456 7890 1234 5678'
+
+
+def test_arrow_dictionary_across_batches(tmpdir):
+    pa = pytest.importorskip('pyarrow')
+    from ccp2qif.arrow import write_arrow
+    transactions = [
+        QIFTransaction(date(2018, 1, 1), Decimal('1.00'), 'message',
+                       'cp %d' % (index % 3), '')
+        for index in range(10)
+    ]
+    target = tmpdir.join('out.arrow')
+    with open(str(target), 'wb') as outfile:
+        write_arrow(TransactionList(AccountInfo('LU00', ''), transactions),
+                    outfile, batch_size=4)
+    table = pa.ipc.open_file(str(target)).read_all()
+    assert table.column('counterparty').to_pylist() == [
+        row.counterparty for row in transactions]
+
+
+def test_dictionary_encoder_appends_new_values():
+    pytest.importorskip('pyarrow')
+    from ccp2qif.arrow import DictionaryEncoder
+    encoder = DictionaryEncoder()
+    first = encoder.encode(['a', 'b', 'a'])
+    second = encoder.encode(['b', 'c', None])
+    assert first.dictionary.to_pylist() == ['a', 'b']
+    assert second.dictionary.to_pylist() == ['a', 'b', 'c', None]
+    assert second.to_pylist() == ['b', 'c', None]